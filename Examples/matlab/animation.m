@@ -1,10 +1,13 @@
-function result = animation(animation_type, num_frames)
+function result = animation(animation_type, num_frames, output_dir, url_prefix)
     % ANIMATION Creates animations with MATLAB
-    %   result = ANIMATION(animation_type, num_frames)
+    %   result = ANIMATION(animation_type, num_frames, output_dir, url_prefix)
     %
     %   Parameters:
     %     animation_type - Type of animation ('pendulum', 'wave', 'orbit')
     %     num_frames - Number of frames to generate
+    %     output_dir - Directory to write the frames to (one per animation;
+    %                  defaults to webapp/static/animation)
+    %     url_prefix - URL the frames in output_dir are served under
     
     % Set default parameters if not provided
     if nargin < 1, animation_type = 'pendulum'; end
@@ -19,18 +22,20 @@ function result = animation(animation_type, num_frames)
     % First, figure out the Flask static directory relative to the Examples/matlab directory
     current_script_dir = fileparts(mfilename('fullpath'));
     project_root = fileparts(fileparts(current_script_dir)); % Go up two levels from Examples/matlab
-    static_dir = fullfile(project_root, 'webapp', 'static', 'animation');
+    % Each animation gets its own output directory, so existing files are
+    % never deleted and concurrent calls cannot overwrite each other
+    if nargin < 3 || isempty(output_dir)
+        output_dir = fullfile(project_root, 'webapp', 'static', 'animation');
+    end
+    if nargin < 4 || isempty(url_prefix), url_prefix = '/static/animation'; end
+    static_dir = output_dir;
     
-    fprintf('Using static directory: %s\n', static_dir);
+    fprintf('Using output directory: %s\n', static_dir);
     if ~exist(static_dir, 'dir')
         mkdir(static_dir);
-        fprintf('Created static directory\n');
+        fprintf('Created output directory\n');
     end
     
-    % Clean any existing files
-    delete(fullfile(static_dir, '*.png'));
-    fprintf('Cleaned existing files\n');
-    
     % List to store frame filenames
     frames = cell(1, num_frames);
     fprintf('Allocated %d frame slots\n', num_frames);
@@ -421,9 +426,9 @@ function result = animation(animation_type, num_frames)
     % Create the result structure with URLs instead of file paths
     frame_urls = cell(1, num_frames);
     for i = 1:length(frames)
-        % Convert the file path to a URL (/static/animation/frame_xxx.png)
+        % Convert the file path to a URL (<url_prefix>/frame_xxx.png)
         [~, name, ext] = fileparts(frames{i});
-        frame_urls{i} = ['/static/animation/', name, ext];
+        frame_urls{i} = [url_prefix, '/', name, ext];
     end
     
     result.frames = frame_urls;
@@ -431,7 +436,7 @@ function result = animation(animation_type, num_frames)
     
     % Also convert thumbnail to URL
     [~, thumb_name, thumb_ext] = fileparts(result.thumbnail);
-    result.thumbnail = ['/static/animation/', thumb_name, thumb_ext];
+    result.thumbnail = [url_prefix, '/', thumb_name, thumb_ext];
     
     % Add MATLAB signature
     axes('Position', [0.01, 0.01, 0.1, 0.05], 'Visible', 'off');
@@ -1,18 +1,24 @@
-function result = image_processing(operation, noise_level)
+function result = image_processing(operation, noise_level, image_size)
     % IMAGE_PROCESSING Demonstrates MATLAB's image processing capabilities
-    %   result = IMAGE_PROCESSING(operation, noise_level)
+    %   result = IMAGE_PROCESSING(operation, noise_level, image_size)
     %
     %   Parameters:
     %     operation - Type of operation ('edge', 'filter', 'segment', 'transform')
     %     noise_level - Level of noise to add (0-1)
+    %     image_size - Width and height of the test image in pixels (default 256)
+    %
+    %   result.timings holds the seconds spent generating the image and
+    %   running the operation, named as in the Python fallback.
     
     % Set default parameters if not provided
     if nargin < 1, operation = 'edge'; end
     if ~ischar(operation), operation = 'edge'; end
     if nargin < 2, noise_level = 0.2; end
+    if nargin < 3, image_size = 256; end
     
     % Create a test image without using Image Processing Toolbox functions
-    [x, y] = meshgrid(linspace(-3, 3, 256), linspace(-3, 3, 256));
+    t_start = tic;
+    [x, y] = meshgrid(linspace(-3, 3, image_size), linspace(-3, 3, image_size));
     r = sqrt(x.^2 + y.^2);
     I = (1 + sin(r))/2;
     
@@ -27,6 +33,8 @@ function result = image_processing(operation, noise_level)
     % Add noise to the image - simplified without using imnoise
     J = I + noise_level * randn(size(I));
     J = min(max(J, 0), 1);  % Clip to [0,1] range
+    result.timings.generate = toc(t_start);
+    t_start = tic;
     
     % Process image based on selected operation
     figure('Visible', 'off');
@@ -38,6 +46,7 @@ function result = image_processing(operation, noise_level)
             [Gx, Gy] = gradient(J);
             edges_manual = sqrt(Gx.^2 + Gy.^2);
             edges_threshold = edges_manual > 0.2;
+            result.timings.edge = toc(t_start);
             
             % Display results
             subplot(2,2,1)
@@ -71,6 +80,9 @@ function result = image_processing(operation, noise_level)
                     K_mean(i,j) = mean(neighborhood(:));
                 end
             end
+            [Gx, Gy] = gradient(K_mean);
+            G_mag = sqrt(Gx.^2 + Gy.^2);
+            result.timings.filter = toc(t_start);
             
             % Display results
             subplot(2,2,1)
@@ -87,8 +99,6 @@ function result = image_processing(operation, noise_level)
             
             subplot(2,2,4)
             % Create another visualization
-            [Gx, Gy] = gradient(K_mean);
-            G_mag = sqrt(Gx.^2 + Gy.^2);
             imshow(G_mag)
             title('Gradient of Filtered Image')
             
@@ -105,6 +115,7 @@ function result = image_processing(operation, noise_level)
             % Simple region visualization
             labels = zeros(size(J));
             [labels, num_regions] = bwlabel_simple(bw);
+            result.timings.segment = toc(t_start);
             
             % Display results
             subplot(2,2,1)
@@ -134,6 +145,8 @@ function result = image_processing(operation, noise_level)
             F_shifted = fftshift(F); % Center the transform
             magnitude = log(1 + abs(F_shifted));
             magnitude_scaled = magnitude / max(magnitude(:));
+            J_restored = real(ifft2(F));
+            result.timings.transform = toc(t_start);
             
             % Display results
             subplot(2,2,1)
@@ -150,7 +163,6 @@ function result = image_processing(operation, noise_level)
             
             subplot(2,2,4)
             % Show inverse FFT
-            J_restored = real(ifft2(F));
             imshow(J_restored)
             title('Inverse FFT')
             
@@ -164,6 +176,7 @@ function result = image_processing(operation, noise_level)
             [Gx, Gy] = gradient(J);
             edges_manual = sqrt(Gx.^2 + Gy.^2);
             edges_threshold = edges_manual > 0.2;
+            result.timings.edge = toc(t_start);
             
             subplot(2,2,1)
             imshow(I)
@@ -0,0 +1,286 @@
+"""
+Latency, peak RSS and response size of every bridge function, without MATLAB.
+
+Two groups of cases:
+
+  fallback   each @matlab_function's Python fallback, then encode_plot, over a
+             parameter matrix (num_points 1e2-1e6, num_frames 10-50, the
+             expression corpus, image and matrix sizes)
+  dispatch   call_matlab_function against a pool of one FakeEngine, so the
+             bridge's own work is timed: binding, checkout, the call, figure
+             capture and PNG encoding (animation is left out: after its first
+             call the animation store answers it). A call that the fake
+             engine did not serve, i.e. one that fell back to Python, fails
+             the case.
+
+Every case runs in a fresh interpreter, so its peak RSS is its own. One
+untimed call warms it up, then --repeat calls are timed. The result cache is
+off (RESULT_CACHE=0); caches inside a function, such as symbolic.py's
+compiled expressions, stay on as in production.
+
+Results go to a JSON file with --save; --compare flags cases that got slower,
+bigger in memory or bigger on the wire than a saved baseline and exits with
+status 1 if any did:
+
+    python benchmarks/bench_bridge.py --save benchmarks/baseline.json
+    python benchmarks/bench_bridge.py --compare benchmarks/baseline.json
+    python benchmarks/bench_bridge.py --filter 'advanced_plot|dispatch' --list
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+WEBAPP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'webapp')
+
+POINTS = (100, 10_000, 1_000_000)
+
+EXPRESSIONS = (
+    'x^2',
+    'sin(x)*cos(x)',
+    'exp(-x^2)',
+    'x^3 - 6*x^2 + 11*x - 6',
+    '1/(1 + x^2)',
+    'x*log(x)',
+)
+
+
+def build_cases():
+    """{name: (group, function, params)} for the whole parameter matrix"""
+    cases = {}
+
+    def add(group, function, **params):
+        label = ','.join(f'{key}={value}' for key, value in params.items())
+        cases[f'{group}/{function}[{label}]'] = (group, function, params)
+
+    for n in (100, 1_000, 10_000, 100_000, 1_000_000):
+        add('fallback', 'simple_plot', num_points=n)
+    for function_type in ('sin', 'cos', 'tan', 'square'):
+        for n in POINTS:
+            add('fallback', 'advanced_plot', function_type=function_type, num_points=n)
+    for expression in EXPRESSIONS:
+        for operation in ('simplify', 'differentiate', 'integrate', 'solve', 'plot'):
+            add('fallback', 'symbolic_math', expression=expression, operation=operation)
+    for eq_type in ('spring', 'pendulum', 'predator_prey', 'lorenz'):
+        for n in POINTS:
+            add('fallback', 'differential_equation', eq_type=eq_type, num_points=n)
+    for operation in ('edge', 'filter', 'segment', 'transform'):
+        for size in (256, 1024, 4096):
+            add('fallback', 'image_processing', operation=operation, size=size)
+    for operation in ('eigenvalues', 'svd', 'matrix'):
+        for size in (3, 100, 1000, 3000):
+            add('fallback', 'matrix_operation', operation=operation, size=size)
+    for animation_type in ('pendulum', 'wave', 'lissajous', 'spiral', 'orbit'):
+        for num_frames in (10, 20, 50):
+            add('fallback', 'animation', animation_type=animation_type, num_frames=num_frames)
+
+    for function in ('simple_plot', 'advanced_plot', 'differential_equation',
+                     'image_processing', 'matrix_operation'):
+        add('dispatch', function)
+    add('dispatch', 'symbolic_math', expression='x^2', operation='differentiate')
+    return cases
+
+
+def peak_rss_mb():
+    """High-water RSS of this process or any of its finished children, in MB"""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def _fake_functions(bridge, calls):
+    """MATLAB stand-ins returning what the real .m files return, drawing nothing
+
+    Each call appends the function's name to `calls`.
+    """
+    def figure(*args):
+        calls.append('figure')
+        return {}
+
+    def symbolic_math(params):
+        calls.append('symbolic_math')
+        return {'status': 'success', 'result': '2*x', 'latex': '2 x', 'plot': None}
+
+    functions = {name: figure for name in bridge.matlab_functions}
+    functions['symbolic_math'] = symbolic_math
+    del functions['animation']
+    return functions
+
+
+def run_case(name, repeat):
+    """Run one case in this process; returns its measurements"""
+    sys.path.insert(0, WEBAPP_DIR)
+    import matlab_bridge as bridge
+    from engine_pool import FakeEngine
+
+    group, function, params = build_cases()[name]
+    if group == 'dispatch':
+        calls = []
+        functions = _fake_functions(bridge, calls)
+        bridge.initialize_matlab_engine(factory=lambda: FakeEngine(functions), size=1, wait=True)
+
+        def call():
+            served = len(calls)
+            result = bridge.call_matlab_function(function, params)
+            if len(calls) == served:
+                # A dispatch case timing a Python fallback would be meaningless
+                raise RuntimeError(f"{function} fell back to Python instead of the fake engine")
+            return result
+    else:
+        # Never pick up a real engine, even where MATLAB is installed
+        bridge.MATLAB_AVAILABLE = False
+        entry = bridge.matlab_functions[function]
+
+        def call():
+            return bridge.encode_plot(entry(**params))
+
+    rss_before = peak_rss_mb()
+    result = call()
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        seconds.append(time.perf_counter() - started)
+
+    response_bytes = len(json.dumps(result, default=str).encode())
+    # A client playing an animation also downloads every frame
+    for url in (result.get('frames') or []) if isinstance(result, dict) else []:
+        response_bytes += os.path.getsize(bridge._animation_store.path(url))
+
+    status = result.get('status', 'success') if isinstance(result, dict) else 'success'
+    return {
+        'group': group,
+        'function': function,
+        'params': params,
+        'status': status,
+        'backend': 'matlab' if group == 'dispatch' else 'python',
+        'latency_s': {
+            'min': min(seconds),
+            'median': statistics.median(seconds),
+            'max': max(seconds),
+        },
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_growth_mb': peak_rss_mb() - rss_before,
+        'response_bytes': response_bytes,
+    }
+
+
+def run_isolated(name, repeat, timeout):
+    """Run one case in a fresh interpreter; its result is the last line of output"""
+    env = dict(os.environ, RESULT_CACHE='0', MPLBACKEND='Agg')
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-case', name, '--repeat', str(repeat)],
+            capture_output=True, text=True, env=env, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'status': 'timeout', 'message': f'no result within {timeout:g} s'}
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        error = (completed.stderr.strip().splitlines() or ['no output'])[-1]
+        return {'status': 'error', 'message': error}
+    return json.loads(lines[-1])
+
+
+def compare(baseline, current, latency_tolerance, rss_tolerance, bytes_tolerance, min_seconds):
+    """Human-readable regressions of `current` against `baseline`"""
+    regressions = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if before is None or 'latency_s' not in before:
+            continue
+        if 'latency_s' not in now:
+            regressions.append(f"{name}: {now['status']} ({now.get('message', '')})")
+            continue
+        old, new = before['latency_s']['median'], now['latency_s']['median']
+        if new > old * (1 + latency_tolerance) and new - old > min_seconds:
+            regressions.append(f"{name}: median {old * 1e3:.1f} -> {new * 1e3:.1f} ms")
+        old, new = before['peak_rss_mb'], now['peak_rss_mb']
+        if new > old * (1 + rss_tolerance):
+            regressions.append(f"{name}: peak RSS {old:.0f} -> {new:.0f} MB")
+        old, new = before['response_bytes'], now['response_bytes']
+        if new > old * (1 + bytes_tolerance):
+            regressions.append(f"{name}: response {old:,d} -> {new:,d} bytes")
+    return regressions
+
+
+def report(name, measured):
+    if 'latency_s' not in measured:
+        print(f"{name:<72} {measured['status']}: {measured.get('message', '')}")
+        return
+    latency = measured['latency_s']
+    print(f"{name:<72} {latency['median'] * 1e3:>10.1f} {latency['min'] * 1e3:>10.1f} "
+          f"{measured['peak_rss_mb']:>9.0f} {measured['response_bytes']:>12,d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filter', default='', help='regular expression selecting case names')
+    parser.add_argument('--list', action='store_true', help='print the selected case names and exit')
+    parser.add_argument('--repeat', type=int, default=3, help='timed calls per case')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds allowed per case')
+    parser.add_argument('--save', metavar='PATH', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='flag regressions against this JSON baseline')
+    parser.add_argument('--latency-tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown of the median')
+    parser.add_argument('--min-seconds', type=float, default=0.005,
+                        help='slowdowns smaller than this are never flagged')
+    parser.add_argument('--rss-tolerance', type=float, default=0.2, help='allowed relative peak RSS growth')
+    parser.add_argument('--bytes-tolerance', type=float, default=0.05,
+                        help='allowed relative response size growth')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Fallbacks print progress; the measurements are the last line
+        print(json.dumps(run_case(args.run_case, args.repeat)))
+        return 0
+
+    pattern = re.compile(args.filter)
+    names = [name for name in build_cases() if pattern.search(name)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    print(f"{'case':<72} {'median ms':>10} {'min ms':>10} {'peak MB':>9} {'bytes':>12}")
+    results = {}
+    for name in names:
+        results[name] = run_isolated(name, args.repeat, args.timeout)
+        report(name, results[name])
+
+    if args.save:
+        document = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'repeat': args.repeat,
+            },
+            'cases': results,
+        }
+        with open(args.save, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+        print(f"\nSaved {len(results)} cases to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['cases']
+        regressions = compare(baseline, results, args.latency_tolerance, args.rss_tolerance,
+                              args.bytes_tolerance, args.min_seconds)
+        print(f"\n{len(regressions)} regression(s) against {args.compare}")
+        for line in regressions:
+            print(f"  {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
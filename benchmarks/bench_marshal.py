@@ -0,0 +1,92 @@
+"""
+Throughput of numpy <-> MATLAB array conversion (webapp/matlab_marshal.py).
+
+For each size a column-major-sensitive 2-D array (1000 rows) is converted
+with matlab_marshal.to_matlab and back with to_numpy, and compared with the
+element-by-element path: matlab.double(array.tolist()). That path is slow,
+so it only runs up to --list-max elements.
+
+Without the MATLAB Engine for Python only the copy that to_matlab performs
+for older engines (a Fortran-order ravel into an array.array) is timed.
+
+    python benchmarks/bench_marshal.py --sizes 1e6,1e7,1e8 --dtype float64
+"""
+
+import argparse
+import array
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'webapp'))
+
+import matlab_marshal  # noqa: E402
+
+ROWS = 1000
+
+
+def best_of(function, repeat):
+    """Fastest of `repeat` runs, in seconds, and the last result"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def report(label, n, itemsize, seconds):
+    rate = n * itemsize / seconds / 1e9
+    print(f"{label:<28} {n:>12,d} {seconds * 1e3:>11.1f} {rate:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1e6,1e7,1e8', help='comma-separated element counts')
+    parser.add_argument('--dtype', default='float64', help='numpy dtype, e.g. float32 or complex128')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement (best is kept)')
+    parser.add_argument('--list-max', type=float, default=1e6,
+                        help='largest size for the element-by-element baseline')
+    args = parser.parse_args()
+
+    dtype = np.dtype(args.dtype)
+    rng = np.random.default_rng(0)
+    engine = matlab_marshal.matlab is not None
+    if not engine:
+        print("MATLAB Engine for Python not installed: timing the column-major copy only\n")
+    print(f"{'conversion':<28} {'elements':>12} {'best (ms)':>11} {'GB/s':>8}")
+
+    for n in (int(float(size)) for size in args.sizes.split(',')):
+        columns = max(1, n // ROWS)
+        a = rng.random((min(n, ROWS), columns)).astype(dtype)
+        if dtype.kind == 'c':
+            a += 1j * rng.random(a.shape)
+        n = a.size
+
+        if not engine:
+            typecode = {'f': 'f', 'd': 'd'}.get(dtype.char, 'd')
+
+            def column_major():
+                target = array.array(typecode)
+                target.frombytes(np.ravel(a.real, order='F').astype(typecode, copy=False).view(np.uint8))
+                return target
+            report('ravel(F) -> array.array', n, a.real.itemsize, best_of(column_major, args.repeat)[0])
+            continue
+
+        seconds, converted = best_of(lambda: matlab_marshal.to_matlab(a), args.repeat)
+        report('numpy -> matlab (buffer)', n, dtype.itemsize, seconds)
+        seconds, back = best_of(lambda: matlab_marshal.to_numpy(converted, copy=True), args.repeat)
+        report('matlab -> numpy (buffer)', n, dtype.itemsize, seconds)
+        if not np.array_equal(back, a):
+            print("  round trip mismatch!")
+        if n <= args.list_max:
+            constructor = getattr(matlab_marshal.matlab, matlab_marshal.matlab_class(dtype))
+            seconds, _ = best_of(lambda: constructor(a.tolist(), is_complex=dtype.kind == 'c'), 1)
+            report('numpy -> matlab (tolist)', n, dtype.itemsize, seconds)
+        del converted, back
+
+
+if __name__ == '__main__':
+    main()
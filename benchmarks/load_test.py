@@ -0,0 +1,330 @@
+"""
+HTTP load test of the Flask app: throughput, latency percentiles and errors per endpoint.
+
+Worker threads send a weighted mix of requests to the real routes for
+--duration seconds, each thread waiting for its response before sending the
+next (closed loop), so --concurrency is the number of requests in flight.
+
+Targets:
+
+  (default)         in this process, through Flask's test client; no server,
+                    but every request shares this interpreter's GIL
+  --url URL         a server that is already running
+  --gunicorn        a gunicorn serving wsgi:app on --port, started for the run
+                    with --workers and --threads and stopped afterwards
+
+Requests started during --warmup are not measured; throughput is over the
+time from the end of the warm-up until the last measured response.
+A request counts as an error on an HTTP status of 400 or more, or a JSON body
+with "status": "error" (some routes report failures that way with 200).
+Every request uses one of a few fixed parameter sets, as a class of browsers
+would; --unique varies a parameter on every request, so no cache helps.
+
+    python benchmarks/load_test.py --concurrency 8 --duration 30
+    python benchmarks/load_test.py --gunicorn --workers 2 --threads 4 --concurrency 16
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --mix advanced_plot=1,symbolic=1
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXPRESSIONS = ('x^2', 'sin(x)*cos(x)', 'exp(-x^2)', 'x^3 - 6*x^2 + 11*x - 6')
+
+
+def _advanced_plot(rng, unique):
+    return 'POST', '/advanced_plot', {}, {
+        'function_type': rng.choice(('sin', 'cos', 'square')),
+        'amplitude': 1, 'frequency': rng.choice((1, 2)),
+        'phase': rng.random() if unique else 0,
+        'x_min': -10, 'x_max': 10, 'num_points': 1000,
+    }
+
+
+def _animation(rng, unique):
+    return 'GET', '/api/animation', {
+        'animation_type': rng.choice(('pendulum', 'wave', 'lissajous')),
+        'num_frames': rng.randint(10, 40) if unique else 20,
+    }, None
+
+
+def _symbolic(rng, unique):
+    expression = rng.choice(EXPRESSIONS)
+    if unique:
+        expression = f'{rng.randint(2, 10**6)}*({expression})'
+    return 'POST', '/symbolic', {}, {
+        'expression': expression,
+        'operation': rng.choice(('simplify', 'differentiate', 'integrate')),
+    }
+
+
+def _matrix_operation(rng, unique):
+    return 'POST', '/matrix_operation', {}, {
+        'operation': rng.choice(('eigenvalues', 'svd', 'matrix')),
+        'size': rng.choice((10, 50, 200)),
+        'seed': rng.randint(0, 10**6) if unique else 42,
+    }
+
+
+def _differential_equation(rng, unique):
+    return 'GET', '/api/differential_equation', {
+        'eq_type': rng.choice(('spring', 'pendulum', 'predator_prey', 'lorenz')),
+        't_max': round(rng.uniform(5, 50), 3) if unique else 10,
+        'num_points': 500,
+    }, None
+
+
+# Endpoint name -> function(rng, unique) returning (method, path, query, json body)
+ENDPOINTS = {
+    'advanced_plot': _advanced_plot,
+    'animation': _animation,
+    'symbolic': _symbolic,
+    'matrix_operation': _matrix_operation,
+    'differential_equation': _differential_equation,
+}
+
+DEFAULT_MIX = 'advanced_plot=4,differential_equation=2,symbolic=2,matrix_operation=1,animation=1'
+
+
+def parse_mix(text):
+    """{'endpoint': weight} from 'endpoint=weight,endpoint=weight'"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}'; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _is_error(status, body):
+    if status >= 400:
+        return True
+    try:
+        return json.loads(body).get('status') == 'error'
+    except (ValueError, AttributeError):
+        # PNG, npz or other non-JSON bodies
+        return False
+
+
+class TestClientTarget:
+    """Requests through Flask's test client, one client per thread"""
+
+    name = 'in-process'
+
+    def __init__(self):
+        sys.path.insert(0, ROOT_DIR)
+        from webapp.app import app
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, query, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, query_string=query, json=body)
+        return response.status_code, response.get_data()
+
+
+class HTTPTarget:
+    """Requests over HTTP keep-alive connections, one per thread"""
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.name = url
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, query, body):
+        url = self.prefix + path + ('?' + urllib.parse.urlencode(query) if query else '')
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        for attempt in (0, 1):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=600)
+            try:
+                connection.request(method, url, body=payload, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server may close an idle keep-alive connection; retry once on a new one
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+
+def start_gunicorn(port, workers, threads):
+    """Start gunicorn on wsgi:app and wait until /healthz answers"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--timeout', '600', 'wsgi:app'],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/healthz')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("gunicorn did not answer /healthz within 60 s")
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def run(target, mix, concurrency, duration, warmup, unique, extra_query, seed):
+    """Drive `target` for warmup + duration seconds
+
+    Returns {endpoint: [(seconds, error)]} for the requests started after the
+    warm-up, and the seconds from the end of the warm-up until the last of
+    them finished (slow requests are waited for, not dropped).
+    """
+    names, weights = list(mix), list(mix.values())
+    samples = defaultdict(list)
+    samples_lock = threading.Lock()
+    last_finish = [0.0]
+    start = time.monotonic()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        local = defaultdict(list)
+        while True:
+            started = time.monotonic()
+            if started >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            method, path, query, body = ENDPOINTS[name](rng, unique)
+            try:
+                status, content = target.request(method, path, {**query, **extra_query}, body)
+                error = _is_error(status, content)
+            except Exception as e:
+                print(f"{name}: {e}", file=sys.stderr)
+                error = True
+            finished = time.monotonic()
+            # Requests begun during the warm-up only warm caches and engines
+            if started >= measure_from:
+                local[name].append((finished - started, error))
+        with samples_lock:
+            last_finish[0] = max(last_finish[0], time.monotonic())
+            for name, values in local.items():
+                samples[name].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, max(last_finish[0] - measure_from, 1e-9)
+
+
+def summarize(samples, elapsed):
+    """Per-endpoint and total throughput, latency percentiles (ms) and error rate"""
+    rows = {}
+    everything = []
+    for name in sorted(samples) + ['total']:
+        values = everything if name == 'total' else samples[name]
+        if name != 'total':
+            everything.extend(values)
+        latencies = sorted(seconds for seconds, _ in values)
+        errors = sum(error for _, error in values)
+        rows[name] = {
+            'requests': len(values),
+            'errors': errors,
+            'error_rate': errors / len(values) if values else 0.0,
+            'throughput_rps': len(values) / elapsed,
+            'p50_ms': percentile(latencies, 50) * 1e3,
+            'p95_ms': percentile(latencies, 95) * 1e3,
+            'p99_ms': percentile(latencies, 99) * 1e3,
+            'max_ms': latencies[-1] * 1e3 if latencies else float('nan'),
+        }
+    return rows
+
+
+def report(rows):
+    print(f"{'endpoint':<24} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'errors':>8}")
+    for name, row in rows.items():
+        print(f"{name:<24} {row['requests']:>9,d} {row['throughput_rps']:>8.2f} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f} {row['error_rate']:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight,... (endpoints: %s)' % ', '.join(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=4, help='requests in flight')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before the measurement')
+    parser.add_argument('--unique', action='store_true', help='vary parameters so caches never hit')
+    parser.add_argument('--query', default='', help='extra query string for every request, e.g. plot_format=url')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the request mix')
+    parser.add_argument('--url', help='load an already running server instead of the in-process app')
+    parser.add_argument('--gunicorn', action='store_true', help='start gunicorn on wsgi:app for the run')
+    parser.add_argument('--port', type=int, default=8765, help='port for --gunicorn')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--json', metavar='PATH', help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    extra_query = dict(urllib.parse.parse_qsl(args.query))
+    server = None
+    if args.gunicorn:
+        server = start_gunicorn(args.port, args.workers, args.threads)
+        target = HTTPTarget(f'http://127.0.0.1:{args.port}')
+        target.name = f'gunicorn --workers {args.workers} --threads {args.threads}'
+    elif args.url:
+        target = HTTPTarget(args.url)
+    else:
+        target = TestClientTarget()
+
+    try:
+        print(f"Loading {target.name}: concurrency {args.concurrency}, {args.warmup:g} s warm-up, "
+              f"{args.duration:g} s measured\n")
+        samples, elapsed = run(target, mix, args.concurrency, args.duration, args.warmup,
+                      args.unique, extra_query, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    rows = summarize(samples, elapsed)
+    report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'target': target.name,
+                'mix': mix,
+                'concurrency': args.concurrency,
+                'duration': elapsed,
+                'unique': args.unique,
+                'endpoints': rows,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
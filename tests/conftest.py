@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The webapp modules import each other both as a package and by bare name
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    """Flask test client of the web app, with its state in a temp directory
+
+    The bridge reads its configuration when first imported, so the
+    environment is set before the app is.
+    """
+    state = tmp_path_factory.mktemp('state')
+    os.environ.update({
+        'RESULT_CACHE': '0',
+        'PLOT_STORE_DIR': str(state / 'plots'),
+        'JOB_DB': str(state / 'jobs' / 'jobs.sqlite3'),
+        'FALLBACK_WORKERS': '1',
+    })
+    from webapp.app import app
+    return app.test_client()
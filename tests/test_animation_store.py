@@ -0,0 +1,56 @@
+import os
+import time
+
+from webapp.animation_store import MANIFEST, AnimationStore
+
+
+def test_keys_depend_on_every_part():
+    key = AnimationStore.key('pendulum', 20, 'python')
+    assert key == AnimationStore.key('pendulum', '20', 'python')
+    assert key != AnimationStore.key('pendulum', 21, 'python')
+    assert key != AnimationStore.key('pendulum', 20, 'matlab')
+    assert key != AnimationStore.key('wave', 20, 'python')
+
+
+def test_urls_map_back_to_files_inside_the_store(tmp_path):
+    store = AnimationStore(str(tmp_path))
+    url = f"{store.url('abc')}/frame_001.png"
+    assert store.path(url) == os.path.join(str(tmp_path), 'abc', 'frame_001.png')
+    assert store.path('/static/plots/frame_001.png') is None
+    assert store.path(f"{store.url_prefix}/../secret") is None
+    assert store.path(None) is None
+
+
+def quiet_store(root, **options):
+    """Store whose commits do not start background sweeps"""
+    store = AnimationStore(root, **options)
+    store.schedule_sweep = lambda: None
+    return store
+
+
+def test_only_committed_sets_are_found(tmp_path):
+    store = quiet_store(str(tmp_path))
+    key = AnimationStore.key('pendulum', 2, 'python')
+    store.directory(key)
+    assert store.lookup(key) is None
+    store.commit(key, {'status': 'success', 'frame_urls': ['a', 'b']})
+    assert store.lookup(key) == {'status': 'success', 'frame_urls': ['a', 'b']}
+
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_sweep_evicts_expired_stale_and_least_recently_used(tmp_path):
+    store = quiet_store(str(tmp_path), max_bytes=1500, max_age=600, stale_build_age=60)
+    for key, age in [('expired', 3600), ('old', 30), ('new', 0)]:
+        store.commit(key, {'key': key})
+        with open(os.path.join(store.directory(key), 'frame.png'), 'wb') as f:
+            f.write(b'x' * 1000)
+        _age(os.path.join(str(tmp_path), key, MANIFEST), age)
+    _age(store.directory('building'), 10)
+    _age(store.directory('abandoned'), 3600)
+
+    store.sweep()
+    assert sorted(os.listdir(str(tmp_path))) == ['building', 'new']
@@ -0,0 +1,45 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from webapp.downsample import downsample, downsample_series, lttb_indices, minmax_indices  # noqa: E402
+
+
+def test_short_series_are_untouched():
+    x = np.arange(10.0)
+    assert downsample(x, x, 100)[0] is x
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10_000.0)
+    y = np.zeros_like(x)
+    y[1234], y[8765] = 5.0, -5.0
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert {1234, 8765} <= set(indices.tolist())
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    y = np.sin(np.linspace(0, 20, 100_003))
+    indices = minmax_indices([y], 100)
+    assert y[indices].max() == y.max() and y[indices].min() == y.min()
+
+
+def test_long_series_are_cut_to_the_budget():
+    x = np.linspace(0, 1, 1_000_000)
+    xs, ys = downsample(x, np.sin(50 * x), 2000)
+    assert len(xs) == 2000
+    assert ys.max() == pytest.approx(1, abs=1e-3)
+
+
+def test_data_results_are_cut_along_their_axis():
+    t = np.linspace(0, 1, 50_000)
+    states = [np.vstack([np.sin(t), np.cos(t)])]
+    reduced = downsample_series({'t': t, 'states': states, 'eq_type': 'spring'}, 1000)
+    n = len(reduced['t'])
+    assert n <= 1100
+    assert reduced['states'][0].shape == (2, n)
+    assert reduced['downsampled_from'] == 50_000
+    assert reduced['eq_type'] == 'spring'
@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+from webapp.engine_pool import EngineCallTimeout, EnginePoolTimeout, FakeEngine, MatlabEnginePool
+
+
+def make_pool(size=2, functions=None, **kwargs):
+    engines = []
+
+    def factory():
+        engine = FakeEngine(functions or {'add': lambda a, b: a + b})
+        engines.append(engine)
+        return engine
+
+    pool = MatlabEnginePool(factory, size=size, **kwargs)
+    pool.start(wait=True)
+    return pool, engines
+
+
+def test_checkouts_fan_out_over_distinct_engines():
+    pool, engines = make_pool(size=3)
+    held, barrier = [], threading.Barrier(3)
+
+    def borrow():
+        with pool.checkout(timeout=5) as eng:
+            held.append(eng)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=borrow) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(eng) for eng in held}) == 3
+    assert len(engines) == 3
+    assert pool.status()['idle'] == 3
+
+
+def test_checkout_times_out_when_every_engine_is_busy():
+    pool, _ = make_pool(size=1)
+    with pool.checkout(timeout=1):
+        started = time.monotonic()
+        with pytest.raises(EnginePoolTimeout):
+            with pool.checkout(timeout=0.1):
+                pass
+        assert time.monotonic() - started < 1
+    assert pool.stats['timeouts'] == 1
+
+
+def test_dead_engine_is_replaced():
+    pool, engines = make_pool(size=1)
+    with pytest.raises(RuntimeError):
+        with pool.checkout(timeout=1) as eng:
+            eng.quit()
+            eng.add(1, 2)
+    pool.start(wait=True)
+    assert pool.stats['recycled'] == 1
+    with pool.checkout(timeout=1) as eng:
+        assert eng is engines[-1] and eng.alive
+        assert eng.add(1, 2) == 3
+
+
+def test_matlab_error_keeps_a_live_engine():
+    pool, engines = make_pool(size=1, functions={'fail': lambda: 1 / 0})
+    with pytest.raises(ZeroDivisionError):
+        with pool.checkout(timeout=1) as eng:
+            eng.fail()
+    assert pool.stats['recycled'] == 0
+    with pool.checkout(timeout=1) as eng:
+        assert eng is engines[0]
+
+
+def test_worn_out_engine_is_recycled():
+    pool, engines = make_pool(size=1, max_uses=2)
+    for _ in range(2):
+        with pool.checkout(timeout=1):
+            pass
+    pool.start(wait=True)
+    assert pool.stats['recycled'] == 1
+    assert len(engines) == 2
+
+
+def test_idle_engine_failing_health_check_is_skipped():
+    pool, engines = make_pool(size=1, health_check_interval=0)
+    engines[0].alive = False
+    pool.start(wait=True)
+    with pool.checkout(timeout=5) as eng:
+        assert eng is not engines[0] and eng.alive
+
+
+def test_unrecovered_call_timeout_replaces_the_engine():
+    pool, engines = make_pool(size=1)
+    with pytest.raises(EngineCallTimeout):
+        with pool.checkout(timeout=1):
+            raise EngineCallTimeout("overran", recovered=False)
+    pool.start(wait=True)
+    assert pool.stats['call_timeouts'] == 1
+    assert pool.stats['recycled'] == 1
+
+
+def test_background_calls_return_futures():
+    pool, _ = make_pool(size=1, functions={'slow': lambda: time.sleep(1)})
+    with pool.checkout(timeout=1) as eng:
+        future = eng.slow(background=True)
+        with pytest.raises(TimeoutError):
+            future.result(timeout=0.05)
+        assert future.cancel()
+
+
+def test_struct_arguments_reach_the_function_as_dicts():
+    pool, _ = make_pool(size=1, functions={'echo': lambda params: params})
+    with pool.checkout(timeout=1) as eng:
+        assert eng.echo(eng.struct({'n': 3})) == {'n': 3}
+
+
+def test_release_after_shutdown_quits_the_engine():
+    pool, engines = make_pool(size=1)
+    with pool.checkout(timeout=1) as eng:
+        pool.shutdown()
+    assert not eng.alive
+
+
+def test_failed_starts_are_retried_with_backoff():
+    attempts = []
+
+    def factory():
+        attempts.append(time.monotonic())
+        if len(attempts) <= 2:
+            raise RuntimeError('no license')
+        return FakeEngine()
+
+    pool = MatlabEnginePool(factory, size=1, retry_delay=0.05)
+    pool.start(wait=True)
+    assert pool.state == 'retrying'
+    assert pool.status()['retry_in_seconds'] is not None
+    deadline = time.monotonic() + 5
+    while pool.state != 'ready' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.state == 'ready'
+    assert len(attempts) == 3
+    # The delay doubles after the second failure
+    assert attempts[1] - attempts[0] >= 0.05
+    assert attempts[2] - attempts[1] >= 0.1
+    status = pool.status()
+    assert (status['start_failures'], status['start_retries'], status['retry_in_seconds']) == (2, 2, None)
+
+
+def test_shutdown_cancels_a_pending_retry():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        raise RuntimeError('no license')
+
+    pool = MatlabEnginePool(factory, size=1, retry_delay=0.05)
+    pool.start(wait=True)
+    pool.shutdown()
+    time.sleep(0.2)
+    assert len(attempts) == 1
+    assert pool.state == 'failed'
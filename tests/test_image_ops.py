@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+ndimage = pytest.importorskip('scipy.ndimage')
+
+from webapp import image_ops
+from webapp.image_ops import TILE_ROWS, gradient_magnitude, mean_filter, process
+
+# Spans three bands, the last one partial
+HEIGHT = 2 * TILE_ROWS + 37
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).random((HEIGHT, 300), dtype=np.float32)
+
+
+def test_banded_gradient_equals_whole_image(image):
+    gy, gx = np.gradient(image)
+    np.testing.assert_array_equal(gradient_magnitude(image), np.hypot(gx, gy))
+
+
+def test_banded_mean_filter_equals_whole_image(image):
+    expected = ndimage.uniform_filter(image, 5, mode='nearest')
+    interior = (slice(4, HEIGHT - 5), slice(4, 300 - 5))
+    filtered = mean_filter(image)
+    np.testing.assert_array_equal(filtered[interior], expected[interior])
+    # The border is left as it was, as in the MATLAB loop
+    border = np.ones(image.shape, dtype=bool)
+    border[interior] = False
+    np.testing.assert_array_equal(filtered[border], image[border])
+
+
+def test_banded_noise_equals_one_draw():
+    size = TILE_ROWS + 100
+    original, noisy = image_ops.test_image(size, 0.3, seed=7)
+    noise = np.random.default_rng(7).standard_normal((size, size), dtype=np.float32)
+    np.testing.assert_allclose(noisy, np.clip(original + 0.3 * noise, 0, 1), atol=1e-6)
+    assert original.min() == 0 and original.max() == pytest.approx(1)
+
+
+def test_sizes_are_bounded(monkeypatch):
+    monkeypatch.setattr(image_ops, 'MAX_SIZE', 64)
+    with pytest.raises(ValueError):
+        process(size=65)
+    with pytest.raises(ValueError):
+        process(size=4)
+
+
+@pytest.mark.parametrize('operation', ['edge', 'filter', 'segment', 'transform'])
+def test_every_operation_fills_four_panels(operation):
+    result = process(operation, size=64, seed=1)
+    assert len(result['panels']) == 4
+    assert all(panel.shape == (64, 64) for _, panel in result['panels'])
+    assert operation in result['timings']
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from webapp.job_store import JobQueueFull, JobRunner, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs' / 'jobs.sqlite3'), ttl=60, stale_ttl=600)
+
+
+def backdate(store, job_id, column, seconds):
+    with store._connect() as db:
+        db.execute(f'UPDATE jobs SET {column} = ? WHERE id = ?', (time.time() - seconds, job_id))
+
+
+def wait_for(store, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job['finished'] is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_records_keep_their_result_objects(store):
+    job_id = store.create('f', {'n': 3}, {'result_format': 'data'})
+    assert store.get(job_id)['status'] == 'queued'
+    store.start(job_id)
+    store.finish(job_id, 'done', {'values': (1, 2.5), 'label': 'x'})
+    job = store.get(job_id)
+    assert job['status'] == 'done'
+    assert job['params'] == {'n': 3} and job['options'] == {'result_format': 'data'}
+    assert job['result'] == {'values': (1, 2.5), 'label': 'x'}
+    assert 'result' not in store.get(job_id, with_result=False)
+
+
+def test_only_finished_jobs_expire_after_the_ttl(store):
+    running, finished = store.create('f', {}), store.create('f', {})
+    store.start(running)
+    store.finish(finished, 'done', {})
+    for job_id in (running, finished):
+        backdate(store, job_id, 'created', 120)
+    backdate(store, finished, 'finished', 120)
+    assert store.get(finished) is None
+    assert store.get(running)['status'] == 'running'
+    assert store.sweep() == 1
+
+
+def test_unfinished_jobs_expire_after_the_stale_ttl(store):
+    job_id = store.create('f', {})
+    backdate(store, job_id, 'created', 1200)
+    assert store.get(job_id) is None
+    assert store.sweep() == 1
+    assert store.counts() == {}
+
+
+def test_runner_records_each_outcome(store):
+    def run(function_name, params):
+        if function_name == 'raise':
+            raise RuntimeError('boom')
+        return {'status': params['status'], 'message': 'from run'}
+
+    runner = JobRunner(store, run)
+    done = wait_for(store, runner.submit('ok', {'status': 'success'}))
+    assert done['status'] == 'done' and done['result']['status'] == 'success'
+    assert wait_for(store, runner.submit('late', {'status': 'timeout'}))['status'] == 'timeout'
+    failed = wait_for(store, runner.submit('raise', {}))
+    assert failed['status'] == 'error' and failed['message'] == 'boom'
+
+
+def test_a_full_queue_refuses_jobs(store):
+    release = threading.Event()
+    runner = JobRunner(store, lambda function_name, params: release.wait(5) and {}, workers=1, max_queued=1)
+    first = runner.submit('f', {})
+    deadline = time.monotonic() + 5
+    while runner.queued() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    runner.submit('f', {})
+    with pytest.raises(JobQueueFull):
+        runner.submit('f', {})
+    release.set()
+    assert wait_for(store, first)['status'] == 'done'
+
+
+def test_jobs_api_runs_a_call_in_the_background(client):
+    response = client.post('/api/jobs', json={'function': 'advanced_plot', 'params': {'num_points': 20},
+                                              'result_format': 'data'})
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    assert response.headers['Location'].endswith(status_url)
+    deadline = time.monotonic() + 30
+    while (job := client.get(status_url).get_json())['status'] in ('queued', 'running'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert job['status'] == 'done'
+    assert len(job['result']['y']) == 20
+    assert client.get(status_url + '?format=npz').mimetype == 'application/x-npz'
+
+
+def test_jobs_api_errors(client, monkeypatch):
+    assert client.post('/api/jobs', json={'function': 'no_such_function'}).status_code == 400
+    assert client.get('/api/jobs/0123456789abcdef').status_code == 404
+    # Imported here, after the client fixture has configured the bridge
+    from webapp.matlab_bridge import get_job_runner
+    runner = get_job_runner()
+    monkeypatch.setattr(runner, '_queued', runner.max_queued)
+    response = client.post('/api/jobs', json={'function': 'advanced_plot'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
@@ -0,0 +1,66 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+linalg = pytest.importorskip('scipy.linalg')
+
+from webapp import linalg_ops
+from webapp.linalg_ops import check_size, process, random_matrix
+
+
+def test_matrix_matches_matlab_rand():
+    # rng(42); rand(3, 3) and rng(0); rand(2, 2) in MATLAB
+    np.testing.assert_allclose(random_matrix(3, 42), [[0.3745, 0.5987, 0.0581],
+                                                      [0.9507, 0.1560, 0.8662],
+                                                      [0.7320, 0.1560, 0.6011]], atol=1e-4)
+    np.testing.assert_allclose(random_matrix(2, 0), [[0.8147, 0.1270],
+                                                     [0.9058, 0.9134]], atol=1e-4)
+
+
+def test_sizes_are_bounded_by_memory(monkeypatch):
+    monkeypatch.setattr(linalg_ops, 'MAX_BYTES', 8 * 100 * 100)
+    assert check_size(100) == 100
+    with pytest.raises(ValueError):
+        check_size(101)
+    with pytest.raises(ValueError):
+        check_size(0)
+
+
+def test_small_matrices_get_every_value():
+    result = process('eigenvalues', 5)
+    expected = linalg.eigvals(random_matrix(5))
+    np.testing.assert_allclose(np.sort_complex(result['eigenvalues']), np.sort_complex(expected))
+    assert 'LAPACK' in result['method']
+    result = process('svd', 5)
+    np.testing.assert_allclose(result['singular_values'], linalg.svdvals(random_matrix(5)))
+
+
+@pytest.fixture
+def truncated(monkeypatch):
+    """Send everything above 10x10 to ARPACK"""
+    monkeypatch.setattr(linalg_ops, 'EXACT_MAX_SIZE', 10)
+    return 80
+
+
+def test_large_matrices_get_the_largest_eigenvalues(truncated):
+    result = process('eigenvalues', truncated)
+    assert 'ARPACK' in result['method']
+    values = np.asarray(result['eigenvalues'])
+    expected = linalg.eigvals(random_matrix(truncated))
+    expected = expected[np.argsort(-np.abs(expected))]
+    # The dominant (Perron) eigenvalue is found exactly; the rest lie in
+    # the bulk, so only their magnitudes are compared
+    np.testing.assert_allclose(np.abs(values).max(), np.abs(expected[0]))
+    assert np.abs(values).min() >= np.abs(expected[len(values) + 2]) - 1e-8
+
+
+def test_large_matrices_get_the_largest_singular_values(truncated):
+    result = process('svd', truncated)
+    assert 'ARPACK' in result['method']
+    expected = linalg.svdvals(random_matrix(truncated))
+    values = result['singular_values']
+    np.testing.assert_allclose(values, expected[:len(values)], rtol=1e-8)
+
+
+def test_truncated_results_are_reproducible(truncated):
+    first = process('eigenvalues', truncated)['eigenvalues']
+    np.testing.assert_array_equal(first, process('eigenvalues', truncated)['eigenvalues'])
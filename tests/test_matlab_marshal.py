@@ -0,0 +1,102 @@
+import array
+import types
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from webapp import matlab_marshal
+from webapp.matlab_marshal import is_matlab_array, to_matlab, to_numpy
+
+TYPECODES = {'double': 'd', 'single': 'f', 'int8': 'b', 'uint8': 'B', 'int16': 'h', 'uint16': 'H',
+             'int32': 'i', 'uint32': 'I', 'int64': 'q', 'uint64': 'Q', 'logical': 'B'}
+
+
+def legacy_class(name):
+    """An engine array class before R2022a: flat column-major array.array storage"""
+    typecode = TYPECODES[name]
+
+    def __init__(self, initializer=None, size=None, is_complex=False):
+        self.size = tuple(size)
+        empty = lambda: array.array(typecode, bytes(np.prod(self.size, dtype=int) * np.dtype(typecode).itemsize))
+        if is_complex:
+            self._real, self._imag = empty(), empty()
+        else:
+            self._data = empty()
+
+    return type(name, (), {'__init__': __init__, '__module__': 'matlab.mlarray'})
+
+
+def modern_class(name):
+    """An engine array class from R2022a: built from and exporting a buffer"""
+    def __new__(cls, initializer=None, size=None, is_complex=False):
+        data = np.zeros(size) if initializer is None else np.array(initializer)
+        return np.asfortranarray(data).view(cls)
+
+    return type(name, (np.ndarray,), {'__new__': __new__, '__module__': 'matlab',
+                                      'size': property(lambda self: self.shape)})
+
+
+def install(monkeypatch, flavour):
+    """Give matlab_marshal a `matlab` package whose classes are made by `flavour`"""
+    module = types.ModuleType('matlab')
+    for name in TYPECODES:
+        setattr(module, name, flavour(name))
+    monkeypatch.setattr(matlab_marshal, 'matlab', module)
+    monkeypatch.setattr(matlab_marshal, '_legacy', {})
+
+
+@pytest.fixture(params=[legacy_class, modern_class], ids=['legacy', 'modern'])
+def engine(request, monkeypatch):
+    install(monkeypatch, request.param)
+
+
+@pytest.mark.parametrize('values', [
+    np.arange(12, dtype=np.float64).reshape(3, 4),
+    np.arange(24, dtype=np.float32).reshape(2, 3, 4),
+    np.array([[1 + 2j, 3 - 4j], [5j, -6]], dtype=np.complex128),
+    np.array([[1, -2, 3]], dtype=np.int8),
+    np.array([[2 ** 40, 7]], dtype=np.int64),
+    np.array([[True, False], [False, True]]),
+], ids=['double', 'single', 'complex', 'int8', 'int64', 'logical'])
+def test_round_trip_keeps_values_shape_and_class(engine, values):
+    converted = to_matlab(values)
+    assert is_matlab_array(converted)
+    assert type(converted).__name__ == matlab_marshal.matlab_class(values.dtype)
+    back = to_numpy(converted, copy=True)
+    assert back.dtype == values.dtype
+    np.testing.assert_array_equal(back, values)
+
+
+def test_vectors_and_scalars_become_at_least_2d(engine):
+    assert to_numpy(to_matlab(np.arange(5.0))).shape == (1, 5)
+    assert to_numpy(to_matlab(3.5)).shape == (1, 1)
+
+
+def test_legacy_arrays_are_filled_column_major(monkeypatch):
+    install(monkeypatch, legacy_class)
+    converted = to_matlab(np.array([[1.0, 2.0], [3.0, 4.0]]))
+    assert list(converted._data) == [1.0, 3.0, 2.0, 4.0]
+    converted = to_matlab(np.array([[1 + 1j, 2], [3, 4 - 1j]]))
+    assert list(converted._real) == [1.0, 3.0, 2.0, 4.0]
+    assert list(converted._imag) == [1.0, 0.0, 0.0, -1.0]
+
+
+def test_class_can_be_overridden(engine):
+    converted = to_matlab(np.array([[1, 2, 3]]), 'double')
+    assert type(converted).__name__ == 'double'
+    assert to_numpy(converted).dtype == np.float64
+
+
+def test_copies_do_not_share_the_engine_array(engine):
+    converted = to_matlab(np.zeros((2, 2)))
+    copied = to_numpy(converted, copy=True)
+    copied[0, 0] = 1
+    assert to_numpy(converted)[0, 0] == 0
+
+
+def test_without_the_engine_package(monkeypatch):
+    monkeypatch.setattr(matlab_marshal, 'matlab', None)
+    with pytest.raises(RuntimeError):
+        to_matlab(np.zeros(3))
+    assert not is_matlab_array(np.zeros(3))
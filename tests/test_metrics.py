@@ -0,0 +1,77 @@
+import pytest
+
+from webapp import metrics
+
+
+@pytest.fixture
+def registered():
+    """Metrics created by a test, unregistered again afterwards"""
+    created = []
+
+    def register(kind, *args, **kwargs):
+        metric = kind(*args, **kwargs)
+        created.append(metric)
+        return metric
+
+    yield register
+    for metric in created:
+        metrics._registry.remove(metric)
+
+
+def sample(text, series):
+    """Value of one series in a Prometheus text exposition, 0 if absent"""
+    for line in text.splitlines():
+        name, _, value = line.rpartition(' ')
+        if name == series:
+            return float(value)
+    return 0.0
+
+
+def test_counters_render_per_label_set(registered):
+    counter = registered(metrics.Counter, 'test_events', 'Events', ('kind',))
+    counter.labels('a').inc()
+    counter.labels('a').inc(2)
+    counter.labels('say "hi"\n').inc()
+    text = metrics.render()
+    assert '# TYPE test_events counter' in text
+    assert sample(text, 'test_events_total{kind="a"}') == 3
+    assert sample(text, 'test_events_total{kind="say \\"hi\\"\\n"}') == 1
+
+
+def test_histograms_render_cumulative_buckets(registered):
+    histogram = registered(metrics.Histogram, 'test_seconds', 'Seconds', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.labels('load').observe(value)
+    text = metrics.render()
+    assert sample(text, 'test_seconds_bucket{stage="load",le="0.1"}') == 2
+    assert sample(text, 'test_seconds_bucket{stage="load",le="1.0"}') == 3
+    assert sample(text, 'test_seconds_bucket{stage="load",le="+Inf"}') == 4
+    assert sample(text, 'test_seconds_count{stage="load"}') == 4
+    assert sample(text, 'test_seconds_sum{stage="load"}') == pytest.approx(5.65)
+
+
+def test_disabled_metrics_record_nothing(registered, monkeypatch):
+    counter = registered(metrics.Counter, 'test_disabled', 'Disabled')
+    histogram = registered(metrics.Histogram, 'test_disabled_seconds', 'Disabled')
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    counter.labels().inc()
+    with histogram.labels().time():
+        pass
+    text = metrics.render()
+    assert sample(text, 'test_disabled_total') == 0
+    assert sample(text, 'test_disabled_seconds_count') == 0
+
+
+def test_metrics_endpoint_counts_calls_and_requests(client):
+    calls = 'matlab_bridge_calls_total{function="advanced_plot",backend="python",outcome="success"}'
+    requests = 'http_requests_total{endpoint="advanced_plot",method="POST",status="200"}'
+    before = client.get('/metrics').get_data(as_text=True)
+    response = client.post('/advanced_plot?format=data', json={'num_points': 20})
+    assert response.status_code == 200
+
+    response = client.get('/metrics')
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert sample(text, calls) == sample(before, calls) + 1
+    assert sample(text, requests) == sample(before, requests) + 1
+    assert sample(text, 'matlab_bridge_stage_seconds_count{scope="advanced_plot",stage="json"}') >= 1
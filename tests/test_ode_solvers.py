@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+solve_ivp = pytest.importorskip('scipy.integrate').solve_ivp
+
+from webapp.ode_solvers import ODE_SYSTEMS, get_system, integrate, solve, time_grid
+
+
+def reference(system, y0, params, t):
+    """One member integrated on its own with tight tolerances"""
+    p = {name: np.array([[value]]) for name, value in params.items()}
+
+    def rhs(_, y):
+        return system.derivative(y.reshape(len(y), 1, 1), p).ravel()
+
+    solution = solve_ivp(rhs, (0, t[-1]), y0, t_eval=t, method='RK45', rtol=1e-10, atol=1e-10)
+    assert solution.success
+    return solution.y
+
+
+# The Lorenz system is chaotic, so it is only compared over a short span
+@pytest.mark.parametrize('name, t_max', [('spring', 10), ('pendulum', 10), ('predator_prey', 10), ('lorenz', 2)])
+def test_solve_matches_solve_ivp(name, t_max):
+    system, t, states = solve(name, t_max, 200)
+    assert len(states) == len(system.initial_states)
+    for y0, y in zip(system.initial_states, states):
+        expected = reference(system, y0, system.defaults, t)
+        assert y.shape == expected.shape
+        np.testing.assert_allclose(y, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_batched_members_match_separate_solves():
+    system = ODE_SYSTEMS['spring']
+    t = time_grid(10, 100)
+    stiffness = [1.0, 4.0, 9.0]
+    states = integrate(system, [[1, 0]] * 3, {'m': 1.0, 'c': 0.5, 'k': stiffness}, t[-1])(t)
+    assert states.shape == (3, 2, len(t))
+    for k, y in zip(stiffness, states):
+        expected = reference(system, [1, 0], {'m': 1.0, 'c': 0.5, 'k': k}, t)
+        np.testing.assert_allclose(y, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_grid_and_fallback_follow_matlab():
+    assert len(time_grid(5, 10)) == 50
+    assert get_system('Unknown').name == 'spring'
+    with pytest.raises(ValueError):
+        time_grid(0, 100)
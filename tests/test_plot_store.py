@@ -0,0 +1,32 @@
+import os
+import time
+
+from webapp.plot_store import PlotStore
+
+
+def test_hits_keep_plots_from_expiring(tmp_path):
+    store = PlotStore(directory=str(tmp_path), max_age=60)
+    digest = store.put(b'png bytes')
+    path = os.path.join(str(tmp_path), digest + '.png')
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+    assert store.get(digest) == b'png bytes'
+    store._trim_disk()
+    assert os.path.exists(path)
+
+
+def test_evicted_file_is_rewritten_from_memory(tmp_path):
+    store = PlotStore(directory=str(tmp_path))
+    digest = store.put(b'png bytes')
+    os.remove(os.path.join(str(tmp_path), digest + '.png'))
+    store.put(b'png bytes')
+    assert PlotStore(directory=str(tmp_path)).get(digest) == b'png bytes'
+
+
+def test_shared_directory_is_refused(tmp_path):
+    tmp_path.chmod(0o777)
+    store = PlotStore(directory=str(tmp_path))
+    assert store.directory is None
+    digest = store.put(b'png bytes')
+    assert store.get(digest) == b'png bytes'
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from webapp.private_dir import private_dir
+
+
+def test_creates_directory_with_mode_0700(tmp_path):
+    path = str(tmp_path / 'state')
+    private_dir(path)
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX permissions only')
+def test_refuses_symlinks(tmp_path):
+    target = tmp_path / 'elsewhere'
+    target.mkdir()
+    link = tmp_path / 'state'
+    link.symlink_to(target)
+    with pytest.raises(PermissionError):
+        private_dir(str(link))
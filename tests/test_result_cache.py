@@ -0,0 +1,38 @@
+from webapp.result_cache import ResultCache, make_key
+
+
+def test_key_ignores_number_types_none_and_ignored_params():
+    assert make_key('f', {'n': 1, 'x': None}, 'python') == make_key('f', {'n': 1.0}, 'python')
+    assert make_key('f', {'n': 1, 'path': 'a'}, 'python', ('path',)) == make_key('f', {'n': 1}, 'python')
+    assert make_key('f', {'n': 1}, 'python') != make_key('f', {'n': 1}, 'matlab')
+
+
+def test_hits_are_private_copies():
+    cache = ResultCache()
+    cache.put('k', {'values': [1, 2]})
+    cache.get('k')['values'].append(3)
+    assert cache.get('k') == {'values': [1, 2]}
+    assert cache.stats()['hits'] == 2
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResultCache(max_bytes=300)
+    for key in 'abc':
+        cache.put(key, 'x' * 100)
+    assert cache.get('a') is None
+    assert cache.get('c') == 'x' * 100
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_disk_tier_is_shared(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).put('k', {'v': 1})
+    other = ResultCache(disk_dir=str(tmp_path))
+    assert other.get('k') == {'v': 1}
+    assert other.stats()['disk_hits'] == 1
+
+
+def test_shared_disk_dir_is_refused(tmp_path):
+    tmp_path.chmod(0o777)
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.disk_dir is None
+    assert tmp_path.stat().st_mode & 0o777 == 0o777
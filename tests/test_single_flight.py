@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from webapp.single_flight import SingleFlight, fcntl
+
+
+def run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_callers_share_one_computation():
+    flight, calls, results = SingleFlight(), [], []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'value': 42}
+
+    run_concurrently(10, lambda: results.append(flight.do('key', compute)))
+    assert len(calls) == 1
+    assert [value for value, _ in results] == [{'value': 42}] * 10
+    assert sum(shared for _, shared in results) == 9
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_exceptions_reach_every_caller():
+    flight, errors = SingleFlight(), []
+
+    def compute():
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flight.do('key', compute)
+        except ValueError as e:
+            errors.append(e)
+
+    run_concurrently(5, call)
+    assert len(errors) == 5
+
+
+def test_finished_calls_are_not_remembered():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == (1, False)
+    assert flight.do('key', lambda: 2) == (2, False)
+
+
+def test_file_lock_without_a_directory_is_a_no_op():
+    with SingleFlight().file_lock('key') as locked:
+        assert locked is False
+
+
+@pytest.mark.skipif(fcntl is None, reason='needs fcntl')
+def test_shared_lock_dir_falls_back_to_process_local(tmp_path):
+    tmp_path.chmod(0o777)
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    assert flight.lock_dir is None
+    assert flight.do('key', lambda: 1) == (1, False)
+
+
+@pytest.mark.skipif(fcntl is None, reason='needs fcntl')
+def test_file_lock_times_out_instead_of_failing(tmp_path):
+    holder = SingleFlight(lock_dir=str(tmp_path))
+    waiter = SingleFlight(lock_dir=str(tmp_path), lock_timeout=0.1, poll_interval=0.01)
+    with holder.file_lock('key') as locked:
+        assert locked
+        with waiter.file_lock('key') as second:
+            assert second is False
+    assert waiter.stats()['file_lock_timeouts'] == 1
+    with waiter.file_lock('key') as locked:
+        assert locked
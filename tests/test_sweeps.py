@@ -0,0 +1,81 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+
+from webapp.ode_solvers import solve
+from webapp.sweeps import expand_sweep, ode_sweep, varying_params, waveform, waveform_sweep
+
+
+def test_grid_is_the_cartesian_product_over_the_base():
+    sets = expand_sweep({'grid': {'amplitude': [1, 2], 'frequency': [0.5, 1, 2]}, 'base': {'phase': 1}})
+    assert len(sets) == 6
+    assert sets[0] == {'phase': 1, 'amplitude': 1, 'frequency': 0.5}
+    assert varying_params(sets) == ['amplitude', 'frequency']
+
+
+def test_sweep_limits_are_enforced():
+    with pytest.raises(ValueError):
+        expand_sweep({'params': []})
+    with pytest.raises(ValueError):
+        expand_sweep({'grid': {'amplitude': list(range(11))}}, max_sets=10)
+    with pytest.raises(ValueError):
+        expand_sweep({})
+
+
+def waveform_set(function_type, amplitude, num_points=50):
+    return {'function_type': function_type, 'amplitude': amplitude, 'frequency': 2.0, 'phase': 0.5,
+            'x_min': -1.0, 'x_max': 1.0, 'num_points': num_points}
+
+
+def test_waveform_sweep_matches_one_set_at_a_time():
+    sets = [waveform_set('sin', 1.0), waveform_set('cos', 2.0), waveform_set('sin', 3.0, num_points=80)]
+    for params, result in zip(sets, waveform_sweep(sets)):
+        x = np.linspace(params['x_min'], params['x_max'], params['num_points'])
+        np.testing.assert_array_equal(result['x'], x)
+        np.testing.assert_allclose(result['y'], waveform(params['function_type'], x, params['amplitude'],
+                                                         params['frequency'], params['phase']))
+
+
+def test_ode_sweep_matches_single_solves():
+    sets = [{'eq_type': eq_type, 't_max': 10.0, 'num_points': 100} for eq_type in ('spring', 'pendulum')]
+    for params, result in zip(sets, ode_sweep(sets)):
+        _, t, states = solve(params['eq_type'], params['t_max'], params['num_points'])
+        np.testing.assert_array_equal(result['t'], t)
+        assert len(result['states']) == len(states)
+        for y, expected in zip(result['states'], states):
+            np.testing.assert_allclose(y, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_ode_sweep_overrides_system_parameters():
+    damped, free = ode_sweep([{'eq_type': 'spring', 't_max': 10.0, 'num_points': 100, 'c': c}
+                              for c in (2.0, 0.0)])
+    assert damped['parameters'] == 'm=1, c=2, k=4'
+    assert abs(damped['states'][0][0][-1]) < abs(free['states'][0][0]).max()
+    with pytest.raises(ValueError):
+        ode_sweep([{'eq_type': 'spring', 't_max': 10.0, 'num_points': 100, 'mass': 2}])
+
+
+def test_batch_route_returns_every_set(client):
+    response = client.post('/api/batch/advanced_plot',
+                           json={'grid': {'amplitude': [1, 2]}, 'base': {'num_points': 20}})
+    body = response.get_json()
+    assert body['status'] == 'success'
+    assert body['count'] == 2
+    assert [s['amplitude'] for s in body['sets']] == [1, 2]
+    assert len(body['results'][1]['y']) == 20
+    assert body['plot'] is None
+
+
+def test_batch_route_draws_one_figure_for_an_ode_sweep(client):
+    response = client.post('/api/batch/differential_equation',
+                           json={'grid': {'c': [0.1, 1]}, 'base': {'eq_type': 'spring'}, 'figure': 'overlay'})
+    body = response.get_json()
+    assert body['status'] == 'success'
+    assert body['count'] == 2
+    assert body['plot']
+
+
+def test_batch_route_refuses_functions_without_a_sweep(client):
+    body = client.post('/api/batch/symbolic_math', json={'params': [{}]}).get_json()
+    assert body['status'] == 'error'
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip('sympy')
+
+from webapp import symbolic
+from webapp.symbolic import WorkersBusy, WorkerTimeout, compile_expression, evaluate
+
+
+def test_spellings_of_one_expression_share_an_entry():
+    entry = compile_expression('3*x^2 + 1')
+    assert compile_expression('  3*x^2   +  1 ') is entry
+    assert compile_expression('3*x**2+1') is entry
+    assert entry.function()(2) == 13
+
+
+def test_results_are_cached_per_expression(monkeypatch):
+    assert evaluate('x^3', 'differentiate')[0] == '3*x**2'
+    monkeypatch.setattr(symbolic, '_apply', lambda expr, operation: pytest.fail('not cached'))
+    assert evaluate('x ^ 3', 'differentiate')[0] == '3*x**2'
+
+
+def test_budgeted_operations_run_in_a_worker():
+    result, latex = evaluate('x^4', 'integrate')
+    assert result == 'x**5/5'
+    assert latex == '\\frac{x^{5}}{5}'
+    assert symbolic.stats()['workers']['calls'] >= 1
+
+
+class FakeWorkers:
+    """Stands in for the worker pool, raising `error` from every call"""
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def run(self, function, args=(), timeout=None):
+        self.calls += 1
+        raise self.error
+
+
+def test_timeouts_are_remembered_until_their_ttl(monkeypatch):
+    workers = FakeWorkers(WorkerTimeout('too slow'))
+    monkeypatch.setattr(symbolic, '_workers', workers)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            evaluate('x^5 + 7', 'simplify')
+    assert workers.calls == 1
+
+    monkeypatch.setattr(symbolic, 'TIMEOUT_TTL', 0)
+    compile_expression('x^5 + 7').timed_out.clear()
+    with pytest.raises(TimeoutError):
+        evaluate('x^5 + 7', 'simplify')
+    with pytest.raises(TimeoutError):
+        evaluate('x^5 + 7', 'simplify')
+    assert workers.calls == 3
+
+
+def test_busy_workers_are_not_held_against_the_expression(monkeypatch):
+    workers = FakeWorkers(WorkersBusy('no free worker'))
+    monkeypatch.setattr(symbolic, '_workers', workers)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            evaluate('x^6 + 7', 'solve')
+    assert workers.calls == 2
+    assert not compile_expression('x^6 + 7').timed_out
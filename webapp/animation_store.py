@@ -0,0 +1,208 @@
+"""
+Content-addressed storage for rendered animations.
+
+Each (animation type, frame count, backend) combination gets its own
+directory under static/animation, named by a hash, so frame URLs are
+immutable and concurrent requests never touch each other's files. A set is
+complete once its manifest.json (the result returned to the client) has
+been written; repeated requests are answered from the manifest. Old sets
+are evicted by age and total size on a background thread.
+
+A set can also be encoded into a single file (animated WebP or GIF, or a
+sprite-sheet PNG), created on first request and kept next to the frames,
+so a client can play it from one download.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+MANIFEST = 'manifest.json'
+
+# Single-file encodings of a frame set and their file names
+ENCODINGS = {'webp': 'animation.webp', 'gif': 'animation.gif', 'sprite': 'sprite.png'}
+
+
+def sprite_layout(num_frames, frame_size):
+    """Grid of a sprite sheet: frames fill rows left to right"""
+    columns = math.ceil(math.sqrt(num_frames))
+    width, height = frame_size
+    return {
+        'columns': columns,
+        'rows': math.ceil(num_frames / columns),
+        'frame_width': width,
+        'frame_height': height,
+    }
+
+
+def encode_frames(frame_paths, output, path, frame_duration=100):
+    """Encode PNG frames into one animated WebP/GIF or a sprite-sheet PNG"""
+    frames = [Image.open(frame).convert('RGB') for frame in frame_paths]
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if output == 'sprite':
+                layout = sprite_layout(len(frames), frames[0].size)
+                width, height = layout['frame_width'], layout['frame_height']
+                sheet = Image.new('RGB', (layout['columns'] * width, layout['rows'] * height), 'white')
+                for i, frame in enumerate(frames):
+                    sheet.paste(frame, ((i % layout['columns']) * width, (i // layout['columns']) * height))
+                sheet.save(f, format='PNG', optimize=True)
+            else:
+                options = {'quality': 80} if output == 'webp' else {}
+                frames[0].save(f, format=output.upper(), save_all=True, append_images=frames[1:],
+                               duration=frame_duration, loop=0, **options)
+        # Renamed into place so a concurrent request never serves half a file
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+class AnimationStore:
+    """Directory-per-animation store with background eviction"""
+
+    def __init__(self, root, url_prefix='/static/animation', max_bytes=256 * 1024 * 1024,
+                 max_age=7 * 24 * 3600, sweep_interval=300, stale_build_age=3600):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self.stale_build_age = stale_build_age
+        self._lock = threading.Lock()
+        self._sweeping = False
+        self._last_sweep = 0.0
+
+    @staticmethod
+    def key(animation_type, num_frames, backend):
+        """Directory name for one animation"""
+        payload = json.dumps([str(animation_type), int(num_frames), backend])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+    def directory(self, key):
+        """Directory the frames of `key` are written to (created if needed)"""
+        path = os.path.join(self.root, key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def url(self, key):
+        """URL prefix of the frames of `key`"""
+        return f"{self.url_prefix}/{key}"
+
+    def path(self, url):
+        """File behind a frame URL of this store, or None for other URLs"""
+        prefix = self.url_prefix + '/'
+        if not isinstance(url, str) or not url.startswith(prefix):
+            return None
+        relative = url[len(prefix):]
+        if '..' in relative.split('/'):
+            return None
+        return os.path.join(self.root, *relative.split('/'))
+
+    def encode(self, frame_urls, output, frame_duration=100):
+        """Single-file `output` encoding of a stored frame set
+
+        The file is created in the set's directory on first request and
+        reused afterwards. Returns its URL, plus the grid layout for sprite
+        sheets.
+        """
+        if output not in ENCODINGS:
+            raise ValueError(f"Unknown animation output '{output}' (expected one of {', '.join(ENCODINGS)})")
+        paths = [self.path(url) for url in frame_urls]
+        if not paths or None in paths:
+            raise ValueError("Animation frames are not in the animation store")
+        directory = os.path.dirname(paths[0])
+        path = os.path.join(directory, ENCODINGS[output])
+        if not os.path.exists(path):
+            encode_frames(paths, output, path, frame_duration)
+        encoded = {
+            'output': output,
+            'animation_url': f"{self.url(os.path.basename(directory))}/{ENCODINGS[output]}",
+            'frame_duration': frame_duration,
+        }
+        if output == 'sprite':
+            with Image.open(paths[0]) as first:
+                encoded.update(sprite_layout(len(paths), first.size))
+        return encoded
+
+    def lookup(self, key):
+        """The stored result for `key`, or None if it was never completed"""
+        path = os.path.join(self.root, key, MANIFEST)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            # Mark the set as recently used for eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return manifest
+
+    def commit(self, key, result):
+        """Record `result` as the complete animation for `key`"""
+        directory = self.directory(key)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, os.path.join(directory, MANIFEST))
+        except (OSError, TypeError) as e:
+            print(f"Could not record animation {key}: {e}")
+        self.schedule_sweep()
+
+    def schedule_sweep(self):
+        """Start an eviction pass in the background if one is due"""
+        with self._lock:
+            if self._sweeping or time.time() - self._last_sweep < self.sweep_interval:
+                return
+            self._sweeping = True
+        threading.Thread(target=self._sweep_in_background, name='animation-sweep', daemon=True).start()
+
+    def _sweep_in_background(self):
+        try:
+            self.sweep()
+        except Exception as e:
+            print(f"Animation store sweep failed: {e}")
+        finally:
+            with self._lock:
+                self._sweeping = False
+                self._last_sweep = time.time()
+
+    def sweep(self):
+        """Delete expired sets, then the least recently used beyond `max_bytes`"""
+        now = time.time()
+        sets = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            manifest = os.path.join(path, MANIFEST)
+            if not os.path.exists(manifest):
+                # Unfinished (or abandoned) build: give it time to complete
+                if now - os.path.getmtime(path) > self.stale_build_age:
+                    self._remove(path)
+                continue
+            used = os.path.getmtime(manifest)
+            if now - used > self.max_age:
+                self._remove(path)
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            sets.append((used, size, path))
+        total = sum(size for _, size, _ in sets)
+        for _, size, path in sorted(sets):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        print(f"Evicting animation {os.path.basename(path)}")
+        shutil.rmtree(path, ignore_errors=True)
@@ -1,18 +1,13 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, url_for, Response, stream_with_context, g
+from flask.json.provider import DefaultJSONProvider
 import os
 import sys
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import base64
 import time
 import json
-import tempfile
 from io import BytesIO
-import matlab.engine
-import shutil
-from PIL import Image
 
 # Add path to find MATLAB example code
 examples_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Examples')
@@ -22,19 +17,199 @@ sys.path.append(python_examples_dir)
 
 # Add the webapp directory to the path if matlab_bridge import fails
 try:
-    from webapp.matlab_bridge import call_matlab_function, get_matlab_source
+    from webapp.rendering import render_line
+    from webapp.downsample import downsample_series, DATA_MAX_POINTS
+    from webapp import metrics
+    from webapp.matlab_bridge import call_matlab_function, bind_params, get_matlab_source, get_engine_status, initialize_matlab_engine, get_cache_stats, get_plot_store, encode_plot, encode_animation, run_sweep, pack_arrays, warm_up_fallbacks, submit_job, get_job, stream_animation, JobQueueFull
 except ImportError:
     # Try relative import 
     try:
-        from .matlab_bridge import call_matlab_function, get_matlab_source, get_matlab_engine
+        from .rendering import render_line
+        from .downsample import downsample_series, DATA_MAX_POINTS
+        from . import metrics
+        from .matlab_bridge import call_matlab_function, bind_params, get_matlab_source, get_engine_status, initialize_matlab_engine, get_cache_stats, get_plot_store, encode_plot, encode_animation, run_sweep, pack_arrays, warm_up_fallbacks, submit_job, get_job, stream_animation, JobQueueFull
     except ImportError:
         # Last resort: direct import with path modification
         current_dir = os.path.dirname(os.path.abspath(__file__))
         if current_dir not in sys.path:
             sys.path.insert(0, current_dir)
-        from matlab_bridge import call_matlab_function, get_matlab_source, get_matlab_engine
+        from rendering import render_line
+        from downsample import downsample_series, DATA_MAX_POINTS
+        import metrics
+        from matlab_bridge import call_matlab_function, bind_params, get_matlab_source, get_engine_status, initialize_matlab_engine, get_cache_stats, get_plot_store, encode_plot, encode_animation, run_sweep, pack_arrays, warm_up_fallbacks, submit_job, get_job, stream_animation, JobQueueFull
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing serialization as the 'json' stage"""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.stage('json'):
+            return super().dumps(obj, **kwargs)
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Stages outside any bridge call are attributed to the endpoint
+    metrics.current_scope.set(request.endpoint or 'unmatched')
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.HTTP_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        metrics.HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+@app.before_request
+def start_matlab_engines():
+    # Kick off MATLAB (and fallback import) warm-up on the first request;
+    # this never blocks, and requests are served by the Python fallbacks
+    # until an engine is ready
+    initialize_matlab_engine()
+    warm_up_fallbacks()
+
+@app.after_request
+def cache_animation_frames(response):
+    # Frames under /static/animation/<hash>/ never change once written
+    if request.path.startswith('/static/animation/') and request.path.count('/') > 3 and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Latency histograms and counters of this process, in Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/healthz')
+def healthz():
+    """Report liveness plus the MATLAB engine warm-up progress"""
+    return jsonify({
+        'status': 'ok',
+        'matlab': get_engine_status()
+    })
+
+# Plots can be returned three ways (see encode_plot): as base64 in the
+# JSON body, as a URL under /plots/, or as the PNG itself
+PLOT_FORMATS = ('base64', 'url', 'png')
+
+def _plot_format():
+    """Plot format the client asked for, by ?plot_format= or Accept header"""
+    plot_format = request.args.get('plot_format')
+    if plot_format in PLOT_FORMATS:
+        return plot_format
+    best = request.accept_mimetypes.best_match(['application/json', 'image/png'])
+    return 'png' if best == 'image/png' else 'base64'
+
+def _plot_fields(result):
+    """The plot entry of a JSON response: 'plot_url' if stored, else 'plot'"""
+    if result.get('plot_url'):
+        return {'plot_url': result['plot_url']}
+    return {'plot': result.get('plot')}
+
+def _png_response(result, max_age=0):
+    """Send a result's PNG directly, honouring If-None-Match"""
+    png = result.get('plot_png')
+    if png is None:
+        return jsonify({
+            'status': 'error',
+            'message': result.get('message', 'No plot data received')
+        })
+    response = send_file(BytesIO(png), mimetype='image/png',
+                         etag=result.get('plot_etag'), max_age=max_age)
+    if not max_age:
+        response.cache_control.no_cache = True
+    return response
+
+def _timed_out(result):
+    """True for the structured result of a call that overran its deadline (sent as 504)"""
+    return isinstance(result, dict) and result.get('status') == 'timeout'
+
+def _data_format():
+    """'json' or 'npz' if the client wants numbers instead of a plot (?format=data|npz)"""
+    return {'data': 'json', 'npz': 'npz'}.get(request.args.get('format'))
+
+def _max_points():
+    """Points per series the client can use: ?max_points=, or two per pixel of ?width=
+
+    None if it gave neither.
+    """
+    if request.args.get('max_points'):
+        return max(3, int(request.args['max_points']))
+    if request.args.get('width'):
+        return max(3, 2 * int(request.args['width']))
+    return None
+
+# Array payload (numpy bytes) above which JSON is refused in favour of
+# .npz: as lists every float costs about 20 bytes and a Python object
+DATA_JSON_MAX_BYTES = int(os.environ.get('DATA_JSON_MAX_BYTES', 8 * 2**20))
+
+def _data_response(result, data_format, name='result'):
+    """Send a data-mode result as JSON lists or as a binary .npz file
+
+    Long series are downsampled (see downsample.py) to the client's
+    ?max_points= or ?width=; JSON is capped at DATA_MAX_POINTS regardless,
+    while .npz keeps every point unless asked otherwise. Arrays that series
+    downsampling can't shrink (images, matrices) are only sent as JSON up
+    to DATA_JSON_MAX_BYTES; larger ones get a 413 pointing at ?format=npz.
+    """
+    max_points = _max_points()
+    if data_format == 'json' and max_points is None:
+        max_points = DATA_MAX_POINTS
+    if max_points is not None:
+        result = downsample_series(result, max_points)
+    if data_format == 'npz':
+        return send_file(BytesIO(pack_arrays(result)), mimetype='application/x-npz',
+                         download_name=f'{name}.npz')
+    size = _array_bytes(result)
+    if size > DATA_JSON_MAX_BYTES:
+        return jsonify({
+            'status': 'error',
+            'message': f"{size:,d} bytes of arrays are too many for JSON "
+                       f"(at most {DATA_JSON_MAX_BYTES:,d}); request ?format=npz instead"
+        }), 413
+    return jsonify({'status': 'success', **_jsonable(result)})
+
+def _array_bytes(value):
+    """Total size of the numpy arrays in a result, at any depth"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(map(_array_bytes, value.values()))
+    if isinstance(value, (list, tuple)):
+        return sum(map(_array_bytes, value))
+    return 0
+
+def _jsonable(value):
+    """Numpy arrays (at any depth) as lists, for jsonify"""
+    if isinstance(value, np.ndarray):
+        if np.iscomplexobj(value):
+            return {'real': value.real.tolist(), 'imag': value.imag.tolist()}
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+@app.route('/plots/<digest>.png')
+def stored_plot(digest):
+    """A rendered plot by content digest; the URL never changes meaning"""
+    if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+        return jsonify({'status': 'error', 'message': 'Invalid plot id'}), 400
+    png = get_plot_store().get(digest)
+    if png is None:
+        return jsonify({'status': 'error', 'message': 'Plot not found'}), 404
+    response = _png_response({'plot_png': png, 'plot_etag': digest}, max_age=31536000)
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/')
 def index():
@@ -44,6 +219,11 @@ def index():
 def symbolic_page():
     return render_template('symbolic.html')
 
+@app.route('/api/cache_stats')
+def cache_stats():
+    """Result cache counters, for sizing the cache"""
+    return jsonify(get_cache_stats())
+
 @app.route('/source_code/<function_name>')
 def source_code(function_name):
     """Get the source code of a MATLAB function"""
@@ -71,32 +251,32 @@ def simple_plot():
     try:
         # Get parameters from the request
         data = request.json
-        x_min = data.get('x_min', -10)
-        x_max = data.get('x_max', 10)
-        num_points = data.get('num_points', 100)
+        # Same coercion and num_points cap as the registered simple_plot
+        params = bind_params('simple_plot', data)
+        x_min, x_max, num_points = params['x_min'], params['x_max'], params['num_points']
+        
+        # Numbers only: skip rendering
+        data_format = _data_format()
+        if data_format:
+            result = call_matlab_function('simple_plot', data, result_format='data')
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, data_format, 'simple_plot')
         
         # Generate a simple plot using matplotlib
         x = np.linspace(x_min, x_max, num_points)
         y = np.sin(x)
         
-        # Create the plot
-        plt.figure(figsize=(10, 6))
-        plt.plot(x, y)
-        plt.title('Simple Sine Wave')
-        plt.xlabel('X axis')
-        plt.ylabel('Y axis')
-        plt.grid(True)
-        
-        # Convert plot to base64 string for embedding in HTML
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png')
-        buffer.seek(0)
-        plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        plt.close()
+        # Create the plot on a reused figure and encode it the way the
+        # client asked for
+        plot_format = _plot_format()
+        result = encode_plot({'plot_png': render_line(x, y, 'Simple Sine Wave')}, plot_format)
+        if plot_format == 'png':
+            return _png_response(result)
         
         return jsonify({
             'status': 'success',
-            'plot': plot_data
+            **_plot_fields(result)
         })
     except Exception as e:
         return jsonify({
@@ -111,12 +291,23 @@ def advanced_plot():
         data = request.json
         
         # Call the Python implementation in matlab_bridge.py
-        result = call_matlab_function('advanced_plot', data)
+        data_format = _data_format()
+        if data_format:
+            result = call_matlab_function('advanced_plot', data, result_format='data')
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, data_format, 'advanced_plot')
+        plot_format = _plot_format()
+        result = call_matlab_function('advanced_plot', data, plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
         
         # Return the result
         return jsonify({
             'status': 'success',
-            'plot': result.get('plot'),
+            **_plot_fields(result),
             'source_code': result.get('source_code')
         })
     except Exception as e:
@@ -132,12 +323,23 @@ def differential_equation():
         data = request.json
         
         # Call the function through our bridge
-        result = call_matlab_function('differential_equation', data)
+        data_format = _data_format()
+        if data_format:
+            result = call_matlab_function('differential_equation', data, result_format='data')
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, data_format, 'differential_equation')
+        plot_format = _plot_format()
+        result = call_matlab_function('differential_equation', data, plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
         
         # Return the result
         return jsonify({
             'status': 'success',
-            'plot': result.get('plot'),
+            **_plot_fields(result),
             'source_code': result.get('source_code'),
             'equation': result.get('equation'),
             'equations': result.get('equations'),
@@ -156,15 +358,27 @@ def image_processing():
         data = request.json
         
         # Call the function through our bridge
-        result = call_matlab_function('image_processing', data)
+        data_format = _data_format()
+        if data_format:
+            result = call_matlab_function('image_processing', data, result_format='data')
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, data_format, 'image_processing')
+        plot_format = _plot_format()
+        result = call_matlab_function('image_processing', data, plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
         
         # Return the result
         return jsonify({
             'status': 'success',
-            'plot': result.get('plot'),
+            **_plot_fields(result),
             'source_code': result.get('source_code'),
             'operation': result.get('operation'),
-            'methods': result.get('methods')
+            'methods': result.get('methods'),
+            'timings': result.get('timings')
         })
     except Exception as e:
         return jsonify({
@@ -210,17 +424,29 @@ def matrix_operation():
         data = request.json
         
         # Call the function through our bridge
-        result = call_matlab_function('matrix_operation', data)
+        data_format = _data_format()
+        if data_format:
+            result = call_matlab_function('matrix_operation', data, result_format='data')
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, data_format, 'matrix_operation')
+        plot_format = _plot_format()
+        result = call_matlab_function('matrix_operation', data, plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
         
         # Return the result
         return jsonify({
             'status': 'success',
-            'plot': result.get('plot'),
+            **_plot_fields(result),
             'source_code': result.get('source_code'),
             'operation_info': {
                 'title': result.get('operation_title', data.get('operation_type', 'Matrix Operation')),
                 'details': result.get('operation_details', '')
-            }
+            },
+            'timings': result.get('timings')
         })
     except Exception as e:
         return jsonify({
@@ -234,18 +460,28 @@ def api_image_processing():
         # Get parameters from the request
         noise_level = request.args.get('noise_level', 0.2)
         operation = request.args.get('operation', 'edge')
+        size = request.args.get('size', 256)
         
         # Call the MATLAB function through our bridge
+        plot_format = _plot_format()
         result = call_matlab_function('image_processing', 
-                                    {'operation': operation, 'noise_level': float(noise_level)})
+                                    {'operation': operation, 'noise_level': float(noise_level),
+                                     'size': int(size)},
+                                    plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
         
         # Return a properly structured response for the frontend
-        if 'plot' in result:
+        image = result.get('plot_url') or result.get('plot')
+        if image:
             return jsonify({
-                'noisy_image': result['plot'],  # Use the same image for now
-                'filtered_image': result['plot'],
+                'noisy_image': image,  # Use the same image for now
+                'filtered_image': image,
                 'operation': result.get('operation', 'Image Processing'),
-                'methods': result.get('methods', '')
+                'methods': result.get('methods', ''),
+                'timings': result.get('timings')
             })
         else:
             return jsonify({
@@ -268,16 +504,26 @@ def api_differential_equation():
         t_max = request.args.get('t_max', 10)
         num_points = request.args.get('num_points', 100)
         
+        params = {'eq_type': eq_type, 't_max': float(t_max), 'num_points': int(num_points)}
+        data_format = _data_format()
+        if data_format:
+            result = call_matlab_function('differential_equation', params, result_format='data')
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, data_format, 'differential_equation')
+        
         # Call the MATLAB function through our bridge
-        result = call_matlab_function('differential_equation', 
-                                    {'eq_type': eq_type, 
-                                     't_max': float(t_max), 
-                                     'num_points': int(num_points)})
+        plot_format = _plot_format()
+        result = call_matlab_function('differential_equation', params, plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
         
         # Return a properly structured response
-        if 'plot' in result:
+        if result.get('plot') or result.get('plot_url'):
             return jsonify({
-                'plot': result['plot'],
+                **_plot_fields(result),
                 'equation': result.get('equation', result.get('equations', '')),
                 'parameters': result.get('parameters', '')
             })
@@ -295,26 +541,137 @@ def api_differential_equation():
             'message': str(e)
         })
 
+@app.route('/api/batch/<function_name>', methods=['POST'])
+def api_batch(function_name):
+    """Evaluate a list or grid of parameter sets in one vectorized pass"""
+    try:
+        # {"params": [{...}, ...]} or {"grid": {"amplitude": [1, 2], ...}, "base": {...}},
+        # plus an optional "figure": "overlay" or "grid"
+        data = request.get_json() or {}
+        if _data_format() == 'npz':
+            result = run_sweep(function_name, data)
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, 'npz', function_name)
+        plot_format = _plot_format()
+        result = run_sweep(function_name, data, figure=data.get('figure'), plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
+        
+        return jsonify({
+            'status': 'success',
+            'function': function_name,
+            'count': len(result['sets']),
+            'sets': result['sets'],
+            'results': _jsonable(result['results']),
+            **_plot_fields(result)
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        })
+
+# Background jobs: how often an event stream re-reads a job, and how long
+# one stream lasts before the client (EventSource) reconnects
+JOB_POLL_INTERVAL = 0.5
+JOB_STREAM_SECONDS = 120
+
+def _job_fields(job):
+    """The JSON view of a job record, with its result once it has one"""
+    fields = {
+        'job_id': job['id'],
+        'function': job['function'],
+        'status': job['status'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished']
+    }
+    if job.get('message'):
+        fields['message'] = job['message']
+    if job.get('result') is not None:
+        if _array_bytes(job['result']) > DATA_JSON_MAX_BYTES:
+            # Too big for JSON: data jobs are fetched as ?format=npz instead
+            fields['result_url'] = url_for('job_status', job_id=job['id'], format='npz')
+        else:
+            fields['result'] = _jsonable(job['result'])
+    return fields
+
+def _sse(event, data):
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a slow call in the background; 202 with the job id at once"""
+    # {"function": "matrix_operation", "params": {...}, "result_format": "plot" | "data"}
+    data = request.get_json(silent=True) or {}
+    try:
+        job_id = submit_job(data.get('function'), data.get('params') or {},
+                            data.get('result_format', 'plot'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({'status': 'error', 'message': f"Too many jobs queued: {e}"}), 503, {'Retry-After': '5'}
+    status_url = url_for('job_status', job_id=job_id)
+    return jsonify({
+        'status': 'queued',
+        'job_id': job_id,
+        'status_url': status_url,
+        'events_url': url_for('job_events', job_id=job_id)
+    }), 202, {'Location': status_url}
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """A job's status, and its result once finished (?format=npz for data jobs)"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found or expired'}), 404
+    if job['status'] == 'done' and _data_format() == 'npz' and job['options'].get('result_format') == 'data':
+        return _data_response(job['result'], 'npz', job['function'])
+    return jsonify(_job_fields(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events: 'status' on every change, then the final 'result'"""
+    if get_job(job_id, with_result=False) is None:
+        return jsonify({'status': 'error', 'message': 'Job not found or expired'}), 404
+
+    def stream():
+        last_status = None
+        last_sent = started = time.monotonic()
+        while time.monotonic() - started < JOB_STREAM_SECONDS:
+            job = get_job(job_id, with_result=False)
+            if job is None:
+                yield _sse('error', {'status': 'error', 'message': 'Job not found or expired'})
+                return
+            if job['finished'] is not None:
+                yield _sse('result', _job_fields(get_job(job_id)))
+                return
+            if job['status'] != last_status:
+                last_status = job['status']
+                last_sent = time.monotonic()
+                yield _sse('status', _job_fields(job))
+            elif time.monotonic() - last_sent > 15:
+                # Comment line: keeps proxies from closing an idle stream
+                last_sent = time.monotonic()
+                yield ': waiting\n\n'
+            time.sleep(JOB_POLL_INTERVAL)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/animation', methods=['GET'])
 def api_animation():
     try:
         animation_type = request.args.get('animation_type', 'pendulum')
         num_frames = request.args.get('num_frames', 20)
+        # 'frames' (one URL per frame), or one file: 'webp', 'gif' or 'sprite'
+        output = request.args.get('output', 'frames')
         result = call_matlab_function('animation', {'animation_type': animation_type, 'num_frames': int(num_frames)})
         
-        # Debug what we got back from MATLAB
-        print(f"Raw result type: {type(result)}")
-        if isinstance(result, dict):
-            print(f"Result keys: {list(result.keys())}")
-            if 'data' in result:
-                print(f"Result contains 'data' key, type: {type(result['data'])}")
-                if isinstance(result['data'], dict) and 'frames' in result['data']:
-                    print(f"result['data']['frames'] type: {type(result['data']['frames'])}, length: {len(result['data']['frames']) if hasattr(result['data']['frames'], '__len__') else 'no length'}")
-            if 'frames' in result:
-                print(f"Direct 'frames' key exists, type: {type(result['frames'])}, length: {len(result['frames']) if hasattr(result['frames'], '__len__') else 'no length'}")
-                if len(result['frames']) > 0:
-                    print(f"First frame: {result['frames'][0]}")
-        
         frames = []
         if isinstance(result, dict):
             if 'frames' in result and isinstance(result['frames'], (list, tuple)):
@@ -322,7 +679,6 @@ def api_animation():
             elif 'data' in result and isinstance(result['data'], dict) and 'frames' in result['data']:
                 frames = [str(f) for f in result['data']['frames']]
 
-
         response_data = {
             'frames': frames,
             'thumbnail': result.get('thumbnail', ''),
@@ -330,13 +686,61 @@ def api_animation():
             'num_frames': len(frames),
             'title': result.get('title', 'Animation') if isinstance(result, dict) else ''
         }
-        print(f"Returning animation response: {response_data}")
+        if output != 'frames' and frames:
+            response_data.update(encode_animation(frames, output))
         return jsonify(response_data)
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/api/animation/stream', methods=['GET'])
+def api_animation_stream():
+    """Server-sent events: a 'frame' as soon as each frame is written, then 'done'
+
+    Frame events carry the frame's `index` and `url`, plus the PNG as
+    base64 `data` with ?inline=1. 'done' carries the same fields as
+    /api/animation, including ?output='s one-file encoding; with an output
+    other than 'frames' an animation that is already stored sends 'done'
+    alone, since the client plays that file. A failed or timed-out
+    animation ends with 'error'.
+    """
+    try:
+        animation_type = request.args.get('animation_type', 'pendulum')
+        num_frames = int(request.args.get('num_frames', 20))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    inline = request.args.get('inline', '0').lower() in ('1', 'true', 'yes')
+    output = request.args.get('output', 'frames')
+
+    def stream():
+        try:
+            for event, payload in stream_animation(animation_type, num_frames, inline=inline,
+                                                   replay_frames=output == 'frames'):
+                if event == 'done' and payload.get('status') in ('error', 'timeout'):
+                    yield _sse('error', payload)
+                elif event == 'done':
+                    frames = [str(f) for f in payload.get('frames', [])]
+                    done = {
+                        'frames': frames,
+                        'thumbnail': payload.get('thumbnail', ''),
+                        'description': payload.get('description', ''),
+                        'num_frames': len(frames),
+                        'title': payload.get('title', 'Animation')
+                    }
+                    if output != 'frames' and frames:
+                        done.update(encode_animation(frames, output))
+                    yield _sse('done', done)
+                else:
+                    yield _sse(event, payload)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield _sse('error', {'status': 'error', 'message': str(e)})
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/symbolic', methods=['POST'])
 def symbolic_operation():
     try:
@@ -363,18 +767,21 @@ def symbolic_operation():
         print("Expression: ", expression)
         print("Operation: ", operation)
         print("Plot path: ", plot_path)
+        plot_format = 'url' if _plot_format() == 'url' else 'base64'
         result = call_matlab_function('symbolic_math', {
             'arg1': expression,  # First positional arg: expression
             'arg2': operation,   # Second positional arg: operation
             'arg3': plot_path    # Third positional arg: plot_path (None for non-plot operations)
-        })
+        }, plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
 
         if result and 'status' in result and result['status'] == 'success':
             return jsonify({
                 'status': 'success',
                 'result': result.get('result', ''),
                 'latex': result.get('latex', ''),
-                'plot': result.get('plot', None)
+                **_plot_fields(result)
             })
         else:
             # Handle error from MATLAB function
@@ -395,8 +802,20 @@ def matlab_plot():
         function_name = data.get('function', 'simple_plot')
         params = data.get('params', {})
         
+        data_format = _data_format()
+        if data_format:
+            result = call_matlab_function(function_name, params, result_format='data')
+            if _timed_out(result):
+                return jsonify(result), 504
+            return _data_response(result, data_format, function_name)
+        
         # Call the MATLAB function through our bridge
-        result = call_matlab_function(function_name, params)
+        plot_format = _plot_format()
+        result = call_matlab_function(function_name, params, plot_format=plot_format)
+        if _timed_out(result):
+            return jsonify(result), 504
+        if plot_format == 'png':
+            return _png_response(result)
         
         # Flatten the result structure for the frontend
         response = {'status': 'success'}
@@ -0,0 +1,165 @@
+"""
+Shape-preserving downsampling of long series before they are drawn or sent.
+
+A line drawn into an axes W pixels wide cannot show more than about 2*W
+distinct points, so longer series are reduced first:
+
+- minmax_indices keeps, in each bucket of consecutive samples, the samples
+  where every coordinate is smallest and largest. It is a few vectorized
+  passes, so 1e7 points take tens of milliseconds.
+- lttb_indices (Largest-Triangle-Three-Buckets) keeps one sample per bucket:
+  the one forming the largest triangle with the sample kept before it and
+  the mean of the next bucket.
+
+select_indices chains them: a very long series is first cut by min/max to a
+few samples per output point, then LTTB picks the final points, so the cost
+is one linear pass plus work proportional to the output size.
+
+Buckets follow sample order, so parametric curves (phase portraits, the
+Lorenz trajectory) are reduced along their time parameter like any series.
+NaN samples are kept by min/max, so gaps in a line survive.
+"""
+
+import os
+
+import numpy as np
+
+# Points kept per pixel of axes width; two per column hold its min and max
+POINTS_PER_PIXEL = 2
+
+# Before LTTB, series longer than this many times the target are cut by min/max
+MINMAX_RATIO = 4
+
+# Default cap on the points per series of a JSON data response
+DATA_MAX_POINTS = int(os.environ.get('DATA_MAX_POINTS', 10000))
+
+
+def axes_max_points(ax):
+    """Points worth drawing into `ax`: POINTS_PER_PIXEL per pixel of its width"""
+    figure = ax.get_figure()
+    width = ax.get_position().width * figure.get_figwidth() * figure.dpi
+    return max(16, int(POINTS_PER_PIXEL * width))
+
+
+def minmax_indices(columns, buckets):
+    """Sorted indices of each column's min and max in `buckets` runs of samples
+
+    The first and last samples are always kept.
+    """
+    n = len(columns[0])
+    size = max(1, n // buckets)
+    whole = n // size * size
+    starts = np.arange(0, whole, size)
+    keep = [np.array([0, n - 1])]
+    for column in columns:
+        column = np.asarray(column)
+        blocks = column[:whole].reshape(-1, size)
+        keep += [starts + blocks.argmin(axis=1), starts + blocks.argmax(axis=1)]
+        if whole < n:
+            tail = column[whole:]
+            keep.append(np.array([whole + tail.argmin(), whole + tail.argmax()]))
+    return np.unique(np.concatenate(keep))
+
+
+def lttb_indices(x, y, count):
+    """Indices of `count` samples of (x, y) chosen by Largest-Triangle-Three-Buckets"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if count >= n or count < 3:
+        return np.arange(n)
+    # The first and last samples are kept; the rest fall into count - 2 buckets
+    edges = np.linspace(1, n - 1, count - 1).astype(np.intp)
+    sizes = np.diff(edges)
+    # Bucket means (reduceat's last run would reach the end, so the last sample is cut off)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / sizes, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / sizes, y[-1])
+
+    selected = np.empty(count, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for i in range(count - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area; the constant factor does not move the argmax
+        area = np.abs((ax - mean_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (mean_y[i + 1] - ay))
+        j = lo + int(np.argmax(area))
+        selected[i + 1] = j
+        ax, ay = x[j], y[j]
+    return selected
+
+
+def select_indices(columns, max_points):
+    """Indices of at most about `max_points` samples of equally long 1-D columns
+
+    None if the columns are short enough already. Two columns (x and y) are
+    reduced by min/max and then LTTB; more columns by min/max over all of them.
+    """
+    n = len(columns[0])
+    if n <= max_points:
+        return None
+    if len(columns) != 2:
+        return minmax_indices(columns, max(1, max_points // (2 * len(columns))))
+    indices = np.arange(n)
+    if n > MINMAX_RATIO * max_points:
+        # Up to four samples per bucket: the extremes of x and of y
+        indices = minmax_indices(columns, MINMAX_RATIO * max_points // 4)
+    x, y = (np.asarray(column)[indices] for column in columns)
+    return indices[lttb_indices(x, y, max_points)]
+
+
+def downsample(x, y, max_points):
+    """(x, y) reduced to at most `max_points` samples, unchanged if already shorter"""
+    indices = select_indices((x, y), max_points)
+    if indices is None:
+        return x, y
+    return np.asarray(x)[indices], np.asarray(y)[indices]
+
+
+def downsample_columns(columns, max_points):
+    """Equally long columns reduced together (min/max), e.g. the x, y, z of a 3D curve"""
+    if len(columns) == 2:
+        return list(downsample(*columns, max_points))
+    indices = select_indices(columns, max_points)
+    if indices is None:
+        return list(columns)
+    return [np.asarray(column)[indices] for column in columns]
+
+
+def downsample_series(result, max_points):
+    """A data-mode result with its series cut to about `max_points` samples
+
+    The sampling axis is the result's 'x' or 't' array; every other array (or
+    list of arrays, like the ODE 'states') whose last dimension matches it is
+    reduced along that dimension with the same indices. 'downsampled_from'
+    records the original length. Results without such an axis are returned
+    unchanged.
+    """
+    key = 'x' if 'x' in result else 't' if 't' in result else None
+    if key is None:
+        return result
+    axis = np.asarray(result[key])
+    n = len(axis) if axis.ndim == 1 else 0
+    if n <= max_points:
+        return result
+
+    def matches(value):
+        return isinstance(value, np.ndarray) and value.ndim >= 1 and value.shape[-1] == n
+
+    series = {name: value for name, value in result.items()
+              if matches(value) or (isinstance(value, list) and value and all(map(matches, value)))}
+    # The axis first, so a plain x/y pair is reduced by LTTB
+    columns = [axis]
+    for name, value in series.items():
+        if name != key:
+            for array in (value if isinstance(value, list) else [value]):
+                columns.extend(array.reshape(-1, n))
+    indices = select_indices(columns, max_points)
+
+    reduced = dict(result)
+    for name, value in series.items():
+        if isinstance(value, list):
+            reduced[name] = [array[..., indices] for array in value]
+        else:
+            reduced[name] = value[..., indices]
+    reduced['downsampled_from'] = n
+    return reduced
@@ -0,0 +1,397 @@
+"""
+Bounded pool of MATLAB engines with per-request checkout.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class EnginePoolTimeout(Exception):
+    """Raised when no engine becomes free before the checkout timeout"""
+
+
+class EngineCallTimeout(Exception):
+    """Raised by callers when a call on a checked-out engine overran its deadline
+
+    `recovered` says whether the call was cancelled and the engine reset;
+    if not, the pool replaces the engine rather than lending it out again.
+    """
+
+    def __init__(self, message, recovered=False):
+        super().__init__(message)
+        self.recovered = recovered
+
+
+class _FakeFuture:
+    """What FakeEngine returns for `background=True` calls
+
+    The call runs on a daemon thread. A thread cannot be interrupted, so
+    `cancel()` only detaches the caller: the result is discarded.
+    """
+
+    def __init__(self, function, args, kwargs):
+        self._done = threading.Event()
+        self._value = self._error = None
+        self._cancelled = False
+        threading.Thread(target=self._run, args=(function, args, kwargs), daemon=True).start()
+
+    def _run(self, function, args, kwargs):
+        try:
+            self._value = function(*args, **kwargs)
+        except Exception as e:
+            self._error = e
+        self._done.set()
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("MATLAB function call timed out")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        self._cancelled = True
+        return True
+
+
+class FakeEngine:
+    """Stand-in for a MATLAB engine so the pool can be exercised without MATLAB
+
+    `functions` maps MATLAB function names to Python callables; calling
+    `eng.<name>(...)` runs the callable, and `eng.exist(name)` reports it as a
+    file (2) just like MATLAB does for functions on the path, and
+    `eng.struct(fields)` hands the dict back as the callable's argument.
+    Figures are simulated: `print(fig, '-RGBImage')` returns a blank
+    `figure_shape` image.
+    Calls accept `background=True` and then return a future, as MATLAB's do.
+    """
+
+    def __init__(self, functions=None, startup_delay=0.0, figure_shape=(480, 640, 3)):
+        if startup_delay:
+            time.sleep(startup_delay)
+        self.functions = dict(functions or {})
+        self.figure_shape = figure_shape
+        self.open_figures = 0
+        self.paths = []
+        self.calls = 0
+        self.alive = True
+
+    def _check_alive(self):
+        if not self.alive:
+            raise RuntimeError("MATLAB engine terminated")
+
+    def addpath(self, path, nargout=0):
+        self._check_alive()
+        self.paths.append(path)
+
+    def exist(self, name, nargout=1):
+        self._check_alive()
+        return 2 if name in self.functions else 0
+
+    def eval(self, code, nargout=0):
+        self._check_alive()
+        return None
+
+    def struct(self, fields=None, nargout=1):
+        self._check_alive()
+        return dict(fields or {})
+
+    def gcf(self, nargout=1):
+        self._check_alive()
+        self.open_figures = max(self.open_figures, 1)
+        return self.open_figures
+
+    def print(self, fig, *options, nargout=0):
+        self._check_alive()
+        import numpy as np
+        return np.full(self.figure_shape, 255, dtype=np.uint8)
+
+    def close(self, *figures, nargout=0):
+        self._check_alive()
+        self.open_figures = 0
+
+    def quit(self):
+        self.alive = False
+
+    def __getattr__(self, name):
+        functions = self.__dict__.get('functions')
+        if functions is None or name not in functions:
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            self._check_alive()
+            kwargs.pop('nargout', None)
+            background = kwargs.pop('background', False)
+            self.calls += 1
+            if background:
+                return _FakeFuture(functions[name], args, kwargs)
+            return functions[name](*args, **kwargs)
+        return call
+
+
+class _PooledEngine:
+    """Bookkeeping wrapper around one engine owned by the pool"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.id = next(self._ids)
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+
+class MatlabEnginePool:
+    """Fixed-size pool of MATLAB engines shared by concurrent requests
+
+    Engines are started in parallel by `factory`, a zero-argument callable
+    returning either a ready engine or a future resolving to one (such as
+    `matlab.engine.start_matlab(background=True)`); `setup` is then applied
+    to each engine before it joins the pool. Callers borrow an engine with
+    `checkout()`, so no two requests ever share figure state. Engines that
+    fail a health check, or that have served `max_uses` calls, are quit and
+    replaced in the background. When an engine fails to start, the missing
+    engines are started again after `retry_delay` seconds, doubling with
+    each consecutive failure up to `max_retry_delay`.
+    """
+
+    def __init__(self, factory, size=2, max_uses=200, health_check_interval=30.0, setup=None,
+                 retry_delay=5.0, max_retry_delay=300.0):
+        self.factory = factory
+        self.setup = setup
+        self.size = max(1, int(size))
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._starting = 0
+        self._busy = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='matlab-engine')
+        self._closed = False
+        # Consecutive failed starts, and the timer of the pending retry
+        self._failures = 0
+        self._retry = None
+        self._retry_at = None
+        self.started_at = None
+        self.stats = {'started': 0, 'start_failures': 0, 'start_retries': 0, 'recycled': 0, 'checkouts': 0,
+                      'timeouts': 0, 'call_timeouts': 0}
+
+    def start(self, wait=True):
+        """Start engines in parallel until the pool is at full size"""
+        futures = []
+        with self._cond:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+            missing = self.size - (len(self._idle) + self._busy + self._starting)
+            for _ in range(max(0, missing)):
+                futures.append(self._spawn_locked())
+        if wait:
+            # Also covers engines that an earlier start() left starting
+            with self._cond:
+                while self._starting:
+                    self._cond.wait()
+        return futures
+
+    def _spawn_locked(self):
+        self._starting += 1
+        return self._executor.submit(self._start_one)
+
+    def _start_one(self):
+        engine = None
+        try:
+            engine = self.factory()
+            if hasattr(engine, 'result') and hasattr(engine, 'done'):
+                # Background start: wait here so the caller never blocks
+                engine = engine.result()
+            if self.setup is not None:
+                self.setup(engine)
+        except Exception as e:
+            print(f"Error starting MATLAB engine: {e}")
+            if engine is not None and not hasattr(engine, 'done'):
+                self._quit(engine)
+            engine = None
+        closed = False
+        with self._cond:
+            self._starting -= 1
+            if engine is None:
+                self.stats['start_failures'] += 1
+                self._failures += 1
+                self._schedule_retry_locked()
+            elif self._closed:
+                closed = True
+            else:
+                self.stats['started'] += 1
+                self._failures = 0
+                self._idle.append(_PooledEngine(engine))
+            self._cond.notify_all()
+        # Quitting can take seconds; never hold up checkouts for it
+        if closed:
+            self._quit(engine)
+        return engine
+
+    def _schedule_retry_locked(self):
+        if self._closed or self._retry is not None:
+            return
+        delay = min(self.retry_delay * 2 ** min(self._failures - 1, 16), self.max_retry_delay)
+        print(f"Retrying MATLAB engine start in {delay:g}s")
+        self._retry_at = time.monotonic() + delay
+        self._retry = threading.Timer(delay, self._retry_start)
+        self._retry.daemon = True
+        self._retry.start()
+
+    def _retry_start(self):
+        with self._cond:
+            self._retry = self._retry_at = None
+            if self._closed:
+                return
+            self.stats['start_retries'] += 1
+        self.start(wait=False)
+
+    @property
+    def ready(self):
+        """True once at least one engine has finished starting"""
+        with self._cond:
+            return bool(self._idle or self._busy)
+
+    @property
+    def state(self):
+        """'ready', 'warming' (engines still starting), 'retrying' (every start failed, another is scheduled) or 'failed'"""
+        with self._cond:
+            if self._idle or self._busy:
+                return 'ready'
+            if self._starting:
+                return 'warming'
+            return 'retrying' if self._retry is not None else 'failed'
+
+    @property
+    def available(self):
+        """True when at least one engine is running or about to be"""
+        with self._cond:
+            return bool(self._idle or self._busy or self._starting)
+
+    def acquire(self, timeout=None):
+        """Borrow an engine slot, waiting up to `timeout` seconds for one"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            slot = self._take(deadline, timeout)
+            # Ping engines that sat idle for a while outside the lock
+            if self._needs_health_check(slot) and not self._ping(slot.engine):
+                self.release(slot, healthy=False)
+                continue
+            with self._cond:
+                self.stats['checkouts'] += 1
+            return slot
+
+    def _take(self, deadline, timeout):
+        with self._cond:
+            while True:
+                if self._idle:
+                    self._busy += 1
+                    return self._idle.popleft()
+                if not (self._busy or self._starting):
+                    raise EnginePoolTimeout("No MATLAB engines are running")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise EnginePoolTimeout(f"No MATLAB engine available after {timeout}s")
+                self._cond.wait(remaining)
+
+    def release(self, slot, healthy=True):
+        """Return a borrowed slot; unhealthy or worn-out engines are replaced"""
+        closed = False
+        with self._cond:
+            self._busy -= 1
+            slot.uses += 1
+            slot.last_used = time.monotonic()
+            if self._closed:
+                closed = True
+            elif not healthy or (self.max_uses and slot.uses >= self.max_uses):
+                self._recycle_locked(slot)
+            else:
+                self._idle.append(slot)
+            self._cond.notify_all()
+        if closed:
+            self._quit(slot.engine)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Context manager yielding an engine exclusively for the caller"""
+        slot = self.acquire(timeout)
+        healthy = True
+        try:
+            yield slot.engine
+        except EngineCallTimeout as e:
+            with self._cond:
+                self.stats['call_timeouts'] += 1
+            healthy = e.recovered
+            raise
+        except Exception:
+            # A MATLAB-side error leaves the engine usable; a dead process does not
+            healthy = self._ping(slot.engine)
+            raise
+        finally:
+            self.release(slot, healthy)
+
+    def _needs_health_check(self, slot):
+        return time.monotonic() - slot.last_used >= self.health_check_interval
+
+    @staticmethod
+    def _ping(engine):
+        try:
+            engine.eval('1;', nargout=0)
+            return True
+        except Exception as e:
+            print(f"MATLAB engine failed health check: {e}")
+            return False
+
+    @staticmethod
+    def _quit(engine):
+        try:
+            engine.quit()
+        except Exception:
+            pass
+
+    def _recycle_locked(self, slot):
+        print(f"Recycling MATLAB engine #{slot.id} after {slot.uses} calls")
+        self.stats['recycled'] += 1
+        self._executor.submit(self._quit, slot.engine)
+        self._spawn_locked()
+
+    def status(self):
+        """Snapshot of pool occupancy for diagnostics"""
+        state = self.state
+        with self._cond:
+            elapsed = None if self.started_at is None else time.monotonic() - self.started_at
+            return {
+                'state': state,
+                'size': self.size,
+                'ready': len(self._idle) + self._busy,
+                'uptime_seconds': None if elapsed is None else round(elapsed, 1),
+                'idle': len(self._idle),
+                'busy': self._busy,
+                'starting': self._starting,
+                'retry_in_seconds': (None if self._retry_at is None
+                                     else round(max(0.0, self._retry_at - time.monotonic()), 1)),
+                **self.stats,
+            }
+
+    def shutdown(self):
+        """Quit every idle engine; busy ones are quit when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            if self._retry is not None:
+                self._retry.cancel()
+                self._retry = self._retry_at = None
+        for slot in idle:
+            self._quit(slot.engine)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,149 @@
+"""
+Native implementation of Examples/matlab/image_processing.m.
+
+The synthetic test image, its noisy copy and every output are float32
+arrays of any size. Stencil operations (gradients, the mean filter) run
+over row bands with a small halo, so their temporaries are bounded by the
+band size however large the image is; only the FFT of 'transform' needs
+the whole image at once.
+"""
+
+import os
+import time
+
+import numpy as np
+from scipy import fft, ndimage
+
+# Rows per band; temporaries are about TILE_ROWS x width float32 values
+TILE_ROWS = 512
+
+# Largest accepted image side. Each full-size buffer is 4 * size**2 bytes
+# (64 MB at 4096) and a call holds four to six of them, plus the figure
+MAX_SIZE = int(os.environ.get('IMAGE_MAX_SIZE', 4096))
+
+OPERATIONS = {
+    'edge': ('Edge detection', 'Gradient-based edge detection'),
+    'filter': ('Filtering', 'Basic mean filtering'),
+    'segment': ('Segmentation', 'Thresholding, Connected Components'),
+    'transform': ('Transforms', 'Fourier Transform'),
+}
+
+
+def _bands(height, halo=0, rows=TILE_ROWS):
+    """(start, stop, padded start, padded stop) of each row band"""
+    for start in range(0, height, rows):
+        stop = min(start + rows, height)
+        yield start, stop, max(0, start - halo), min(height, stop + halo)
+
+
+def _map_bands(function, image, halo, dtype=np.float32):
+    """Apply a stencil `function` band by band; `halo` rows of context each side"""
+    out = np.empty(image.shape, dtype=dtype)
+    for start, stop, lo, hi in _bands(image.shape[0], halo):
+        out[start:stop] = function(image[lo:hi])[start - lo:start - lo + stop - start]
+    return out
+
+
+def check_size(size):
+    """Validated image side length"""
+    size = int(size)
+    if not 8 <= size <= MAX_SIZE:
+        raise ValueError(f"Image size must be between 8 and {MAX_SIZE} pixels")
+    return size
+
+
+def test_image(size=256, noise_level=0.2, seed=None):
+    """The MATLAB test image (1 + sin(r))/2 on [-3, 3]^2 and a noisy copy
+
+    The noise is drawn band by band from one generator, so a seed gives
+    the same image whatever the band size.
+    """
+    size = check_size(size)
+    axis = np.linspace(-3, 3, size, dtype=np.float32)
+    noise_level = float(np.clip(noise_level, 0, 1))
+    rng = np.random.default_rng(seed)
+    original = np.empty((size, size), dtype=np.float32)
+    noisy = np.empty((size, size), dtype=np.float32)
+    for start, stop, _, _ in _bands(size):
+        r = np.hypot(axis[start:stop, None], axis[None, :])
+        original[start:stop] = (1 + np.sin(r)) / 2
+    # Scale to 0-1 first, as the MATLAB code does, so the noise keeps its
+    # level; then add it and clip the noisy image
+    low, high = original.min(), original.max()
+    scale = 1 / (high - low)
+    for start, stop, _, _ in _bands(size):
+        band = original[start:stop]
+        band -= low
+        band *= scale
+        noisy[start:stop] = band + noise_level * rng.standard_normal(band.shape, dtype=np.float32)
+        np.clip(noisy[start:stop], 0, 1, out=noisy[start:stop])
+    return original, noisy
+
+
+def gradient_magnitude(image):
+    """sqrt(Gx^2 + Gy^2) with MATLAB gradient() semantics"""
+    def band(rows):
+        gy, gx = np.gradient(rows)
+        return np.hypot(gx, gy)
+    return _map_bands(band, image, halo=1)
+
+
+def mean_filter(image, kernel_size=5):
+    """5x5 mean over the interior, leaving the same border as the MATLAB loop"""
+    filtered = _map_bands(lambda rows: ndimage.uniform_filter(rows, kernel_size, mode='nearest'),
+                          image, halo=kernel_size // 2)
+    # MATLAB filters i, j = kernel_size:end-kernel_size (1-based) only
+    border = np.ones(image.shape, dtype=bool)
+    border[kernel_size - 1:image.shape[0] - kernel_size, kernel_size - 1:image.shape[1] - kernel_size] = False
+    filtered[border] = image[border]
+    return filtered
+
+
+def process(operation='edge', noise_level=0.2, size=256, seed=None):
+    """Run one operation; returns its panels, description and stage timings
+
+    `panels` lists the four (title, image) pairs of the MATLAB figure.
+    Unknown operations fall back to edge detection, as in MATLAB.
+    """
+    operation = str(operation).lower()
+    if operation not in OPERATIONS:
+        print(f"Unknown operation '{operation}'. Using edge detection.")
+        operation = 'edge'
+    timings = {}
+    started = time.perf_counter()
+    original, noisy = test_image(size, noise_level, seed)
+    timings['generate'] = time.perf_counter() - started
+    panels = [('Original Image', original),
+              (f"Noisy Image (σ = {float(np.clip(noise_level, 0, 1)):.1f})", noisy)]
+
+    started = time.perf_counter()
+    if operation == 'edge':
+        edges = gradient_magnitude(noisy)
+        panels += [('Gradient Magnitude', edges), ('Thresholded Edges', edges > 0.2)]
+    elif operation == 'filter':
+        filtered = mean_filter(noisy)
+        panels += [('Mean Filter (Basic)', filtered),
+                   ('Gradient of Filtered Image', gradient_magnitude(filtered))]
+    elif operation == 'segment':
+        level = 0.5
+        bw = noisy > level
+        # 4-connected components, like the MATLAB flood fill
+        labels, num_regions = ndimage.label(bw)
+        panels[1] = ('Preprocessed Image', noisy)
+        panels += [(f"Thresholding (level = {level:.2f})", bw),
+                   (f"Region Labeling ({num_regions} regions)",
+                    labels.astype(np.float32) / max(num_regions, 1))]
+    else:
+        # complex64 throughout; shift the real magnitude, not the spectrum
+        spectrum = fft.fft2(noisy, workers=-1)
+        magnitude = np.abs(spectrum)
+        np.log1p(magnitude, out=magnitude)
+        magnitude = fft.fftshift(magnitude)
+        magnitude /= magnitude.max()
+        restored = np.ascontiguousarray(fft.ifft2(spectrum, workers=-1, overwrite_x=True).real)
+        del spectrum
+        panels += [('FFT Magnitude (log scale)', magnitude), ('Inverse FFT', restored)]
+    timings[operation] = time.perf_counter() - started
+
+    title, methods = OPERATIONS[operation]
+    return {'operation': title, 'methods': methods, 'panels': panels, 'timings': timings}
@@ -0,0 +1,218 @@
+"""
+Background jobs for calls too slow to run inside an HTTP request.
+
+A job is one call_matlab_function call. Submitting it returns an id at
+once; a thread pool in the submitting process runs it, and its status and
+result are kept in a SQLite database on local disk, so any worker on the
+host can answer a poll for it. Finished jobs are deleted `ttl` seconds
+after they finish; jobs that never finish (their process died) are
+deleted `stale_ttl` seconds after they were created. Everything is local:
+one file, no broker.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from webapp.private_dir import default_dir, private_dir
+except ImportError:
+    from private_dir import default_dir, private_dir
+
+# queued -> running -> one of the final states
+FINAL_STATES = ('done', 'error', 'timeout')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    params TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT,
+    result BLOB,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+)
+"""
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while `max_queued` jobs wait to start"""
+
+
+_COLUMNS = ('id', 'function', 'params', 'options', 'status', 'message', 'result', 'created', 'started', 'finished')
+
+
+class JobStore:
+    """Job records in a SQLite file shared by every worker on the host
+
+    Results are pickled, so they keep their numpy arrays; the database's
+    directory must be private to this user (see private_dir), like the
+    on-disk result cache's. By default it is this user's own directory
+    under the system temp dir.
+    """
+
+    def __init__(self, path=None, ttl=3600.0, stale_ttl=86400.0):
+        self.path = path or os.path.join(default_dir('jobs'), 'jobs.sqlite3')
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        private_dir(os.path.dirname(os.path.abspath(self.path)))
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers poll while a job is written
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def create(self, function_name, params, options=None):
+        """Record a queued job and return its id"""
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute('INSERT INTO jobs (id, function, params, options, status, created) VALUES (?, ?, ?, ?, ?, ?)',
+                       (job_id, function_name, json.dumps(params, default=repr),
+                        json.dumps(options or {}), 'queued', time.time()))
+        self._written()
+        return job_id
+
+    def start(self, job_id):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id, status, result=None, message=None):
+        """Store a job's final state and, if any, its result"""
+        blob = None if result is None else pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as db:
+            db.execute('UPDATE jobs SET status = ?, message = ?, result = ?, finished = ? WHERE id = ?',
+                       (status, message, blob, time.time(), job_id))
+        self._written()
+
+    def get(self, job_id, with_result=True):
+        """The job as a dict, or None if unknown or expired
+
+        Without `with_result` the (possibly large) result is not loaded.
+        """
+        columns = _COLUMNS if with_result else tuple(c for c in _COLUMNS if c != 'result')
+        row = self._connect().execute(
+            f"SELECT {', '.join(columns)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        if self._expired(job):
+            return None
+        job['params'] = json.loads(job['params'])
+        job['options'] = json.loads(job['options'])
+        if job.get('result') is not None:
+            job['result'] = pickle.loads(job['result'])
+        return job
+
+    def _expired(self, job):
+        if job['finished'] is None:
+            # Queued or running: only gone once it is too old to be still alive
+            return time.time() - job['created'] > self.stale_ttl
+        return time.time() - job['finished'] > self.ttl
+
+    def _written(self):
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % 64 == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Delete jobs that finished more than `ttl` seconds ago
+
+        Unfinished jobs go `stale_ttl` after creation, when the process
+        that ran them must have died. Returns the number deleted.
+        """
+        now = time.time()
+        try:
+            with self._connect() as db:
+                return db.execute('DELETE FROM jobs WHERE finished < ? OR (finished IS NULL AND created < ?)',
+                                  (now - self.ttl, now - self.stale_ttl)).rowcount
+        except sqlite3.Error as e:
+            print(f"Could not sweep expired jobs: {e}")
+            return 0
+
+    def counts(self):
+        """Number of live jobs in each state"""
+        rows = self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+
+class JobRunner:
+    """Runs submitted jobs on a thread pool and records them in a JobStore
+
+    `run(function_name, params, **options)` computes a job's result; a dict with
+    status 'error' or 'timeout' ends the job in that state. At most
+    `max_queued` jobs wait for a thread; more are refused with JobQueueFull.
+    """
+
+    def __init__(self, store, run, workers=2, max_queued=100):
+        self.store = store
+        self.run = run
+        self.workers = max(1, int(workers))
+        self.max_queued = max(1, int(max_queued))
+        self._queued = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            return self._executor
+
+    def submit(self, function_name, params, **options):
+        """Queue a job and return its id; raises JobQueueFull when the queue is full"""
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise JobQueueFull(f"{self._queued} jobs are already waiting to start")
+            self._queued += 1
+        try:
+            job_id = self.store.create(function_name, params, options)
+            self._get_executor().submit(self._execute, job_id, function_name, params, options)
+        except Exception:
+            self._dequeue()
+            raise
+        return job_id
+
+    def _dequeue(self):
+        with self._lock:
+            self._queued -= 1
+
+    def queued(self):
+        """Number of jobs submitted here that have not started yet"""
+        with self._lock:
+            return self._queued
+
+    def _execute(self, job_id, function_name, params, options):
+        self._dequeue()
+        self.store.start(job_id)
+        started = time.perf_counter()
+        try:
+            result = self.run(function_name, params, **options)
+        except Exception as e:
+            print(f"Job {job_id} ({function_name}) failed: {e}")
+            self.store.finish(job_id, 'error', message=str(e))
+            return
+        status = result.get('status') if isinstance(result, dict) else None
+        if status in ('error', 'timeout'):
+            self.store.finish(job_id, status, result, result.get('message'))
+        else:
+            status = 'done'
+            self.store.finish(job_id, status, result)
+        print(f"Job {job_id} ({function_name}) {status} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,123 @@
+"""
+Native implementation of Examples/matlab/matrix_operation.m.
+
+The matrix is MATLAB's: rng(seed) selects the Mersenne Twister that
+numpy's legacy RandomState also implements, and rand(n, n) fills the
+matrix column by column, so the same seed gives the same entries.
+
+Dense LAPACK routines are used while they stay cheap; above EXACT_MAX_SIZE,
+or when their workspace would exceed MAX_BYTES, only the largest values are
+computed with ARPACK, whose memory is O(n) beyond the matrix itself.
+"""
+
+import os
+import time
+
+import numpy as np
+from scipy import linalg
+from scipy.sparse.linalg import ArpackNoConvergence, eigs, eigsh, svds
+
+# Largest n solved with dense O(n^3) routines
+EXACT_MAX_SIZE = int(os.environ.get('MATRIX_EXACT_MAX_SIZE', 2000))
+
+# Memory budget for one request: the matrix plus the solver's workspace
+MAX_BYTES = int(os.environ.get('MATRIX_MAX_BYTES', 512 * 1024 * 1024))
+
+# Values computed by the truncated solvers, and the restart cap of eigs,
+# which converges slowly on the clustered spectrum of a random matrix
+TRUNCATED_VALUES = 20
+EIGS_MAXITER = 20
+
+OPERATIONS = {
+    'eigenvalues': 'Eigenvalues',
+    'svd': 'Singular Value Decomposition',
+    'matrix': 'Random Matrix',
+}
+
+
+def check_size(n):
+    """Validated matrix size; refuses matrices that alone exceed MAX_BYTES"""
+    n = int(n)
+    if n < 1:
+        raise ValueError("Matrix size must be positive")
+    if 8 * n * n > MAX_BYTES:
+        raise ValueError(f"A {n}x{n} matrix needs {8 * n * n / 2**20:.0f} MB, "
+                         f"more than the {MAX_BYTES / 2**20:.0f} MB limit")
+    return n
+
+
+def random_matrix(n, seed=42):
+    """rng(seed); rand(n, n) as MATLAB computes it"""
+    n = check_size(n)
+    # MATLAB maps seed 0 to the generator's reference seed 5489
+    state = np.random.RandomState(int(seed) or 5489)
+    return state.random_sample(n * n).reshape((n, n), order='F')
+
+
+def _exact(n):
+    """Whether a dense solver fits: LAPACK needs about two more n x n copies"""
+    return n <= EXACT_MAX_SIZE and 3 * 8 * n * n <= MAX_BYTES
+
+
+def _start_vector(n, seed):
+    # ARPACK picks a random start vector otherwise; fixing it keeps results reproducible
+    return np.random.RandomState(int(seed) or 5489).random_sample(n)
+
+
+def eigenvalues(A, seed=42):
+    """Eigenvalues of A and a description of how they were computed"""
+    n = A.shape[0]
+    symmetric = np.array_equal(A, A.T)
+    if _exact(n):
+        if symmetric:
+            return linalg.eigvalsh(A, check_finite=False), f"All {n} eigenvalues (LAPACK syevr, symmetric)"
+        return linalg.eigvals(A, overwrite_a=True, check_finite=False), f"All {n} eigenvalues (LAPACK geev)"
+    k = min(TRUNCATED_VALUES, n - 2)
+    v0 = _start_vector(n, seed)
+    if symmetric:
+        values = eigsh(A, k=k, which='LM', v0=v0, return_eigenvectors=False)
+        return values, f"Largest {k} of {n} eigenvalues (ARPACK, symmetric)"
+    try:
+        values = eigs(A, k=k, which='LM', v0=v0, maxiter=EIGS_MAXITER, return_eigenvectors=False)
+    except ArpackNoConvergence as e:
+        values = e.eigenvalues
+    return values, f"Largest {len(values)} of {n} eigenvalues (ARPACK, converged within {EIGS_MAXITER} restarts)"
+
+
+def singular_values(A, seed=42):
+    """Singular values of A (descending) and a description of how they were computed"""
+    n = min(A.shape)
+    if _exact(n):
+        return linalg.svdvals(A, overwrite_a=True, check_finite=False), f"All {n} singular values (LAPACK gesdd)"
+    k = min(TRUNCATED_VALUES, n - 1)
+    values = svds(A, k=k, v0=_start_vector(n, seed), return_singular_vectors=False)
+    return np.sort(values)[::-1], f"Largest {k} of {n} singular values (truncated SVD, ARPACK)"
+
+
+def process(operation='eigenvalues', n=3, seed=42):
+    """Run one operation; returns its values, description and stage timings
+
+    Each stage's time is also printed as soon as it finishes. Unknown
+    operations show the matrix itself, as in MATLAB.
+    """
+    operation = str(operation).lower()
+    if operation not in OPERATIONS:
+        operation = 'matrix'
+    timings = {}
+
+    def timed(stage, function, *args):
+        started = time.perf_counter()
+        value = function(*args)
+        timings[stage] = time.perf_counter() - started
+        print(f"matrix_operation {operation} n={n}: {stage} took {timings[stage]:.3f}s")
+        return value
+
+    A = timed('generate', random_matrix, n, seed)
+    result = {'operation': OPERATIONS[operation], 'size': A.shape[0], 'timings': timings}
+    if operation == 'eigenvalues':
+        result['eigenvalues'], result['method'] = timed(operation, eigenvalues, A, seed)
+    elif operation == 'svd':
+        result['singular_values'], result['method'] = timed(operation, singular_values, A, seed)
+    else:
+        result['matrix'], result['method'] = A, f"{A.shape[0]}x{A.shape[1]} matrix, uniform on (0, 1)"
+    return result
@@ -1,71 +1,538 @@
 import os
-import sys
 import base64
 from io import BytesIO
 import numpy as np
-import matplotlib.pyplot as plt
-import tempfile
-import glob
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image
 
+try:
+    from webapp import metrics
+    from webapp.matlab_marshal import is_matlab_array, to_matlab as numpy_to_matlab, to_numpy as matlab_to_numpy
+    from webapp.engine_pool import MatlabEnginePool, EnginePoolTimeout, EngineCallTimeout
+    from webapp.result_cache import ResultCache, make_key
+    from webapp.single_flight import SingleFlight
+    from webapp.rendering import (render_line, render_message, write_animation_frame, png_to_base64,
+                                 render_series_and_phase, render_trajectory_3d,
+                                 render_overlay, render_small_multiples, render_image_grid,
+                                 render_eigenvalues, render_stem, render_matrix)
+    from webapp.ode_solvers import solve as solve_ode, get_system
+    from webapp.worker_pool import WorkerPool, WorkerTimeout
+    from webapp.sweeps import expand_sweep, varying_params, waveform, waveform_sweep, ode_sweep
+    from webapp import image_ops, linalg_ops, symbolic
+    from webapp.plot_store import PlotStore
+    from webapp.animation_store import AnimationStore
+    from webapp.job_store import JobQueueFull, JobStore, JobRunner
+    from webapp.private_dir import default_dir
+except ImportError:
+    import metrics
+    from matlab_marshal import is_matlab_array, to_matlab as numpy_to_matlab, to_numpy as matlab_to_numpy
+    from engine_pool import MatlabEnginePool, EnginePoolTimeout, EngineCallTimeout
+    from result_cache import ResultCache, make_key
+    from single_flight import SingleFlight
+    from rendering import (render_line, render_message, write_animation_frame, png_to_base64,
+                          render_series_and_phase, render_trajectory_3d,
+                          render_overlay, render_small_multiples, render_image_grid,
+                          render_eigenvalues, render_stem, render_matrix)
+    from ode_solvers import solve as solve_ode, get_system
+    from worker_pool import WorkerPool, WorkerTimeout
+    from sweeps import expand_sweep, varying_params, waveform, waveform_sweep, ode_sweep
+    import image_ops
+    import linalg_ops
+    import symbolic
+    from plot_store import PlotStore
+    from animation_store import AnimationStore
+    from job_store import JobQueueFull, JobStore, JobRunner
+    from private_dir import default_dir
+
 # Try to import MATLAB engine
+# (engines are started lazily in the background, never at import time)
 try:
     import matlab.engine
-    _matlab_engine = matlab.engine.start_matlab()
     MATLAB_AVAILABLE = True
 except ImportError:
     MATLAB_AVAILABLE = False
     print("MATLAB Engine for Python not available. Falling back to Python implementations.")
 
-# Dictionary to store MATLAB functions with their Python fallback implementations
+class Param:
+    """One typed parameter in a registered function's schema
+
+    `type` coerces request values for the Python fallback; numbers go to
+    MATLAB as doubles, numpy arrays as MATLAB arrays (see matlab_marshal)
+    and everything else unchanged. `aliases` are other request keys
+    accepted for the same parameter. Numbers are clamped to `bounds`
+    (low, high) if given, so no request can ask for unbounded work.
+    """
+
+    def __init__(self, name, default=None, type=float, aliases=(), bounds=None):
+        self.name = name
+        self.default = default
+        self.type = type
+        self.aliases = tuple(aliases)
+        self.bounds = bounds
+
+    def coerce(self, value):
+        if value is None:
+            return None
+        if self.type is int:
+            value = int(float(value))
+        else:
+            value = self.type(value)
+        if self.bounds is not None:
+            low, high = self.bounds
+            value = min(max(value, low), high)
+        return value
+
+    def to_matlab(self, value):
+        if isinstance(value, np.ndarray):
+            return numpy_to_matlab(value)
+        if self.type in (int, float):
+            return float(value)
+        return value
+
+
+class MatlabFunction:
+    """Registry entry: parameter schema, MATLAB call and unpacking, Python fallback
+
+    `data` optionally computes the function's numbers natively without
+    rendering anything (see matlab_data).
+    """
+
+    def __init__(self, name, params=(), fallback=None, to_matlab=None, unpack=None):
+        self.name = name
+        self.params = list(params)
+        self.fallback = fallback
+        self.to_matlab = to_matlab or _positional_args
+        self.unpack = unpack or _unpack_data
+        self.data = None
+
+    def bind(self, params):
+        """Coerce request params to the schema, applying aliases and defaults"""
+        if not self.params:
+            return dict(params)
+        bound = {}
+        for param in self.params:
+            value = param.default
+            for key in (param.name,) + param.aliases:
+                if params.get(key) is not None:
+                    value = params[key]
+                    break
+            bound[param.name] = param.coerce(value)
+        return bound
+
+    def call_matlab(self, eng, bound, unpack=None, timeout=None):
+        """Call the MATLAB function with bound params and unpack its result
+
+        With a `timeout` the call runs as an engine future; if it overruns
+        it is cancelled and EngineCallTimeout is raised (see _cancel_call).
+        """
+        function = getattr(eng, self.name)
+        if self.params:
+            args, kwargs = self.to_matlab(eng, self, bound), {}
+        else:
+            # Unregistered functions: pass the params through as keyword args
+            args, kwargs = [], dict(bound)
+        with metrics.stage('matlab_call'):
+            if timeout is None:
+                result = function(*args, **kwargs)
+            else:
+                future = function(*args, background=True, **kwargs)
+                try:
+                    result = future.result(timeout=timeout)
+                except Exception as e:
+                    if not _is_timeout(e):
+                        raise
+                    raise EngineCallTimeout(f"{self.name} did not finish within {timeout:g} s",
+                                            recovered=_cancel_call(eng, future))
+        with metrics.stage('unpack'):
+            return (unpack or self.unpack)(eng, self.name, result)
+
+    def __call__(self, **params):
+        if self.fallback is None:
+            raise ValueError(f"Function {self.name} not available in MATLAB or as a fallback")
+        return self.fallback(**self.bind(params))
+
+
+# Registry of MATLAB functions and their Python fallbacks, by name
 matlab_functions = {}
 
-def matlab_function(func_name):
-    """Decorator to register MATLAB functions with Python fallbacks"""
+# Largest num_points a plot or ODE request may ask for; longer series would
+# be downsampled for display anyway (see downsample.py)
+MAX_NUM_POINTS = int(os.environ.get('MAX_NUM_POINTS', 1_000_000))
+MAX_NUM_FRAMES = int(os.environ.get('MAX_NUM_FRAMES', 200))
+
+def register_matlab_function(func_name, params=(), fallback=None, to_matlab=None, unpack=None):
+    """Register a function by name, with or without a Python fallback"""
+    entry = MatlabFunction(func_name, params, fallback, to_matlab, unpack)
+    matlab_functions[func_name] = entry
+    return entry
+
+def matlab_function(func_name, params=(), to_matlab=None, unpack=None):
+    """Decorator to register MATLAB functions with Python fallbacks
+
+    The decorated function becomes the fallback; `params` is the schema
+    both backends share (see MatlabFunction for the other hooks).
+    """
     def decorator(function):
-        matlab_functions[func_name] = function
+        register_matlab_function(func_name, params, function, to_matlab, unpack)
         return function
     return decorator
 
-# Start MATLAB engine (if available)
-_matlab_engine = None
+def matlab_data(func_name):
+    """Decorator registering the render-free data variant of a function
 
-# Global flag to track MATLAB engine status
-_matlab_engine_tried = False
+    The decorated function takes the same params as the fallback and
+    returns a dict of numpy arrays (and scalars); it serves
+    `call_matlab_function(..., result_format='data')`.
+    """
+    def decorator(function):
+        matlab_functions[func_name].data = function
+        return function
+    return decorator
 
-# Initialize MATLAB engine once at startup
-def initialize_matlab_engine():
-    """Initialize the MATLAB engine once when the module is loaded"""
-    global _matlab_engine, _matlab_engine_tried
-    
-    if not MATLAB_AVAILABLE:
-        return
-    
+def _field(result, name, default=None):
+    """Read a field from a MATLAB struct, returned as a dict or an object"""
+    if isinstance(result, dict):
+        return result.get(name, default)
+    return getattr(result, name, default)
+
+def _positional_args(eng, entry, bound):
+    """Default MATLAB conversion: schema order, numbers as doubles"""
+    return [param.to_matlab(bound[param.name]) for param in entry.params]
+
+def _struct_args(eng, entry, bound):
+    """Pass the bound params as a single MATLAB struct (dropping unset ones)"""
+    return [eng.struct({name: value for name, value in bound.items() if value is not None})]
+
+def _is_timeout(error):
+    """True for the timeout of an engine future (matlab.engine.TimeoutError or the builtin)"""
+    return isinstance(error, TimeoutError) or type(error).__name__ == 'TimeoutError'
+
+def _cancel_call(eng, future):
+    """Cancel an overrun engine call and reset the engine; True if it can be reused
+
+    Figures the call left open are closed and the engine is pinged. If any
+    step fails the pool replaces the engine instead.
+    """
     try:
-        print("Initializing MATLAB engine...")
-        _matlab_engine = matlab.engine.start_matlab()
-        # Add path to MATLAB examples
-        examples_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Examples')
-        matlab_dir = os.path.join(examples_dir, 'matlab')
-        if os.path.exists(matlab_dir):
-            _matlab_engine.addpath(matlab_dir)
-        else:
-            print(f"Warning: MATLAB examples directory not found at {matlab_dir}")
-        
-        print("MATLAB Engine initialized successfully")
+        if not future.cancel() and not future.done():
+            return False
+        eng.close('all', nargout=0)
+        eng.eval('1;', nargout=0)
+        return True
     except Exception as e:
-        print(f"Error initializing MATLAB engine: {str(e)}")
-        print("Falling back to Python implementations")
-        _matlab_engine = None
+        print(f"Could not reset MATLAB engine after a timeout: {e}")
+        return False
+
+def _unpack_data(eng, function_name, result):
+    """Default unpacking: hand the raw MATLAB result back"""
+    return {'data': result}
+
+def _matlab_image_to_numpy(image):
+    """Convert an HxWx3 matlab.uint8 array to a numpy array"""
+    if is_matlab_array(image):
+        return matlab_to_numpy(image).astype(np.uint8, copy=False)
+    return np.asarray(image, dtype=np.uint8)
+
+def _to_numpy(value):
+    """MATLAB arrays in a result (at any depth in structs and cells) as numpy"""
+    if is_matlab_array(value):
+        return matlab_to_numpy(value)
+    if isinstance(value, dict):
+        return {k: _to_numpy(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_numpy(v) for v in value]
+    return value
+
+def _capture_figure(eng):
+    """PNG bytes of the figure the last MATLAB call drew, with no temp file
+
+    The engine is checked out for this request only, so its current figure
+    is ours; it is rasterized in memory and then closed so figures never
+    pile up in a long-lived engine.
+    """
+    fig = eng.gcf(nargout=1)
+    try:
+        with metrics.stage('print_figure'):
+            pixels = _matlab_image_to_numpy(eng.print(fig, '-RGBImage', '-r100', nargout=1))
     finally:
-        _matlab_engine_tried = True
+        eng.close('all', nargout=0)
+    buffer = BytesIO()
+    with metrics.stage('png_encode'):
+        Image.fromarray(np.ascontiguousarray(pixels)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def _unpack_figure(eng, function_name, result):
+    """Capture the figure the MATLAB function drew, plus its info fields"""
+    return {
+        'plot_png': _capture_figure(eng),
+        # Add source code if available
+        'source_code': get_matlab_source(function_name),
+        'equation': _field(result, 'equation'),
+        'equations': _field(result, 'equations'),
+        'parameters': _field(result, 'parameters'),
+        'operation': _field(result, 'operation'),
+        'methods': _field(result, 'methods'),
+        'timings': _field(result, 'timings')
+    }
+
+def _unpack_arrays(eng, function_name, result):
+    """Data mode: the returned values as numpy, discarding any figure unrendered"""
+    eng.close('all', nargout=0)
+    if not isinstance(result, dict):
+        result = {'data': result}
+    return _to_numpy(result)
+
+def _unpack_symbolic(eng, function_name, result):
+    """symbolic_math returns a struct with the result and a base64 plot"""
+    if isinstance(result, dict):
+        if 'plot' in result and isinstance(result['plot'], str):
+            # Sanitize base64 string
+            result['plot'] = result['plot'].replace('\n', '').replace('\r', '').strip()
+        return result
+    # If not a dict, try to convert to dict (for MATLAB struct)
+    try:
+        return {k: getattr(result, k) for k in dir(result) if not k.startswith('_')}
+    except Exception as e:
+        return {'status': 'error', 'message': f'Could not process MATLAB symbolic_math result: {str(e)}'}
+
+def _animation_args(eng, entry, bound):
+    """animation.m writes its frames straight into the store directory"""
+    key = _animation_key(bound['animation_type'], bound['num_frames'], 'matlab')
+    return _positional_args(eng, entry, bound) + [_animation_store.directory(key), _animation_store.url(key)]
+
+def _unpack_animation(eng, function_name, result):
+    """animation.m returns frame URLs inside its output directory"""
+    frames = _field(result, 'frames')
+    if frames is None:
+        print("No frames found, returning standard result")
+        return {'data': result}
+    if not isinstance(frames, list):
+        # Handle MATLAB cell array
+        frames = [frames[i] for i in range(len(frames))]
+    frames = [str(frame) for frame in frames]
+    print(f"Successfully processed {len(frames)} frames from MATLAB result")
+    return {
+        'frames': frames,
+        'thumbnail': _field(result, 'thumbnail'),
+        'title': _field(result, 'title', 'Animation'),
+        'description': _field(result, 'description', ''),
+        'num_frames': len(frames)
+    }
+
+# Pool of MATLAB engines (if available); each request checks out its own engine
+_engine_pool = None
+
+# Guards the one-time background start of the pool
+_engine_start_lock = threading.Lock()
+
+# Pool sizing, overridable from the environment
+MATLAB_POOL_SIZE = int(os.environ.get('MATLAB_POOL_SIZE', 2))
+MATLAB_POOL_MAX_USES = int(os.environ.get('MATLAB_POOL_MAX_USES', 200))
+MATLAB_CHECKOUT_TIMEOUT = float(os.environ.get('MATLAB_CHECKOUT_TIMEOUT', 30))
+
+def _parse_timeouts(text):
+    """{'name': seconds} from 'name=seconds,name=seconds'"""
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, seconds = item.partition('=')
+        timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+# Seconds a call may run, per function, before it is abandoned with a
+# 'timeout' result; unlisted functions (or 0) have no deadline. The
+# FUNCTION_TIMEOUTS variable overrides entries, e.g. "matrix_operation=120".
+FUNCTION_TIMEOUTS = {
+    'differential_equation': 30.0,
+    'image_processing': 60.0,
+    'matrix_operation': 60.0,
+    'symbolic_math': 30.0,
+}
+FUNCTION_TIMEOUTS.update(_parse_timeouts(os.environ.get('FUNCTION_TIMEOUTS', '')))
+
+# Fallbacks that run in killable worker processes to enforce their deadline
+# (animation renders in its own process pool; without a deadline,
+# symbolic_math still time-limits its SymPy operations, see symbolic.py)
+SUBPROCESS_FALLBACKS = {'differential_equation', 'image_processing', 'matrix_operation', 'symbolic_math'}
+FALLBACK_WORKERS = int(os.environ.get('FALLBACK_WORKERS', os.cpu_count() or 1))
+
+def _start_engine():
+    """Start one MATLAB engine asynchronously, returning its future"""
+    return matlab.engine.start_matlab(background=True)
+
+# Which registered functions MATLAB can run, resolved once at startup so
+# requests don't pay an eng.exist() round-trip each
+_matlab_exists = {}
+_matlab_exists_lock = threading.Lock()
 
-# Initialize MATLAB engine when module is loaded
-initialize_matlab_engine()
+def _resolve_matlab_functions(eng):
+    """Record, once, which registered functions exist on the MATLAB path"""
+    with _matlab_exists_lock:
+        if _matlab_exists:
+            return
+        for name in matlab_functions:
+            _matlab_exists[name] = eng.exist(name, nargout=1) >= 2  # 2 means it's a file
 
-def get_matlab_engine():
-    """Get the MATLAB engine (already initialized)"""
-    return _matlab_engine
+def _matlab_has(eng, function_name):
+    """Memoized MATLAB exist() check for a function name"""
+    exists = _matlab_exists.get(function_name)
+    if exists is None:
+        with metrics.stage('exist'):
+            exists = _matlab_exists[function_name] = eng.exist(function_name, nargout=1) >= 2
+    return exists
+
+@contextmanager
+def _checkout(pool):
+    """pool.checkout, timing the wait for a free engine as the 'checkout' stage"""
+    started = time.perf_counter()
+    with pool.checkout(timeout=MATLAB_CHECKOUT_TIMEOUT) as eng:
+        metrics.observe_stage('checkout', time.perf_counter() - started)
+        yield eng
+
+def _setup_engine(eng):
+    """Put the examples directory on a freshly started engine's path"""
+    examples_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Examples')
+    matlab_dir = os.path.join(examples_dir, 'matlab')
+    if os.path.exists(matlab_dir):
+        eng.addpath(matlab_dir)
+    else:
+        print(f"Warning: MATLAB examples directory not found at {matlab_dir}")
+    _resolve_matlab_functions(eng)
+
+def initialize_matlab_engine(factory=None, size=None, wait=False):
+    """Start the MATLAB engine pool in the background (idempotent)
+
+    Returns immediately unless `wait` is set; until an engine is ready,
+    `call_matlab_function` serves requests from the Python fallbacks.
+    `factory` defaults to starting real MATLAB engines; pass e.g.
+    `lambda: FakeEngine(...)` to run the pool without MATLAB.
+    """
+    global _engine_pool
+    
+    if factory is None and _engine_pool is None:
+        if not MATLAB_AVAILABLE:
+            return None
+        factory = _start_engine
+    
+    with _engine_start_lock:
+        if _engine_pool is None:
+            pool_size = size or MATLAB_POOL_SIZE
+            print(f"Starting MATLAB engine pool in the background ({pool_size} engines)...")
+            _engine_pool = MatlabEnginePool(factory, size=pool_size, max_uses=MATLAB_POOL_MAX_USES,
+                                            setup=_setup_engine)
+            _engine_pool.start(wait=False)
+        pool = _engine_pool
+    
+    if wait:
+        pool.start(wait=True)
+    return pool
+
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+def _warm_up():
+    # Each step on its own: without SymPy the fallback workers still start
+    steps = {
+        # symbolic_math needs SymPy's own workers only when it runs in-process
+        'SymPy': lambda: symbolic.warm_up(start_workers=not FUNCTION_TIMEOUTS.get('symbolic_math')),
+        'fallback workers': _fallback_workers.start,
+    }
+    for name, step in steps.items():
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+
+def warm_up_fallbacks():
+    """Import SymPy and start the fallback worker processes in the background, once"""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=_warm_up, name='fallback-warm-up', daemon=True).start()
+
+def get_engine_pool():
+    """Get the MATLAB engine pool (None until started or without MATLAB)"""
+    return _engine_pool
+
+def get_engine_status():
+    """Readiness of the MATLAB backend, for health checks"""
+    if _engine_pool is None:
+        return {'state': 'unavailable' if not MATLAB_AVAILABLE else 'cold'}
+    return _engine_pool.status()
+
+# Kept for callers that still import the old single-engine accessor
+get_matlab_engine = get_engine_pool
+
+# Deterministic functions whose results can be reused for identical params
+# (image_processing adds unseeded noise and animation writes frame files)
+CACHEABLE_FUNCTIONS = {'simple_plot', 'advanced_plot', 'differential_equation',
+                       'matrix_operation', 'symbolic_math'}
+
+# Params that don't change the result (symbolic_math's side-output plot file)
+_CACHE_IGNORED_PARAMS = ('plot_path',)
+
+_result_cache = None
+if os.environ.get('RESULT_CACHE', '1') != '0':
+    _result_cache = ResultCache(
+        max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        disk_dir=os.environ.get('RESULT_CACHE_DIR') or None,
+        disk_max_bytes=int(os.environ.get('RESULT_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024)),
+    )
+
+# Rendered plots served by URL (/plots/<digest>.png) rather than inline
+_plot_store = PlotStore(
+    directory=os.environ.get('PLOT_STORE_DIR') or None,
+    max_bytes=int(os.environ.get('PLOT_STORE_MAX_BYTES', 32 * 1024 * 1024)),
+)
+
+# Rendered animations, one immutable directory per (type, frames, backend)
+_animation_store = AnimationStore(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'animation'),
+    max_bytes=int(os.environ.get('ANIMATION_STORE_MAX_BYTES', 256 * 1024 * 1024)),
+    max_age=float(os.environ.get('ANIMATION_STORE_MAX_AGE', 7 * 24 * 3600)),
+)
+
+# Identical calls in flight at once share one computation: 'process'
+# coalesces within each server process, 'file' also across the workers on
+# this host (through lock files, picking results up from the animation store
+# and RESULT_CACHE_DIR), '0' turns it off
+COALESCE = os.environ.get('COALESCE', 'process')
+_single_flight = None
+if COALESCE != '0':
+    _single_flight = SingleFlight(
+        lock_dir=(os.environ.get('COALESCE_LOCK_DIR')
+                  or default_dir('locks')) if COALESCE == 'file' else None,
+        lock_timeout=float(os.environ.get('COALESCE_LOCK_TIMEOUT', 120)),
+    )
+
+def _animation_key(animation_type, num_frames, backend):
+    return AnimationStore.key(str(animation_type).lower(), num_frames, backend)
+
+def encode_animation(frames, output):
+    """One-file encoding ('webp', 'gif' or 'sprite') of an animation's frame URLs"""
+    return _animation_store.encode(frames, output)
+
+def get_plot_store():
+    """The store backing plot URLs"""
+    return _plot_store
+
+def get_cache_stats():
+    """Hit/miss/eviction counters of the result cache, the symbolic expression cache and coalescing"""
+    extra = {'symbolic': symbolic.stats(),
+             'coalescing': _single_flight.stats() if _single_flight is not None else {'mode': 'off'}}
+    if _result_cache is None:
+        return {'enabled': False, **extra}
+    return {'enabled': True, **_result_cache.stats(), **extra}
+
+def bind_params(function_name, params):
+    """Request params coerced, defaulted and clamped by a registered function's schema"""
+    return matlab_functions[function_name].bind(params or {})
 
 def get_matlab_source(function_name):
     """Get the source code of a MATLAB function"""
@@ -88,276 +555,375 @@ def get_matlab_source(function_name):
                 return f"% Could not read source code due to encoding error: {e}"
     return None
 
-def call_matlab_function(function_name, params=None):
-    """Call a MATLAB function or its Python fallback"""
-    if params is None:
-        params = {}
+def call_matlab_function(function_name, params=None, plot_format='base64', result_format='plot'):
+    """Call a MATLAB function or its Python fallback
+
+    `plot_format` picks how a rendered plot comes back: base64 text in
+    'plot' (the default), a content-addressed 'plot_url', or the raw PNG
+    bytes in 'plot_png' ('png'); see encode_plot. With `result_format`
+    'data' nothing is rendered and the result holds numpy arrays instead
+    (see _compute_data).
+    """
+    # Unregistered names share one label so callers can't grow the metrics
+    label = function_name if function_name in matlab_functions else 'other'
+    token = metrics.current_scope.set(label)
+    started = time.perf_counter()
+    backend, outcome = 'none', 'error'
+    try:
+        result, backend = _call_matlab_function(function_name, params, plot_format, result_format)
+        status = result.get('status') if isinstance(result, dict) else None
+        outcome = status if status in ('error', 'timeout') else 'success'
+        return result
+    finally:
+        metrics.current_scope.reset(token)
+        metrics.CALL_SECONDS.labels(label, backend).observe(time.perf_counter() - started)
+        metrics.CALLS.labels(label, backend, outcome).inc()
+
+def _call_matlab_function(function_name, params, plot_format, result_format):
+    """call_matlab_function's work; returns (result, backend that produced it)"""
+    entry = matlab_functions.get(function_name) or MatlabFunction(function_name)
+    params = entry.bind(params or {})
     
-    # Try to use MATLAB if available
-    eng = get_matlab_engine()
-    if eng is not None:
+    pool = initialize_matlab_engine()
+    use_matlab = pool is not None and pool.ready
+    
+    # Serve repeated deterministic calls from the cache, keyed per backend
+    # because MATLAB and the fallbacks render differently
+    data = result_format == 'data'
+    key = make_key(function_name, params, 'data' if data else 'matlab' if use_matlab else 'python',
+                   _CACHE_IGNORED_PARAMS)
+    stored = _lookup_stored(entry, params, key, data, use_matlab)
+    if stored is not None:
+        return (stored if data else encode_plot(stored, plot_format)), 'cache'
+    
+    compute = lambda: _compute_and_store(entry, params, key, data, pool if use_matlab else None)
+    if _single_flight is None or not _coalescible(params):
+        result, backend = compute()
+    else:
+        # Identical calls already in flight wait for that one instead of recomputing
+        (result, backend), shared = _single_flight.do(key, compute)
+        if shared:
+            metrics.COALESCED.labels(metrics.current_scope.get(), 'process').inc()
+        # Every caller encodes its own copy (encode_plot edits the dict in place)
+        if isinstance(result, dict):
+            result = dict(result)
+    return (result if data else encode_plot(result, plot_format)), backend
+
+def _coalescible(params):
+    """Whether make_key tells these params apart exactly (arrays only by a truncated repr)"""
+    return all(value is None or isinstance(value, (str, int, float)) for value in params.values())
+
+def _lookup_stored(entry, params, key, data, use_matlab):
+    """A stored result for this call (result cache or animation store), or None"""
+    label = metrics.current_scope.get()
+    if entry.name in CACHEABLE_FUNCTIONS and _result_cache is not None:
+        with metrics.stage('cache_lookup'):
+            cached = _result_cache.get(key)
+        metrics.CACHE_LOOKUPS.labels(label, 'miss' if cached is None else 'hit').inc()
+        return cached
+    # Animations already rendered on this backend are served from disk
+    if entry.name == 'animation' and not data:
+        stored = _animation_store.lookup(_animation_key(
+            params['animation_type'], params['num_frames'], 'matlab' if use_matlab else 'python'))
+        metrics.CACHE_LOOKUPS.labels(label, 'miss' if stored is None else 'hit').inc()
+        return stored
+    return None
+
+def _compute_and_store(entry, params, key, data, pool):
+    """Compute a call that missed the stores, then store it; returns (result, backend)
+
+    In 'file' coalescing mode the call holds the key's lock file meanwhile,
+    and looks again first: another worker may just have stored it.
+    """
+    cache = _result_cache if entry.name in CACHEABLE_FUNCTIONS else None
+    shared_store = entry.name == 'animation' or (cache is not None and cache.disk_dir)
+    with (_single_flight.file_lock(key) if _single_flight is not None and shared_store and _coalescible(params)
+          else nullcontext(False)) as locked:
+        if locked:
+            stored = _lookup_stored(entry, params, key, data, pool is not None)
+            if stored is not None:
+                metrics.COALESCED.labels(metrics.current_scope.get(), 'file').inc()
+                return stored, 'cache'
+        
+        if data:
+            result = _compute_data(entry, params, pool)
+            if cache is not None and result.get('status') != 'timeout':
+                cache.put(key, result)
+            return result, 'python' if entry.data is not None else 'matlab'
+        
+        result, backend = _compute(entry, params, pool)
+        
+        if entry.name == 'animation' and isinstance(result, dict) and result.get('frames'):
+            _animation_store.commit(_animation_key(params['animation_type'], params['num_frames'], backend), result)
+        if cache is not None and not (isinstance(result, dict) and result.get('status') in ('error', 'timeout')):
+            cache.put(make_key(entry.name, params, backend, _CACHE_IGNORED_PARAMS), result)
+        return result, backend
+
+# Background jobs (see job_store.py), kept in a local SQLite file for JOB_TTL
+# seconds after they finish; at most JOB_QUEUE_MAX wait for a thread
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_MAX = int(os.environ.get('JOB_QUEUE_MAX', 100))
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+def _run_job(function_name, params, result_format='plot'):
+    # Plots go to the plot store, so a job record holds only their URL
+    return call_matlab_function(function_name, params, plot_format='url', result_format=result_format)
+
+def get_job_runner():
+    """The process's JobRunner, opening the job database on first use"""
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            store = JobStore(os.environ.get('JOB_DB') or None,
+                             ttl=float(os.environ.get('JOB_TTL', 3600)),
+                             stale_ttl=float(os.environ.get('JOB_STALE_TTL', 86400)))
+            _job_runner = JobRunner(store, _run_job, JOB_WORKERS, JOB_QUEUE_MAX)
+        return _job_runner
+
+def submit_job(function_name, params=None, result_format='plot'):
+    """Queue a call_matlab_function call in the background and return its job id
+
+    Unknown functions and params that don't fit the schema raise
+    ValueError here, before anything is queued; a full queue raises
+    JobQueueFull.
+    """
+    entry = matlab_functions.get(function_name)
+    if entry is None:
+        raise ValueError(f"Unknown function: {function_name}")
+    if result_format not in ('plot', 'data'):
+        raise ValueError(f"Unknown result format: {result_format}")
+    entry.bind(params or {})
+    return get_job_runner().submit(function_name, params or {}, result_format=result_format)
+
+def get_job(job_id, with_result=True):
+    """A job's record (status, timestamps and, once finished, result), or None"""
+    return get_job_runner().store.get(job_id, with_result)
+
+# Functions with a batched native implementation (see sweeps.py)
+SWEEP_FUNCTIONS = {'advanced_plot': waveform_sweep, 'differential_equation': ode_sweep}
+BATCH_MAX_SETS = int(os.environ.get('BATCH_MAX_SETS', 1000))
+BATCH_MAX_POINTS = int(os.environ.get('BATCH_MAX_POINTS', 5_000_000))
+
+def run_sweep(function_name, spec, figure=None, plot_format='base64'):
+    """Evaluate many parameter sets of one function in a single vectorized pass
+
+    `spec` is {'params': [...]} or {'grid': {...}, 'base': {...}}; see
+    sweeps.expand_sweep. Returns the bound parameter sets and a numeric
+    result per set and, if `figure` is 'overlay' or 'grid', one plot of
+    them all. Sweeps always run natively: MATLAB would need a call per set.
+    They run under the function's deadline, in a fallback worker if it
+    has one, and return a 'timeout' result when they overrun it.
+    """
+    if function_name not in SWEEP_FUNCTIONS:
+        raise ValueError(f"Function {function_name} does not support batches")
+    entry = matlab_functions[function_name]
+    # Schema params are coerced as usual; extras (e.g. ODE system
+    # parameters) are validated by the sweep itself
+    names = {name for param in entry.params for name in (param.name,) + param.aliases}
+    sets = [{**{k: v for k, v in params.items() if k not in names}, **entry.bind(params)}
+            for params in expand_sweep(spec, BATCH_MAX_SETS)]
+    total = sum(params['num_points'] for params in sets)
+    if total > BATCH_MAX_POINTS:
+        raise ValueError(f"Sweep has {total:,d} points in all (at most {BATCH_MAX_POINTS:,d} allowed)")
+    timeout = _deadline(entry)
+    try:
+        with metrics.stage('fallback'):
+            if timeout is None or function_name not in SUBPROCESS_FALLBACKS:
+                result = _evaluate_sweep(function_name, sets, figure)
+            else:
+                result = _fallback_workers.run(_evaluate_sweep, (function_name, sets, figure), timeout)
+    except WorkerTimeout as e:
+        print(f"Sweep of {function_name} stopped: {e}")
+        return _timeout_result(function_name, timeout, 'python')
+    return encode_plot(result, plot_format)
+
+def _evaluate_sweep(function_name, sets, figure):
+    """run_sweep's numbers and figure, e.g. in a worker process"""
+    result = {'sets': sets, 'results': SWEEP_FUNCTIONS[function_name](sets)}
+    if figure:
+        result['plot_png'] = _sweep_figure(function_name, sets, result['results'], figure)
+    return result
+
+def _sweep_figure(function_name, sets, results, figure):
+    """Overlay or small-multiples figure of a sweep's results"""
+    varying = varying_params(sets)
+    label = lambda value: f"{value:g}" if isinstance(value, float) else str(value)
+    labels = [', '.join(f"{name}={label(params.get(name))}" for name in varying) or function_name
+              for params in sets]
+    if function_name == 'differential_equation':
+        # First state component (position, angle, prey, x) against time
+        panels = [[(r['t'], states[0]) for states in r['states']] for r in results]
+        ylabel = get_system(sets[0]['eq_type']).figure.get('series_ylabel', 'State')
+        xlabel, title = 'Time', f"{get_system(sets[0]['eq_type']).name} sweep ({len(sets)} sets)"
+    else:
+        panels = [[(r['x'], r['y'])] for r in results]
+        xlabel, ylabel, title = 'X axis', 'Y axis', f"{sets[0]['function_type']} sweep ({len(sets)} sets)"
+    if figure == 'grid':
+        return render_small_multiples(panels, labels, xlabel, ylabel)
+    if figure != 'overlay':
+        raise ValueError(f"Unknown sweep figure '{figure}' (expected 'overlay' or 'grid')")
+    curves = [curve for panel in panels for curve in panel]
+    curve_labels = [label for label, panel in zip(labels, panels) for _ in panel]
+    return render_overlay(curves, title, xlabel, ylabel, curve_labels)
+
+def pack_arrays(result):
+    """A data-mode result as .npz bytes
+
+    Nested entries are flattened into dotted names (e.g. 'states.0'), and
+    scalars and strings are stored as 0-d arrays.
+    """
+    arrays = {}
+    def flatten(prefix, value):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                flatten(f"{prefix}.{k}" if prefix else str(k), v)
+        elif isinstance(value, (list, tuple)) and not all(np.isscalar(v) for v in value):
+            for i, v in enumerate(value):
+                flatten(f"{prefix}.{i}", v)
+        elif value is not None:
+            arrays[prefix] = np.asarray(value)
+    flatten('', result)
+    buffer = BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+def encode_plot(result, plot_format='base64'):
+    """Convert a result's raw 'plot_png' bytes to the requested format
+
+    Renderers hand back PNG bytes so they are only encoded once, at the
+    edge: 'base64' fills 'plot', 'url' stores the image and fills
+    'plot_url', and 'png' keeps 'plot_png'. The latter two add the
+    content digest as 'plot_etag'.
+    """
+    if not isinstance(result, dict):
+        return result
+    png = result.pop('plot_png', None)
+    if png is None:
+        plot = result.get('plot')
+        if plot_format == 'base64' or not plot or not isinstance(plot, str):
+            return result
+        # MATLAB functions that return base64 themselves (symbolic_math)
+        png = base64.b64decode(plot)
+    with metrics.stage('encode'):
+        return _encode_png(result, png, plot_format)
+
+def _encode_png(result, png, plot_format):
+    if plot_format == 'url':
+        digest = _plot_store.put(png)
+        result.pop('plot', None)
+        result['plot_url'] = f'/plots/{digest}.png'
+        result['plot_etag'] = digest
+    elif plot_format == 'png':
+        result.pop('plot', None)
+        result['plot_png'] = png
+        result['plot_etag'] = PlotStore.digest(png)
+    else:
+        result['plot'] = png_to_base64(png)
+    return result
+
+def _timeout_result(function_name, timeout, backend):
+    """What a call that overran its deadline returns"""
+    return {
+        'status': 'timeout',
+        'function': function_name,
+        'backend': backend,
+        'timeout': timeout,
+        'message': f"{function_name} did not finish within {timeout:g} s"
+    }
+
+def _run_native(function_name, params, data=False):
+    """Run a registered fallback (or data function) by name, e.g. in a worker process"""
+    entry = matlab_functions[function_name]
+    return (entry.data if data else entry.fallback)(**params)
+
+def _fallback_worker_init():
+    """Worker start-up: unpickling this function imported the bridge and its renderers"""
+
+_fallback_workers = WorkerPool(FALLBACK_WORKERS, initializer=_fallback_worker_init)
+
+def _deadline(entry):
+    """Seconds the function may run, or None"""
+    return FUNCTION_TIMEOUTS.get(entry.name) or None
+
+def _compute_native(entry, params, data=False):
+    """The fallback or data function, in a killable worker if it has a deadline"""
+    timeout = _deadline(entry)
+    try:
+        with metrics.stage('fallback'):
+            if timeout is None or entry.name not in SUBPROCESS_FALLBACKS:
+                return _run_native(entry.name, params, data)
+            return _fallback_workers.run(_run_native, (entry.name, params, data), timeout)
+    except WorkerTimeout as e:
+        print(f"Python fallback {entry.name} stopped: {e}")
+        return _timeout_result(entry.name, timeout, 'python')
+
+def _matlab_timeout(entry, error):
+    """The 'timeout' result of an overrun MATLAB call
+
+    Raised through pool.checkout, EngineCallTimeout has already returned
+    the engine to service or had it replaced.
+    """
+    print(f"MATLAB call stopped: {error} (engine {'reset' if error.recovered else 'replaced'})")
+    return _timeout_result(entry.name, _deadline(entry), 'matlab')
+
+def _compute_data(entry, params, pool):
+    """Numbers only: the native data function, else MATLAB's return values
+
+    Either way no figure is rendered or captured.
+    """
+    if entry.data is not None:
+        return _compute_native(entry, params, data=True)
+    if pool is not None:
+        try:
+            with _checkout(pool) as eng:
+                if _matlab_has(eng, entry.name):
+                    return entry.call_matlab(eng, params, unpack=_unpack_arrays, timeout=_deadline(entry))
+        except EngineCallTimeout as e:
+            return _matlab_timeout(entry, e)
+    raise ValueError(f"Function {entry.name} has no data mode without MATLAB")
+
+def _compute(entry, params, pool):
+    """Run the call on MATLAB when possible; returns (result, backend used)"""
+    # Try to use MATLAB if available, on an engine checked out for this call only;
+    # while the pool is still warming up, answer from the Python fallback
+    reason = 'no_engine'
+    if pool is not None:
         try:
-            # Check if the function exists in MATLAB
-            if eng.exist(function_name, nargout=1) >= 2:  # 2 means it's a file
-                print(f"Calling MATLAB function: {function_name} with params: {params}")
-                # Convert the params to MATLAB format and call the function
-                if function_name == "simple_plot":
-                    x_min = params.get('x_min', -10)
-                    x_max = params.get('x_max', 10)
-                    num_points = params.get('num_points', 100)
-                    result = eng.simple_plot(float(x_min), float(x_max), float(num_points))
-                elif function_name == "advanced_plot":
-                    function_type = params.get('function_type', 'sin')
-                    amplitude = params.get('amplitude', 1)
-                    frequency = params.get('frequency', 1)
-                    phase = params.get('phase', 0)
-                    x_min = params.get('x_min', -10)
-                    x_max = params.get('x_max', 10)
-                    num_points = params.get('num_points', 100)
-                    result = eng.advanced_plot(function_type, float(amplitude), float(frequency), 
-                                              float(phase), float(x_min), float(x_max), float(num_points))
-                elif function_name == "differential_equation":
-                    eq_type = params.get('eq_type', 'spring')
-                    t_max = params.get('t_max', 10)
-                    num_points = params.get('num_points', 100)
-                    result = eng.differential_equation(eq_type, float(t_max), float(num_points))
-                elif function_name == "image_processing":
-                    operation = params.get('operation', 'edge')
-                    noise_level = params.get('noise_level', 0.2)
-                    result = eng.image_processing(operation, float(noise_level))
-                elif function_name == "animation":
-                    animation_type = params.get('animation_type', 'pendulum')
-                    num_frames = params.get('num_frames', 20)
-                    print(f"Calling MATLAB animation: type={animation_type}, frames={num_frames}")
-                    result = eng.animation(animation_type, float(num_frames))
-                elif function_name == "symbolic_math":
-                    # Extract parameters with proper defaults
-                    expression = params.get('arg1', 'x^2')
-                    operation = params.get('arg2', 'simplify')
-                    plot_path = params.get('arg3', None)
-                    print(f"Calling MATLAB symbolic_math: expression={expression}, operation={operation}")
-                    
-                    # Create a MATLAB struct for parameters - symbolic_math.m expects a single struct parameter
-                    matlab_params = {}
-                    matlab_params['expression'] = expression
-                    matlab_params['operation'] = operation  
-                    if plot_path:
-                        matlab_params['plot_path'] = plot_path
-                    
-                    # Convert Python dict to MATLAB struct
-                    matlab_struct = eng.struct(matlab_params)
-                    
-                    # Call MATLAB function with the struct parameter
-                    result = eng.symbolic_math(matlab_struct)
-                    
-                    # Debug direct result to see structure
-                    print(f"Direct MATLAB result type: {type(result)}")
-                    print(f"Result attributes: {[attr for attr in dir(result) if not attr.startswith('_')]}")
-                    print(f"Raw symbolic_math result keys: {dict(result).keys() if isinstance(result, dict) else 'Not a dict'}")
-                    
-                    # For symbolic math, print debug info about plot
-                    if isinstance(result, dict):
-                        if 'plot' in result and isinstance(result['plot'], str):
-                            print(f"MATLAB symbolic_math plot length: {len(result['plot'])}")
-                            print(f"MATLAB symbolic_math plot preview: {result['plot'][:100]}")
-                            # Sanitize base64 string
-                            result['plot'] = result['plot'].replace('\n', '').replace('\r', '').strip()
-                        return result
-                    else:
-                        # If not a dict, try to convert to dict (for MATLAB struct)
-                        try:
-                            result_dict = {k: getattr(result, k) for k in dir(result) if not k.startswith('_')}
-                            return result_dict
-                        except Exception as e:
-                            return {'status': 'error', 'message': f'Could not process MATLAB symbolic_math result: {str(e)}'}
-                elif function_name == "animation":
-                    animation_type = params.get('animation_type', 'pendulum')
-                    num_frames = params.get('num_frames', 20)
-                    print(f"Calling MATLAB animation: type={animation_type}, frames={num_frames}")
-                    result = eng.animation(animation_type, float(num_frames))
-                    
-                    # Debug direct result to see structure
-                    print(f"Direct MATLAB result type: {type(result)}")
-                    print(f"Result attributes: {[attr for attr in dir(result) if not attr.startswith('_')]}")
-                    print(f"Raw animation result keys: {dict(result).keys() if isinstance(result, dict) else 'Not a dict'}")
-                    
-                    # Process animation result
-                    if isinstance(result, dict):
-                        # This is a Python fallback result or a dict from MATLAB
-                        frames = result.get('frames', [])
-                        # Prepare static animation directory
-                        static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'animation')
-                        if os.path.exists(static_dir):
-                            # Remove old frames
-                            for f in os.listdir(static_dir):
-                                if f.endswith('.png'):
-                                    try:
-                                        os.remove(os.path.join(static_dir, f))
-                                    except Exception as e:
-                                        print(f"Failed to remove old frame {f}: {e}")
-                        else:
-                            os.makedirs(static_dir, exist_ok=True)
-                            
-                        # Copy frames to static directory and build URLs
-                        frames_data = []
-                        for i, frame in enumerate(frames):
-                            # If frame is a file path
-                            if isinstance(frame, str) and (os.path.exists(frame) or frame.startswith('C:\\')):
-                                try:
-                                    # Define the destination path in static/animation
-                                    dest_path = os.path.join(static_dir, f"frame_{i:03d}.png")
-                                    print(f"[MATLAB] Copying frame from {frame} to {dest_path}")
-                                    
-                                    # Copy the frame
-                                    import shutil
-                                    shutil.copy2(frame, dest_path)
-                                    
-                                    # Add URL to frames_data
-                                    frames_data.append(f"/static/animation/frame_{i:03d}.png")
-                                except Exception as e:
-                                    print(f"Error copying frame at {frame}: {e}")
-                            else:
-                                # Not a file path, just append it
-                                frames_data.append(frame)
-                        thumbnail = result.get('thumbnail')
-                        # If thumbnail is a file path, encode it
-                        if thumbnail and isinstance(thumbnail, str) and os.path.exists(thumbnail):
-                            with open(thumbnail, 'rb') as f:
-                                thumbnail = base64.b64encode(f.read()).decode('utf-8')
-                        title = result.get('title', 'Animation')
-                        description = result.get('description', '')
-                        num_frames = result.get('num_frames', len(frames_data))
-                        if frames_data:
-                            print(f"Successfully processed {len(frames_data)} frames from dict result")
-                            return {
-                                'frames': frames_data,
-                                'thumbnail': thumbnail,
-                                'title': title,
-                                'description': description,
-                                'num_frames': num_frames
-                            }
-                    else:
-                        # Try to process as MATLAB result (object)
-                        frames_data = []
-                        try:
-                            # Try to access frames from result
-                            if hasattr(result, 'frames'):
-                                frames_attr = result.frames
-                                if isinstance(frames_attr, list):
-                                    frame_paths = frames_attr
-                                else:
-                                    # Handle MATLAB cell array
-                                    frame_paths = [frames_attr[i] for i in range(len(frames_attr))]
-                                print(f"Processing {len(frame_paths)} frame paths")
-                                # Prepare static animation directory
-                                static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'animation')
-                                if os.path.exists(static_dir):
-                                    # Remove old frames
-                                    for f in os.listdir(static_dir):
-                                        if f.endswith('.png'):
-                                            try:
-                                                os.remove(os.path.join(static_dir, f))
-                                            except Exception as e:
-                                                print(f"Failed to remove old frame {f}: {e}")
-                                else:
-                                    os.makedirs(static_dir, exist_ok=True)
-                                    
-                                # Process each frame
-                                for i, frame_path in enumerate(frame_paths):
-                                    try:
-                                        # Define the destination path in static/animation
-                                        dest_path = os.path.join(static_dir, f"frame_{i:03d}.png")
-                                        print(f"[MATLAB] Copying frame from {frame_path} to {dest_path}")
-                                        
-                                        # Copy the frame
-                                        import shutil
-                                        shutil.copy2(frame_path, dest_path)
-                                        
-                                        # Add URL to frames_data
-                                        frames_data.append(f"/static/animation/frame_{i:03d}.png")
-                                    except Exception as e:
-                                        print(f"Error copying frame at {frame_path}: {e}")
-                                # Get title and description
-                                title = result.title if hasattr(result, 'title') else 'Animation'
-                                description = result.description if hasattr(result, 'description') else ''
-                                # Read thumbnail
-                                thumbnail = None
-                                if hasattr(result, 'thumbnail') and result.thumbnail and os.path.exists(result.thumbnail):
-                                    with open(result.thumbnail, 'rb') as f:
-                                        thumbnail = base64.b64encode(f.read()).decode('utf-8')
-                                if frames_data:
-                                    print(f"Successfully processed {len(frames_data)} frames from MATLAB result")
-                                    print(f"[DEBUG] Final frame URLs from MATLAB: {frames_data}")
-                                    return {
-                                        'frames': frames_data,
-                                        'thumbnail': thumbnail,
-                                        'title': title,
-                                        'description': description,
-                                        'num_frames': len(frames_data)
-                                    }
-                        except Exception as e:
-                            print(f"Error in animation processing: {e}")
-                            import traceback
-                            traceback.print_exc()
-                    
-                    # If we didn't return frames data, continue with regular return
-                    print("No frames found, returning standard result")
-                else:
-                    # For other functions, try keyword args as fallback
-                    result = getattr(eng, function_name)(**params)
-                
-                # Handle capturing figures from MATLAB
-                if function_name.endswith('_plot') or function_name in ["differential_equation", "image_processing"]:
-                    # Get the current figure from MATLAB and save it
-                    eng.eval("saveas(gcf, 'temp_plot.png')", nargout=0)
-                    with open('temp_plot.png', 'rb') as f:
-                        plot_data = base64.b64encode(f.read()).decode('utf-8')
-                    os.remove('temp_plot.png')
-                    
-                    # Add source code if available
-                    source_code = get_matlab_source(function_name)
-                    
-                    return {
-                        'plot': plot_data,
-                        'source_code': source_code,
-                        'equation': result.equation if hasattr(result, 'equation') else None,
-                        'equations': result.equations if hasattr(result, 'equations') else None,
-                        'parameters': result.parameters if hasattr(result, 'parameters') else None,
-                        'operation': result.operation if hasattr(result, 'operation') else None,
-                        'methods': result.methods if hasattr(result, 'methods') else None
-                    }
-                
-                return {'data': result}
+            with _checkout(pool) as eng:
+                if _matlab_has(eng, entry.name):
+                    print(f"Calling MATLAB function: {entry.name} with params: {params}")
+                    return entry.call_matlab(eng, params, timeout=_deadline(entry)), 'matlab'
+                reason = 'not_on_path'
+        except EngineCallTimeout as e:
+            return _matlab_timeout(entry, e), 'matlab'
+        except EnginePoolTimeout as e:
+            print(f"MATLAB engine pool busy, using Python fallback: {e}")
+            reason = 'pool_busy'
         except Exception as e:
             print(f"Error calling MATLAB function: {e}")
             import traceback
             traceback.print_exc()
+            reason = 'matlab_error'
     
     # Fall back to Python implementation
-    if function_name in matlab_functions:
-        return matlab_functions[function_name](**params)
+    if entry.fallback is not None:
+        metrics.FALLBACKS.labels(metrics.current_scope.get(), reason).inc()
+        return _compute_native(entry, params), 'python'
     
-    raise ValueError(f"Function {function_name} not available in MATLAB or as a fallback")
+    raise ValueError(f"Function {entry.name} not available in MATLAB or as a fallback")
 
 # Define fallback functions for our standard examples
-@matlab_function("simple_plot")
+@matlab_function("simple_plot", [
+    Param('x_min', -10),
+    Param('x_max', 10),
+    Param('num_points', 100, int, bounds=(2, MAX_NUM_POINTS)),
+], unpack=_unpack_figure)
 def simple_plot(x_min=-10, x_max=10, num_points=100):
     """Simple sine wave plot (Python fallback for MATLAB function)"""
-    x = np.linspace(x_min, x_max, num_points)
-    y = np.sin(x)
-    
-    plt.figure(figsize=(10, 6))
-    plt.plot(x, y)
-    plt.title('Simple Sine Wave (Python Implementation)')
-    plt.xlabel('X axis')
-    plt.ylabel('Y axis')
-    plt.grid(True)
+    data = simple_plot_data(x_min, x_max, num_points)
     
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
+    plot_png = render_line(data['x'], data['y'], 'Simple Sine Wave (Python Implementation)')
     
     # Get the source code (Python version since MATLAB is unavailable)
     source_code = """function result = simple_plot(x_min, x_max, num_points)
@@ -371,44 +937,42 @@ def simple_plot(x_min=-10, x_max=10, num_points=100):
 end"""
     
     return {
-        'plot': plot_data,
+        'plot_png': plot_png,
         'source_code': source_code
     }
 
-@matlab_function("advanced_plot")
+@matlab_data("simple_plot")
+def simple_plot_data(x_min=-10, x_max=10, num_points=100):
+    """The simple_plot sine wave as arrays"""
+    x = np.linspace(x_min, x_max, num_points)
+    return {'x': x, 'y': np.sin(x)}
+
+@matlab_function("advanced_plot", [
+    Param('function_type', 'sin', str),
+    Param('amplitude', 1),
+    Param('frequency', 1),
+    Param('phase', 0),
+    Param('x_min', -10),
+    Param('x_max', 10),
+    Param('num_points', 100, int, bounds=(2, MAX_NUM_POINTS)),
+], unpack=_unpack_figure)
 def advanced_plot(function_type="sin", amplitude=1, frequency=1, phase=0, x_min=-10, x_max=10, num_points=100):
     """Plot of various waveforms with adjustable parameters (Python fallback)"""
-    x = np.linspace(x_min, x_max, num_points)
+    data = advanced_plot_data(function_type, amplitude, frequency, phase, x_min, x_max, num_points)
+    x, y = data['x'], data['y']
     
     if function_type == "sin":
-        y = amplitude * np.sin(frequency * x + phase)
         title = f"Sine Wave: {amplitude}·sin({frequency}x + {phase})"
     elif function_type == "cos":
-        y = amplitude * np.cos(frequency * x + phase)
         title = f"Cosine Wave: {amplitude}·cos({frequency}x + {phase})"
     elif function_type == "tan":
-        y = amplitude * np.tan(frequency * x + phase)
-        y = np.clip(y, -10, 10)  # Clip to prevent excessive values
         title = f"Tangent Wave: {amplitude}·tan({frequency}x + {phase})"
     elif function_type == "square":
-        y = amplitude * np.sign(np.sin(frequency * x + phase))
         title = f"Square Wave: amplitude={amplitude}, freq={frequency}, phase={phase}"
     else:
-        y = np.zeros_like(x)
         title = "Unknown function type"
     
-    plt.figure(figsize=(10, 6))
-    plt.plot(x, y)
-    plt.title(title)
-    plt.xlabel('X axis')
-    plt.ylabel('Y axis')
-    plt.grid(True)
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
+    plot_png = render_line(x, y, title)
     
     # Get the source code (Python version since MATLAB is unavailable)
     source_code = """function result = advanced_plot(function_type, amplitude, frequency, phase, x_min, x_max, num_points)
@@ -425,357 +989,304 @@ def advanced_plot(function_type="sin", amplitude=1, frequency=1, phase=0, x_min=
 end"""
     
     return {
-        'plot': plot_data,
+        'plot_png': plot_png,
         'source_code': source_code
     }
 
+@matlab_data("advanced_plot")
+def advanced_plot_data(function_type="sin", amplitude=1, frequency=1, phase=0, x_min=-10, x_max=10, num_points=100):
+    """The advanced_plot waveform as arrays"""
+    x = np.linspace(x_min, x_max, num_points)
+    return {'x': x, 'y': waveform(function_type, x, amplitude, frequency, phase)}
+
 # Define fallbacks for our new functions
 
-@matlab_function('symbolic_math')
+@matlab_function('symbolic_math', [
+    Param('expression', 'x^2', str, aliases=('arg1',)),
+    Param('operation', 'simplify', str, aliases=('arg2',)),
+    Param('plot_path', None, str, aliases=('arg3',)),
+], to_matlab=_struct_args, unpack=_unpack_symbolic)
 def symbolic_math(expression='x^2', operation='simplify', plot_path=None):
-    """Symbolic math operations with a Python fallback using SymPy"""
-    try:
-        import sympy as sp
-        from sympy.parsing.sympy_parser import parse_expr
-        import matplotlib.pyplot as plt
-        import numpy as np
-        import base64
-        from io import BytesIO
-        
-        # Initialize result
-        result = {
-            'status': 'success',
-            'result': '',
-            'latex': '',
-            'plot': None
+    """Symbolic math operations with a Python fallback using SymPy (cached, see symbolic.py)"""
+    if operation not in symbolic.OPERATIONS:
+        return {
+            'status': 'error',
+            'message': f'Unknown operation: {operation}'
         }
-        
-        # Parse the expression
-        x = sp.Symbol('x')
+    try:
+        # Parse the expression (or reuse its cached parse)
         try:
-            expr = parse_expr(expression)
+            compiled = symbolic.compile_expression(expression)
+        except ImportError:
+            raise
         except Exception as e:
             return {
                 'status': 'error',
                 'message': f'Error parsing expression: {str(e)}'
             }
         
-        # Perform the operation
-        if operation == 'simplify':
-            res = sp.simplify(expr)
-            result['result'] = str(res)
-            result['latex'] = sp.latex(res)
-        
-        elif operation == 'differentiate':
-            res = sp.diff(expr, x)
-            result['result'] = str(res)
-            result['latex'] = sp.latex(res)
-        
-        elif operation == 'integrate':
-            res = sp.integrate(expr, x)
-            result['result'] = str(res)
-            result['latex'] = sp.latex(res)
+        if operation != 'plot':
+            res, latex = symbolic.evaluate(expression, operation)
+            return {
+                'status': 'success',
+                'result': res,
+                'latex': latex,
+                'plot': None
+            }
         
-        elif operation == 'solve':
-            res = sp.solve(expr, x)
-            result['result'] = str(res)
-            result['latex'] = sp.latex(res)
+        # Generate x values
+        x_vals = np.linspace(-10, 10, 1000)
         
-        elif operation == 'plot':
-            # Create plot using matplotlib
-            plt.figure(figsize=(8, 6))
-            
-            # Convert sympy expression to numpy function
-            f = sp.lambdify(x, expr, 'numpy')
-            
-            # Generate x values
-            x_vals = np.linspace(-10, 10, 1000)
-            
-            # Calculate y values, handling potential errors
-            try:
-                y_vals = f(x_vals)
-                plt.plot(x_vals, y_vals)
-                plt.title(f'Plot of {expression}')
-                plt.xlabel('x')
-                plt.ylabel('y')
-                plt.grid(True)
-                
-                # Save to buffer
-                buffer = BytesIO()
-                plt.savefig(buffer, format='png')
-                buffer.seek(0)
-                
-                # Convert to base64
-                plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                plt.close()
-                
-                result['result'] = f'Plot created for {expression}'
-                result['latex'] = result['result']
-                result['plot'] = plot_data
-                
-                # Save to file if path is provided
-                if plot_path:
-                    plt.savefig(plot_path)
+        # Calculate y values, handling potential errors
+        try:
+            # Constant expressions evaluate to a scalar
+            y_vals = np.broadcast_to(compiled.function()(x_vals), x_vals.shape)
+            png = render_line(x_vals, y_vals, f'Plot of {expression}', 'x', 'y', figsize=(8, 6))
             
-            except Exception as e:
-                return {
-                    'status': 'error',
-                    'message': f'Error plotting expression: {str(e)}'
-                }
-        
-        else:
+            # Save to file if path is provided
+            if plot_path:
+                with open(plot_path, 'wb') as f:
+                    f.write(png)
+        except Exception as e:
             return {
                 'status': 'error',
-                'message': f'Unknown operation: {operation}'
+                'message': f'Error plotting expression: {str(e)}'
             }
         
-        return result
+        return {
+            'status': 'success',
+            'result': f'Plot created for {expression}',
+            'latex': f'Plot created for {expression}',
+            'plot': None,
+            'plot_png': png
+        }
     
     except ImportError as e:
         return {
             'status': 'error',
             'message': f'Python fallback failed: {str(e)}. SymPy package is required for symbolic math operations.'
         }
+    except TimeoutError as e:
+        return {**_timeout_result('symbolic_math', symbolic.TIME_BUDGET, 'python'),
+                'message': f'Symbolic math operation timed out: {str(e)}'}
     except Exception as e:
         return {
             'status': 'error',
             'message': f'Error in symbolic math operation: {str(e)}'
         }
-@matlab_function("differential_equation")
+
+@matlab_function("differential_equation", [
+    Param('eq_type', 'spring', str),
+    Param('t_max', 10),
+    Param('num_points', 100, int, bounds=(2, MAX_NUM_POINTS)),
+], unpack=_unpack_figure)
 def differential_equation(eq_type="spring", t_max=10, num_points=100):
-    """Differential equation solver (Python fallback)"""
-    # This is a simplified version that doesn't solve real DEs
-    # Just show a placeholder image
+    """Differential equation solver (Python fallback, scipy's RK45 in place of ode45)"""
+    system, t, states = solve_ode(eq_type, t_max, num_points)
     
-    plt.figure(figsize=(10, 6))
-    plt.text(0.5, 0.5, f"Differential Equation ({eq_type})\nThis requires MATLAB", 
-             horizontalalignment='center', fontsize=16)
-    plt.axis('off')
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-    
-    # Get the source code (Python version since MATLAB is unavailable)
-    source_code = """function result = differential_equation(eq_type, t_max, num_points)
-    % This requires MATLAB's differential equation solvers
-    % Please install MATLAB to see the actual implementation
-end"""
+    if system.lines is None:
+        x, y, z = states[0]
+        plot_png = render_trajectory_3d(x, y, z, 'Lorenz Attractor')
+    else:
+        series, phase = system.lines(t, states)
+        plot_png = render_series_and_phase(system.name, system.figure, series, phase)
     
     return {
-        'plot': plot_data,
-        'source_code': source_code,
-        'equation': "Requires MATLAB",
-        'parameters': "Requires MATLAB"
+        'plot_png': plot_png,
+        # Same systems and parameters as the MATLAB implementation
+        'source_code': get_matlab_source('differential_equation'),
+        system.equation_field: system.equation,
+        'parameters': system.describe()
     }
 
-@matlab_function("image_processing")
-def image_processing(operation="edge", noise_level=0.2):
-    """Image processing (Python fallback)"""
-    # This is a simplified version that doesn't do real image processing
-    
-    plt.figure(figsize=(10, 6))
-    plt.text(0.5, 0.5, f"Image Processing ({operation})\nThis requires MATLAB", 
-             horizontalalignment='center', fontsize=16)
-    plt.axis('off')
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
+@matlab_data("differential_equation")
+def differential_equation_data(eq_type="spring", t_max=10, num_points=100):
+    """ODE trajectories: time grid and one (n, len(t)) state array per initial state"""
+    system, t, states = solve_ode(eq_type, t_max, num_points)
+    return {
+        'eq_type': system.name,
+        't': t,
+        'states': states,
+        system.equation_field: system.equation,
+        'parameters': system.describe()
+    }
+
+def _image_args(eng, entry, bound):
+    """Positional args, rejecting sizes the fallback would also refuse"""
+    image_ops.check_size(bound['size'])
+    return _positional_args(eng, entry, bound)
+
+@matlab_function("image_processing", [
+    Param('operation', 'edge', str),
+    Param('noise_level', 0.2),
+    Param('size', 256, int),
+], to_matlab=_image_args, unpack=_unpack_figure)
+def image_processing(operation="edge", noise_level=0.2, size=256):
+    """Image processing (Python fallback, numpy/scipy.ndimage on float32 row bands)
+
+    `timings` has the same stages as the MATLAB result (plus 'render'),
+    so the two backends can be benchmarked against each other.
+    """
+    processed = image_ops.process(operation, noise_level, size)
+    started = time.perf_counter()
+    plot_png = render_image_grid(processed['panels'])
+    processed['timings']['render'] = time.perf_counter() - started
     
-    # Get the source code (Python version since MATLAB is unavailable)
-    source_code = """function result = image_processing(operation, noise_level)
-    % This requires MATLAB's Image Processing Toolbox
-    % Please install MATLAB to see the actual implementation
-end"""
+    return {
+        'plot_png': plot_png,
+        'source_code': get_matlab_source('image_processing'),
+        'operation': processed['operation'],
+        'methods': processed['methods'],
+        'timings': processed['timings']
+    }
+
+@matlab_data("image_processing")
+def image_processing_data(operation="edge", noise_level=0.2, size=256):
+    """The four images of the figure (float32 or bool arrays) and their titles"""
+    processed = image_ops.process(operation, noise_level, size)
+    return {
+        'operation': processed['operation'],
+        'methods': processed['methods'],
+        'titles': [title for title, _ in processed['panels']],
+        'images': [image for _, image in processed['panels']],
+        'timings': processed['timings']
+    }
+
+def _matrix_args(eng, entry, bound):
+    """Positional args, refusing matrices over the memory limit before MATLAB allocates them"""
+    linalg_ops.check_size(bound['size'])
+    return _positional_args(eng, entry, bound)
+
+@matlab_function("matrix_operation", [
+    Param('operation', 'eigenvalues', str, aliases=('operation_type',)),
+    Param('size', 3, int),
+    Param('seed', 42, int),
+], to_matlab=_matrix_args, unpack=_unpack_figure)
+def matrix_operation(operation="eigenvalues", size=3, seed=42):
+    """Matrix operations (Python fallback, same seeded matrix as MATLAB's rand)
+
+    Large matrices switch to truncated ARPACK solvers; see linalg_ops.
+    """
+    processed = linalg_ops.process(operation, size, seed)
+    n = processed['size']
+    started = time.perf_counter()
+    if 'eigenvalues' in processed:
+        plot_png = render_eigenvalues(processed['eigenvalues'], f"Eigenvalues of {n}x{n} Random Matrix")
+    elif 'singular_values' in processed:
+        plot_png = render_stem(processed['singular_values'], f"Singular Values of {n}x{n} Random Matrix")
+    else:
+        plot_png = render_matrix(processed['matrix'], f"{n}x{n} Random Matrix")
+    processed['timings']['render'] = time.perf_counter() - started
     
     return {
-        'plot': plot_data,
-        'source_code': source_code,
-        'operation': "Requires MATLAB",
-        'methods': "Requires MATLAB"
+        'plot_png': plot_png,
+        'source_code': get_matlab_source('matrix_operation'),
+        'operation_title': processed['operation'],
+        'operation_details': processed['method'],
+        'timings': processed['timings']
+    }
+
+@matlab_data("matrix_operation")
+def matrix_operation_data(operation="eigenvalues", size=3, seed=42):
+    """The eigenvalues, singular values or matrix itself, with the method used and timings"""
+    return linalg_ops.process(operation, size, seed)
+
+# Python-rendered animation frames are fanned out over worker processes
+ANIMATION_WORKERS = int(os.environ.get('ANIMATION_WORKERS', os.cpu_count() or 1))
+_frame_executor = None
+_frame_executor_lock = threading.Lock()
+
+def _get_frame_executor():
+    """The shared frame-rendering process pool, or None to render in-process"""
+    global _frame_executor
+    if ANIMATION_WORKERS <= 1:
+        return None
+    with _frame_executor_lock:
+        if _frame_executor is None:
+            # spawn, not fork: the parent has engine and server threads running
+            _frame_executor = ProcessPoolExecutor(max_workers=ANIMATION_WORKERS,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+        return _frame_executor
+
+def iter_animation_frames(animation_type, num_frames, directory, url_prefix):
+    """Render frames into `directory`, yielding (index, url) as each one lands
+
+    Frames finish out of order when rendered in parallel; callers that need
+    them in sequence should sort on the index.
+    """
+    def frame(i):
+        name = f"frame_{i:03d}.png"
+        return os.path.join(directory, name), f"{url_prefix}/{name}"
+
+    pending = set(range(num_frames))
+    executor = _get_frame_executor()
+    if executor is not None:
+        futures = {executor.submit(write_animation_frame, animation_type, i, num_frames, frame(i)[0]): i
+                   for i in range(num_frames)}
+        try:
+            for future in as_completed(futures):
+                i = future.result()
+                pending.discard(i)
+                yield i, frame(i)[1]
+        except BrokenProcessPool as e:
+            global _frame_executor
+            print(f"Frame worker pool failed ({e}); rendering remaining frames in-process")
+            with _frame_executor_lock:
+                _frame_executor = None
+    for i in sorted(pending):
+        write_animation_frame(animation_type, i, num_frames, frame(i)[0])
+        yield i, frame(i)[1]
+
+ANIMATION_TYPES = ('pendulum', 'wave', 'lissajous', 'spiral', 'orbit')
+
+_ANIMATION_DESCRIPTIONS = {
+    'pendulum': 'Simple pendulum with length 1.0 m starting at angle 0.8 rad',
+    'wave': 'Wave propagation with exponential damping',
+    'lissajous': 'Lissajous curve with frequency ratio 3:4 and varying phase',
+    'spiral': 'Spiral formation with linear growth rate',
+    'orbit': 'Planetary orbit with eccentricity e=0.5'
+}
+
+def _animation_type(animation_type):
+    """Validated animation type; unknown types fall back to pendulum"""
+    animation_type = str(animation_type).lower()
+    if animation_type not in ANIMATION_TYPES:
+        print(f"Warning: Unknown animation type '{animation_type}'. Falling back to pendulum.")
+        animation_type = 'pendulum'
+    return animation_type
+
+def _animation_result(animation_type, frames):
+    """The result of a Python-rendered animation with these frame URLs"""
+    print("Creating thumbnail...")
+    thumbnail = png_to_base64(render_message(f"{animation_type.title()} Animation\n(Python Implementation)",
+                                             figsize=(6, 6)))
+    print(f"Animation completed, generated {len(frames)} frames")
+    return {
+        'frames': frames,
+        'thumbnail': thumbnail,
+        'title': f'{animation_type.title()} Animation',
+        'description': _ANIMATION_DESCRIPTIONS.get(animation_type, 'Animation created with Python'),
+        'num_frames': len(frames),
+        'source_code': None
     }
 
-@matlab_function("animation")
+@matlab_function("animation", [
+    Param('animation_type', 'pendulum', _animation_type),
+    Param('num_frames', 20, int, bounds=(1, MAX_NUM_FRAMES)),
+], to_matlab=_animation_args, unpack=_unpack_animation)
 def animation(animation_type="pendulum", num_frames=20):
     """Animation creation with support for multiple animation types"""
-    # Create a temp directory for frames
-    temp_dir = tempfile.mkdtemp(prefix="matlab_animation_")
-    print(f"Using temp directory: {temp_dir}")
-    
     try:
-        # Validate animation type
-        animation_type = str(animation_type).lower()
-        valid_types = ['pendulum', 'wave', 'lissajous', 'spiral', 'orbit']
-
-        # Prepare static animation directory
-        static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'animation')
-        if os.path.exists(static_dir):
-            # Remove old frames
-            for f in os.listdir(static_dir):
-                if f.endswith('.png'):
-                    try:
-                        os.remove(os.path.join(static_dir, f))
-                    except Exception as e:
-                        print(f"Failed to remove old frame {f}: {e}")
-        else:
-            os.makedirs(static_dir, exist_ok=True)
-
-        if animation_type not in valid_types:
-            print(f"Warning: Unknown animation type '{animation_type}'. Falling back to pendulum.")
-            animation_type = 'pendulum'
+        # Frames go into this animation's own directory in the store
+        animation_type = _animation_type(animation_type)
+        key = _animation_key(animation_type, num_frames, 'python')
         
         print(f"Starting animation generation: {animation_type} with {num_frames} frames")
-        frames = []
         
-        for i in range(int(num_frames)):
-            # Create frame path
-            frame_path = os.path.join(temp_dir, f"frame_{i:03d}.png")
-            # Destination path in static/animation
-            dest_path = os.path.join(static_dir, f"frame_{i:03d}.png")
-            print(f"[DEBUG] Frame {i}: src={frame_path}, dest={dest_path}")
-            
-            # Create frame based on animation type
-            fig = plt.figure(figsize=(6, 6))
-            
-            if animation_type == 'pendulum':
-                # Simple pendulum simulation
-                angle = np.pi/4 * np.cos(i/num_frames * 2 * np.pi)
-                x = np.sin(angle)
-                y = -np.cos(angle)
-                
-                plt.plot([0, x], [0, y], 'k-', linewidth=2)
-                plt.plot(x, y, 'ro', markersize=15)
-                plt.xlim(-1.2, 1.2)
-                plt.ylim(-1.2, 1.2)
-                plt.title(f"Pendulum Simulation (t = {i/num_frames:.2f} s)")
-                
-            elif animation_type == 'wave':
-                # Wave propagation
-                x = np.linspace(0, 10, 1000)
-                t = i / num_frames  # Time variable
-                y = np.sin(x - 6*t) * np.exp(-0.1*x)
-                
-                plt.plot(x, y, 'b-', linewidth=2)
-                plt.xlim(0, 10)
-                plt.ylim(-1.2, 1.2)
-                plt.title(f"Wave Propagation (t = {t:.2f} s)")
-                
-            elif animation_type == 'lissajous':
-                # Lissajous curve
-                t = np.linspace(0, 2*np.pi, 1000)
-                a, b = 3, 4  # Frequency ratio
-                delta = i/int(num_frames) * np.pi  # Phase difference varies with frame
-                
-                x = np.sin(a * t + delta)
-                y = np.sin(b * t)
-                
-                plt.plot(x, y, 'g-', linewidth=2)
-                plt.xlim(-1.2, 1.2)
-                plt.ylim(-1.2, 1.2)
-                plt.title(f"Lissajous Curve (Phase = {delta:.2f} rad)")
-                
-            elif animation_type == 'spiral':
-                # Spiral formation
-                t = np.linspace(0, 15, 1000)
-                max_t = (i+1)/int(num_frames) * 15  # Grow the spiral with each frame
-                t_visible = t[t <= max_t]
-                
-                r = 0.1 * t_visible
-                x = r * np.cos(t_visible)
-                y = r * np.sin(t_visible)
-                
-                plt.plot(x, y, 'm-', linewidth=2)
-                plt.xlim(-1.2, 1.2)
-                plt.ylim(-1.2, 1.2)
-                plt.title(f"Spiral Formation (t = {max_t:.2f})")
-            
-            elif animation_type == 'orbit':
-                # Planetary orbit simulation
-                # Parameters
-                a = 0.5  # Semi-major axis
-                e = 0.5  # Eccentricity
-                b = a * np.sqrt(1 - e**2)  # Semi-minor axis
-                
-                # Calculate position at this time step
-                theta = 2 * np.pi * i / int(num_frames)
-                r = a * (1 - e**2) / (1 + e * np.cos(theta))
-                x = r * np.cos(theta)
-                y = r * np.sin(theta)
-                
-                # Draw orbit path
-                t = np.linspace(0, 2*np.pi, 100)
-                orbit_x = a * np.cos(t)
-                orbit_y = b * np.sin(t)
-                plt.plot(orbit_x, orbit_y, 'b--', alpha=0.5)
-                
-                # Draw sun at focus
-                plt.plot(0, 0, 'yo', markersize=15)  # Sun
-                
-                # Draw planet
-                plt.plot(x, y, 'ro', markersize=10)  # Planet
-                
-                # Connect planet to sun with a line
-                plt.plot([0, x], [0, y], 'k-', alpha=0.3)
-                
-                plt.xlim(-1.5, 1.5)
-                plt.ylim(-1.5, 1.5)
-                plt.title(f"Planetary Orbit (θ = {theta:.2f} rad)")
-            
-            # Common settings for all animation types
-            plt.grid(True)
-            plt.axis('equal')
-            
-            # Save frame
-            plt.savefig(frame_path)
-            plt.close(fig)
-            # Copy frame to static/animation
-            import shutil
-            try:
-                shutil.copy2(frame_path, dest_path)
-                print(f"[DEBUG] Copied frame {i} to static/animation/")
-            except Exception as copy_err:
-                print(f"[ERROR] Failed to copy frame {i}: {copy_err}")
-            # Append URL for frontend
-            frames.append(f"/static/animation/frame_{i:03d}.png")
-        print(f"[DEBUG] Final frame URLs: {frames}")
-
-        # Create thumbnail
-        print("Creating thumbnail...")
-        fig = plt.figure(figsize=(6, 6))
-        plt.text(0.5, 0.5, f"{animation_type.title()} Animation\n(Python Implementation)", 
-                horizontalalignment='center', fontsize=16)
-        plt.axis('off')
-        thumbnail_path = os.path.join(temp_dir, "thumbnail.png")
-        plt.savefig(thumbnail_path)
-        plt.close(fig)
-        
-        with open(thumbnail_path, 'rb') as f:
-            thumbnail = base64.b64encode(f.read()).decode('utf-8')
-        
-        # Prepare animation descriptions based on type
-        descriptions = {
-            'pendulum': 'Simple pendulum with length 1.0 m starting at angle 0.8 rad',
-            'wave': 'Wave propagation with exponential damping',
-            'lissajous': 'Lissajous curve with frequency ratio 3:4 and varying phase',
-            'spiral': 'Spiral formation with linear growth rate',
-            'orbit': 'Planetary orbit with eccentricity e=0.5'
-        }
-        
-        print(f"Animation completed, generated {len(frames)} frames")
-        
-        return {
-            'frames': frames,
-            'thumbnail': thumbnail,
-            'title': f'{animation_type.title()} Animation',
-            'description': descriptions.get(animation_type, 'Animation created with Python'),
-            'num_frames': len(frames),
-            'source_code': None
-        }
+        # Frames are written straight into the store, in parallel
+        rendered = dict(iter_animation_frames(animation_type, int(num_frames),
+                                              _animation_store.directory(key), _animation_store.url(key)))
+        return _animation_result(animation_type, [rendered[i] for i in sorted(rendered)])
     
     except Exception as e:
         print(f"Error generating animation: {str(e)}")
@@ -785,8 +1296,110 @@ def animation(animation_type="pendulum", num_frames=20):
             'status': 'error',
             'message': str(e)
         }
-    finally:
-        # Clean up temp directory
-        print("Cleaning up temp directory...")
-        import shutil
-        shutil.rmtree(temp_dir, ignore_errors=True) 
\ No newline at end of file
+
+def _frame_event(index, url, inline):
+    """The 'frame' event payload, with the PNG as base64 if `inline`"""
+    event = {'index': index, 'url': url}
+    if inline:
+        with open(_animation_store.path(url), 'rb') as f:
+            event['data'] = png_to_base64(f.read())
+    return event
+
+def _replay_animation(result, inline):
+    for i, url in enumerate(result['frames']):
+        yield 'frame', _frame_event(i, url, inline)
+    return result
+
+def _ready_frames(key, num_frames, sent, finished, matlab):
+    """(index, url) of the frames in the directory of `key` that can be sent
+
+    Python frames (frame_000.png, ...) are renamed into place whole and
+    land in any order. animation.m writes frame_001.png, frame_002.png, ...
+    in order and not atomically, so one of its frames is ready once the
+    next one exists, or once the call has returned.
+    """
+    directory, url_prefix = _animation_store.directory(key), _animation_store.url(key)
+    exists = lambda name: os.path.exists(os.path.join(directory, name))
+    ready = []
+    for i in range(num_frames):
+        if i in sent:
+            continue
+        if matlab:
+            # MATLAB numbers frames from 1
+            name = f"frame_{i + 1:03d}.png"
+            if not (exists(f"frame_{i + 2:03d}.png") or (finished and exists(name))):
+                break
+        else:
+            name = f"frame_{i:03d}.png"
+            if not exists(name):
+                continue
+        ready.append((i, f"{url_prefix}/{name}"))
+    return ready
+
+def stream_animation(animation_type='pendulum', num_frames=20, inline=False, replay_frames=True,
+                     poll_interval=0.1):
+    """Yield ('frame', {'index', 'url'[, 'data']}) as each frame is written, then ('done', result)
+
+    The same animation as call_matlab_function('animation', ...), computed
+    and stored the same way: an animation already in the store is replayed
+    at once, and one being rendered is not rendered again. Concurrent
+    calls share one computation under call_matlab_function's coalescing
+    key (SingleFlight within the process, its lock file across workers),
+    and every stream sends the frames as they land in the store directory.
+    The computation runs on its own thread, so a client hanging up doesn't
+    waste it. With `inline` each frame event also carries the PNG as
+    base64; without `replay_frames` a stored animation yields 'done' only.
+    Python-rendered frames may arrive out of order; MATLAB's come in order.
+    """
+    entry = matlab_functions['animation']
+    params = entry.bind({'animation_type': animation_type, 'num_frames': num_frames})
+    pool = initialize_matlab_engine()
+    use_matlab = pool is not None and pool.ready
+    backend = 'matlab' if use_matlab else 'python'
+    key = make_key(entry.name, params, backend, _CACHE_IGNORED_PARAMS)
+    stored = _lookup_stored(entry, params, key, False, use_matlab)
+    if stored is not None:
+        if replay_frames:
+            yield from _replay_animation(stored, inline)
+        yield 'done', stored
+        return
+
+    outcome = {}
+
+    def run():
+        metrics.current_scope.set(entry.name)
+        compute = lambda: _compute_and_store(entry, params, key, False, pool if use_matlab else None)
+        try:
+            if _single_flight is None:
+                outcome['result'] = compute()[0]
+            else:
+                (outcome['result'], _), shared = _single_flight.do(key, compute)
+                if shared:
+                    metrics.COALESCED.labels(entry.name, 'process').inc()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, name='animation-stream', daemon=True)
+    thread.start()
+    # Whoever renders it (this call, another stream or another worker)
+    # writes the frames into this directory
+    frames_key = _animation_key(params['animation_type'], params['num_frames'], backend)
+    sent = set()
+    while True:
+        finished = not thread.is_alive()
+        for i, url in _ready_frames(frames_key, params['num_frames'], sent, finished, use_matlab):
+            sent.add(i)
+            yield 'frame', _frame_event(i, url, inline)
+        if finished:
+            break
+        thread.join(poll_interval)
+    if 'error' in outcome:
+        raise outcome['error']
+    result = outcome['result']
+    if isinstance(result, dict):
+        result = dict(result)
+        # Frames rendered elsewhere, e.g. by the Python fallback after MATLAB failed
+        for i, url in enumerate(result.get('frames') or []):
+            if i not in sent:
+                yield 'frame', _frame_event(i, url, inline)
+    yield 'done', result
@@ -0,0 +1,127 @@
+"""
+numpy <-> MATLAB engine array conversion without per-element loops.
+
+Building a matlab.double from a Python list walks every element in
+Python; here whole buffers are copied instead. Engines from R2022a
+construct arrays from, and export, the buffer protocol directly. Older
+engines keep a flat column-major array.array (`_data`, or `_real` and
+`_imag` when complex), which is filled or viewed with a single copy.
+
+MATLAB stores arrays column-major and at least 2-D: a 1-D numpy array
+becomes a 1xN row vector, as matlab.double([1, 2, 3]) does.
+"""
+
+import numpy as np
+
+try:
+    import matlab
+except ImportError:
+    matlab = None
+
+# MATLAB class used for each numpy dtype kind/size
+_MATLAB_CLASSES = {
+    np.dtype(np.float64): 'double',
+    np.dtype(np.float32): 'single',
+    np.dtype(np.complex128): 'double',
+    np.dtype(np.complex64): 'single',
+    np.dtype(np.int8): 'int8',
+    np.dtype(np.uint8): 'uint8',
+    np.dtype(np.int16): 'int16',
+    np.dtype(np.uint16): 'uint16',
+    np.dtype(np.int32): 'int32',
+    np.dtype(np.uint32): 'uint32',
+    np.dtype(np.int64): 'int64',
+    np.dtype(np.uint64): 'uint64',
+    np.dtype(np.bool_): 'logical',
+}
+
+# Element type of each MATLAB class (complex data uses the complex counterpart)
+_NUMPY_TYPES = {name: dtype for dtype, name in reversed(list(_MATLAB_CLASSES.items()))}
+
+# Whether each MATLAB class is the pre-R2022a pure-Python implementation
+_legacy = {}
+
+
+def is_matlab_array(value):
+    """True for matlab.double, matlab.single, matlab.intN and matlab.logical values"""
+    return type(value).__module__.split('.')[0] == 'matlab' and hasattr(value, 'size')
+
+
+def matlab_class(dtype):
+    """Name of the MATLAB class holding numpy `dtype` values ('double' for anything unlisted)"""
+    return _MATLAB_CLASSES.get(np.dtype(dtype), 'double')
+
+
+def to_numpy(value, copy=False):
+    """A MATLAB engine array as a numpy array with MATLAB's shape
+
+    Without `copy` the result views the engine array's memory where the
+    engine allows it, so it must not outlive `value` being modified.
+    """
+    size = tuple(value.size)
+    try:
+        array = np.asarray(memoryview(value))
+    except TypeError:
+        real = getattr(value, '_real', None)
+        if real is not None:
+            array = np.asarray(memoryview(real)) + 1j * np.asarray(memoryview(value._imag))
+        elif getattr(value, '_data', None) is not None:
+            array = np.asarray(memoryview(value._data))
+        else:
+            return np.asarray(value)
+    if array.shape != size:
+        array = array.reshape(size, order='F')
+    if type(value).__name__ == 'logical' and array.dtype != np.bool_:
+        array = array.view(np.bool_)
+    return array.copy(order='K') if copy else array
+
+
+def _matlab_shape(array):
+    if array.ndim == 0:
+        return (1, 1)
+    if array.ndim == 1:
+        return (1, array.size)
+    return array.shape
+
+
+def _is_legacy(name, constructor):
+    # The pure-Python arrays of older engines keep their storage in _data
+    if name not in _legacy:
+        empty = constructor(size=(1, 1))
+        _legacy[name] = hasattr(empty, '_data') or hasattr(empty, '_real')
+    return _legacy[name]
+
+
+def _fill(target, values):
+    """Replace an array.array's contents with `values` in one buffer copy"""
+    del target[:]
+    target.frombytes(np.ascontiguousarray(values, dtype=np.dtype(target.typecode)).view(np.uint8))
+
+
+def to_matlab(array, matlab_type=None):
+    """A numpy array (or anything np.asarray accepts) as a MATLAB engine array
+
+    `matlab_type` ('double', 'single', 'int32', ...) overrides the class
+    picked from the dtype. Complex data keeps its imaginary part. Raises
+    RuntimeError when the MATLAB engine package is not installed.
+    """
+    if matlab is None:
+        raise RuntimeError("The MATLAB Engine for Python is not installed")
+    array = np.asarray(array)
+    name = matlab_type or matlab_class(array.dtype)
+    constructor = getattr(matlab, name)
+    is_complex = np.iscomplexobj(array)
+    dtype = _NUMPY_TYPES[name]
+    array = array.astype(np.result_type(dtype, np.complex64) if is_complex else dtype, copy=False)
+    shape = _matlab_shape(array)
+    if not _is_legacy(name, constructor):
+        # Read through the buffer protocol, shape and strides included
+        return constructor(array.reshape(shape), is_complex=is_complex)
+    result = constructor(size=shape, is_complex=is_complex)
+    flat = np.ravel(array.reshape(shape), order='F')
+    if is_complex:
+        _fill(result._real, flat.real)
+        _fill(result._imag, flat.imag)
+    else:
+        _fill(result._data, flat)
+    return result
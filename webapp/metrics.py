@@ -0,0 +1,197 @@
+"""
+In-process latency histograms and counters, exposed in Prometheus text format.
+
+Recording is a perf_counter difference, a bisect and a locked add, cheap
+enough to leave on; METRICS=0 turns it off. Each server process keeps its
+own values, so with several gunicorn workers every scrape of /metrics sees
+one worker's share.
+
+Stage timings are labelled with a scope: the bridge function being called
+(set by call_matlab_function for the duration of the call), or the Flask
+endpoint for stages outside any call, such as JSON serialization.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+ENABLED = os.environ.get('METRICS', '1') != '0'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a cached response (about a millisecond) to a long MATLAB call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# What the stages running now belong to; see the module docstring
+current_scope = ContextVar('metrics_scope', default='')
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values):
+        """The series for these label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        if ENABLED:
+            with self._lock:
+                self._value += amount
+
+    def render(self, name, labelnames, values):
+        return [f'{name}_total{_format_labels(labelnames, values)} {self._value!r}']
+
+
+class Counter(_Metric):
+    """Monotonic count per label set; exposed as `<name>_total`"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # Per-bucket (not cumulative) counts, the last one for +Inf
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if ENABLED:
+            i = bisect_left(self._buckets, value)
+            with self._lock:
+                self._counts[i] += 1
+                self._sum += value
+
+    def time(self):
+        """Context manager observing the seconds its block took"""
+        return _Timer(self.observe)
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self._buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{_format_labels(labelnames, values, [("le", le)])} {cumulative}')
+        labels = _format_labels(labelnames, values)
+        lines.append(f'{name}_sum{labels} {total!r}')
+        lines.append(f'{name}_count{labels} {cumulative}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (usually seconds) per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class _Timer:
+    __slots__ = ('observe', 'started')
+
+    def __init__(self, observe):
+        self.observe = observe
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.observe(time.perf_counter() - self.started)
+        return False
+
+
+CALL_SECONDS = Histogram(
+    'matlab_bridge_call_seconds', 'Duration of call_matlab_function calls',
+    ('function', 'backend'))
+STAGE_SECONDS = Histogram(
+    'matlab_bridge_stage_seconds', 'Duration of one stage of a call or request',
+    ('scope', 'stage'))
+CALLS = Counter(
+    'matlab_bridge_calls', 'call_matlab_function calls by outcome (success, error or timeout)',
+    ('function', 'backend', 'outcome'))
+FALLBACKS = Counter(
+    'matlab_bridge_fallbacks', 'Calls answered by a Python fallback, by why MATLAB was not used',
+    ('function', 'reason'))
+CACHE_LOOKUPS = Counter(
+    'matlab_bridge_cache_lookups', 'Result cache and animation store lookups (hit or miss)',
+    ('function', 'result'))
+COALESCED = Counter(
+    'matlab_bridge_coalesced', 'Calls answered by an identical call in flight instead of computing, '
+    'in this process or (file mode) in another worker', ('function', 'mode'))
+HTTP_SECONDS = Histogram(
+    'http_request_seconds', 'Time to produce an HTTP response (streamed bodies excluded)',
+    ('endpoint', 'method'))
+HTTP_REQUESTS = Counter(
+    'http_requests', 'HTTP responses by endpoint, method and status code',
+    ('endpoint', 'method', 'status'))
+
+
+def stage(name):
+    """Context manager timing one stage of the current scope"""
+    return STAGE_SECONDS.labels(current_scope.get(), name).time()
+
+
+def observe_stage(name, seconds):
+    """Record a stage timed by the caller"""
+    STAGE_SECONDS.labels(current_scope.get(), name).observe(seconds)
+
+
+def render():
+    """Every metric in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
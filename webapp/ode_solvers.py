@@ -0,0 +1,174 @@
+"""
+Native solvers for the systems in Examples/matlab/differential_equation.m.
+
+Each system mirrors its MATLAB definition (parameters, initial states,
+plot layout) and is integrated with scipy's RK45, the same Dormand-Prince
+pair as MATLAB's ode45, at the tolerances the MATLAB code sets.
+
+Derivatives are written for stacked states: component i of every member
+of a batch is `states[i]`, an array of shape (k, m), and parameters are
+(k, 1) arrays. So one solve_ivp call can integrate k parameter sets or
+initial states at once (see integrate), and a single solve is a batch of
+one.
+"""
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+# odeset('RelTol', 1e-6, 'AbsTol', 1e-6) in differential_equation.m
+RTOL = 1e-6
+ATOL = 1e-6
+
+
+class ODESystem:
+    """One system: derivative, parameters, initial states and presentation
+
+    `parameters` lists (name, symbol, default) triples; `derivative(states,
+    p)` returns the stacked derivative. `lines(t, states)` returns the
+    (series, phase) curves of the two-panel figure as lists of (x, y)
+    pairs, and `figure` holds its titles, labels, line styles and legends.
+    """
+
+    def __init__(self, name, derivative, parameters, initial_states, equation_field, equation,
+                 lines=None, figure=None):
+        self.name = name
+        self.derivative = derivative
+        self.parameters = parameters
+        self.initial_states = [np.asarray(y0, dtype=float) for y0 in initial_states]
+        self.equation_field = equation_field
+        self.equation = equation
+        self.lines = lines
+        self.figure = figure or {}
+
+    @property
+    def defaults(self):
+        return {name: default for name, _, default in self.parameters}
+
+    def describe(self, values=None):
+        """Parameter string as the MATLAB code formats it, e.g. 'm=1, c=0.5, k=4'"""
+        values = {**self.defaults, **(values or {})}
+        return ', '.join(f"{symbol}={values[name]:g}" for name, symbol, _ in self.parameters)
+
+
+def _spring_derivative(states, p):
+    y, v = states
+    return np.stack([v, -(p['k']/p['m'])*y - (p['c']/p['m'])*v])
+
+
+def _pendulum_derivative(states, p):
+    theta, omega = states
+    return np.stack([omega, -(p['g']/p['L'])*np.sin(theta)])
+
+
+def _predator_prey_derivative(states, p):
+    x, y = states
+    return np.stack([p['alpha']*x - p['beta']*x*y, p['delta']*x*y - p['gamma']*y])
+
+
+def _lorenz_derivative(states, p):
+    x, y, z = states
+    return np.stack([p['sigma']*(y - x), x*(p['rho'] - z) - y, x*y - p['beta']*z])
+
+
+_PENDULUM_LEGEND = ['Small Angle (θ₀=0.1)', 'Large Angle (θ₀=2)']
+
+ODE_SYSTEMS = {system.name: system for system in (
+    ODESystem(
+        'spring', _spring_derivative, [('m', 'm', 1.0), ('c', 'c', 0.5), ('k', 'k', 4.0)],
+        [[1, 0]],
+        'equation', "my\" + cy' + ky = 0",
+        lines=lambda t, states: ([(t, states[0][0])], [(states[0][0], states[0][1])]),
+        figure={
+            'series_title': 'Damped Spring-Mass System', 'series_ylabel': 'Position',
+            'phase_title': 'Phase Portrait', 'phase_xlabel': 'Position', 'phase_ylabel': 'Velocity',
+        },
+    ),
+    ODESystem(
+        'pendulum', _pendulum_derivative, [('g', 'g', 9.81), ('L', 'L', 1.0)],
+        [[0.1, 0], [2, 0]],
+        'equation', 'θ" + (g/L)sin(θ) = 0',
+        lines=lambda t, states: ([(t, y[0]) for y in states], [(y[0], y[1]) for y in states]),
+        figure={
+            'series_title': 'Pendulum Motion: Small vs Large Angle', 'series_ylabel': 'Angle (rad)',
+            'series_styles': ['b-', 'r-'], 'series_legend': _PENDULUM_LEGEND,
+            'phase_title': 'Phase Portrait', 'phase_xlabel': 'Angle (rad)',
+            'phase_ylabel': 'Angular Velocity (rad/s)',
+            'phase_styles': ['b-', 'r-'], 'phase_legend': _PENDULUM_LEGEND,
+        },
+    ),
+    ODESystem(
+        'predator_prey', _predator_prey_derivative,
+        [('alpha', 'α', 1.1), ('beta', 'β', 0.4), ('delta', 'δ', 0.1), ('gamma', 'γ', 0.4)],
+        [[10, 5]],
+        'equations', 'dx/dt = αx - βxy, dy/dt = δxy - γy',
+        lines=lambda t, states: ([(t, states[0][0]), (t, states[0][1])], [(states[0][0], states[0][1])]),
+        figure={
+            'series_title': 'Predator-Prey Dynamics', 'series_ylabel': 'Population',
+            'series_styles': ['g-', 'r-'], 'series_legend': ['Prey', 'Predator'],
+            'phase_title': 'Phase Portrait: Predator vs Prey',
+            'phase_xlabel': 'Prey Population', 'phase_ylabel': 'Predator Population',
+        },
+    ),
+    # Plotted as a 3D trajectory rather than the two-panel layout
+    ODESystem(
+        'lorenz', _lorenz_derivative, [('sigma', 'σ', 10.0), ('rho', 'ρ', 28.0), ('beta', 'β', 8/3)],
+        [[1, 1, 1]],
+        'equations', 'dx/dt = σ(y-x), dy/dt = x(ρ-z)-y, dz/dt = xy-βz',
+        figure={'series_ylabel': 'x'},
+    ),
+)}
+
+
+def get_system(eq_type):
+    """The named system; unknown names fall back to spring, as in MATLAB"""
+    system = ODE_SYSTEMS.get(str(eq_type).lower())
+    if system is None:
+        print(f"Unknown equation type '{eq_type}'. Using spring-mass system instead.")
+        system = ODE_SYSTEMS['spring']
+    return system
+
+
+def time_grid(t_max, num_points):
+    """linspace(0, t_max, num_points) with at least 50 points, as in MATLAB"""
+    t_max = float(t_max)
+    if t_max <= 0:
+        raise ValueError("t_max must be positive")
+    return np.linspace(0, t_max, max(int(num_points), 50))
+
+
+def integrate(system, initial_states, params, t_end):
+    """Integrate k members of a system at once as one stacked state vector
+
+    `initial_states` is (k, n) and `params` maps parameter names to length-k
+    arrays. Returns a function mapping a time grid to the (k, n, len(t))
+    states. The step size is shared by all members, so the tolerances are
+    tightened by sqrt(k) to keep each member within RTOL/ATOL, since
+    solve_ivp's error norm is an RMS over all components.
+    """
+    y0 = np.asarray(initial_states, dtype=float)
+    k, n = y0.shape
+    p = {name: np.broadcast_to(np.asarray(value, dtype=float), (k,)).reshape(k, 1)
+         for name, value in params.items()}
+
+    def rhs(t, y):
+        return system.derivative(y.reshape(n, k, -1), p).reshape(y.shape)
+
+    scale = np.sqrt(k)
+    solution = solve_ivp(rhs, (0, float(t_end)), y0.T.ravel(), method='RK45',
+                         rtol=RTOL / scale, atol=ATOL / scale, vectorized=True, dense_output=True)
+    if not solution.success:
+        raise RuntimeError(f"{system.name} solver failed: {solution.message}")
+    return lambda t: solution.sol(t).reshape(n, k, -1).transpose(1, 0, 2)
+
+
+def solve(eq_type='spring', t_max=10, num_points=100):
+    """Solve a system on the MATLAB code's time grid
+
+    Returns (system, t, states) with one (n, len(t)) array per initial state.
+    """
+    system = get_system(eq_type)
+    t = time_grid(t_max, num_points)
+    members = len(system.initial_states)
+    sample = integrate(system, system.initial_states,
+                       {name: [value] * members for name, value in system.defaults.items()}, t[-1])
+    return system, t, list(sample(t))
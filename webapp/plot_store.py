@@ -0,0 +1,130 @@
+"""
+Content-addressed store for rendered plot images.
+
+Plots are kept as raw PNG bytes under their sha256 digest, which doubles
+as the HTTP ETag, so a plot URL never changes meaning and browsers can
+cache it forever. A memory LRU sits in front of a directory shared by all
+workers on the host (a URL minted by one worker may be fetched from another).
+The directory must be private to this user (see private_dir) so nobody
+else can put an image behind a URL; if it is not, plots are kept in memory
+only and each worker serves just the plots it rendered.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from webapp.private_dir import default_dir, private_dir
+except ImportError:
+    from private_dir import default_dir, private_dir
+
+
+class PlotStore:
+    """Byte-bounded LRU of PNGs backed by a shared directory
+
+    The directory defaults to this user's own one under the system temp
+    dir; `directory` is None when the store is memory-only.
+    """
+
+    def __init__(self, directory=None, max_bytes=32 * 1024 * 1024, max_age=24 * 3600):
+        self.directory = directory or default_dir('plots')
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        try:
+            private_dir(self.directory)
+        except PermissionError as e:
+            print(f"Plot store kept in memory only: {e}")
+            self.directory = None
+
+    @staticmethod
+    def digest(png):
+        """Content hash used as both the storage key and the ETag"""
+        return hashlib.sha256(png).hexdigest()
+
+    def put(self, png):
+        """Store PNG bytes and return their digest"""
+        digest = self.digest(png)
+        self._remember(digest, png)
+        self._touch(digest, png)
+        with self._lock:
+            self._puts += 1
+            trim = self._puts % 64 == 0
+        if trim:
+            self._trim_disk()
+        return digest
+
+    def get(self, digest):
+        """PNG bytes for a digest, or None if unknown"""
+        with self._lock:
+            png = self._entries.get(digest)
+            if png is not None:
+                self._entries.move_to_end(digest)
+        if png is not None:
+            # Other workers may be serving this URL from disk
+            self._touch(digest, png)
+            return png
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(digest), 'rb') as f:
+                png = f.read()
+        except OSError:
+            return None
+        self._touch(digest)
+        self._remember(digest, png)
+        return png
+
+    def _touch(self, digest, png=None):
+        """Mark a plot on disk as used (eviction goes by mtime), writing it if it is gone"""
+        if self.directory is None:
+            return
+        path = self._path(digest)
+        try:
+            os.utime(path)
+            return
+        except FileNotFoundError:
+            if png is None:
+                return
+        except OSError:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not persist plot {digest}: {e}")
+
+    def _trim_disk(self):
+        """Delete stored plots unused for `max_age` seconds"""
+        if self.directory is None:
+            return
+        cutoff = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest + '.png')
+
+    def _remember(self, digest, png):
+        with self._lock:
+            if digest in self._entries or len(png) > self.max_bytes:
+                return
+            self._entries[digest] = png
+            self._bytes += len(png)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
@@ -0,0 +1,38 @@
+"""
+Directories for state only this server may read or write.
+
+The result cache and the job store keep pickled results on disk, and
+unpickling runs code, so nobody else on the host may be able to plant a
+file there. Their directories are created with mode 0700 and refused if
+another user owns them. The per-user default under the system temp
+directory keeps other users from creating it first with looser rights.
+"""
+
+import getpass
+import os
+import stat
+import tempfile
+
+
+def default_dir(name):
+    """This user's `name` directory under the system temp dir (not yet created)"""
+    # Straight under the temp dir, whose sticky bit keeps others from replacing it
+    return os.path.join(tempfile.gettempdir(), f'matlab_bridge-{getpass.getuser()}-{name}')
+
+
+def private_dir(path):
+    """Create `path` with mode 0700 if needed and make sure only this user can use it
+
+    Raises PermissionError for a symlink, a directory of another user or
+    one that others can access (chmod 700 it to use it). Without POSIX
+    permissions (Windows) the directory is only created.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.name != 'posix':
+        return path
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a directory owned by this user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"{path} is accessible to other users (mode {stat.S_IMODE(info.st_mode):o})")
+    return path
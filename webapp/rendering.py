@@ -0,0 +1,398 @@
+"""
+Thread-safe matplotlib rendering for the Python fallbacks.
+
+Figures are built once per thread with the object-oriented API
+(Figure + FigureCanvasAgg, no pyplot state machine) and reused: each
+render only updates artist data in place and redraws. Series longer than
+the axes can show are downsampled first (see downsample.py), so drawing
+time does not grow with num_points.
+"""
+
+import base64
+import os
+import tempfile
+import threading
+from io import BytesIO
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+try:
+    from webapp import metrics
+    from webapp.downsample import axes_max_points, downsample, downsample_columns
+except ImportError:
+    import metrics
+    from downsample import axes_max_points, downsample, downsample_columns
+
+_local = threading.local()
+
+
+def figure_template(key, build):
+    """Return this thread's instance of a template, building it on first use
+
+    `build` is a zero-argument callable returning the template object;
+    templates are never shared between threads, so rendering is thread-safe.
+    """
+    templates = getattr(_local, 'templates', None)
+    if templates is None:
+        templates = _local.templates = {}
+    template = templates.get(key)
+    if template is None:
+        template = templates[key] = build()
+    return template
+
+
+def new_figure(figsize):
+    """A Figure attached to its own Agg canvas (no pyplot involved)"""
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def figure_to_png(figure, **savefig_kwargs):
+    """Render a figure to PNG bytes"""
+    buffer = BytesIO()
+    with metrics.stage('savefig'):
+        figure.savefig(buffer, format='png', **savefig_kwargs)
+    return buffer.getvalue()
+
+
+def png_to_base64(png):
+    """Base64 text of PNG bytes, as embedded in the JSON responses"""
+    return base64.b64encode(png).decode('utf-8')
+
+
+class LinePlot:
+    """Single-line plot whose data, title and labels are updated in place"""
+
+    def __init__(self, figsize=(10, 6)):
+        self.figure = new_figure(figsize)
+        self.ax = self.figure.add_subplot()
+        self.line, = self.ax.plot([], [])
+        self.ax.grid(True)
+
+    def render(self, x, y, title, xlabel='X axis', ylabel='Y axis'):
+        self.line.set_data(*downsample(x, y, axes_max_points(self.ax)))
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.ax.set_title(title)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        return figure_to_png(self.figure)
+
+
+class MessagePlot:
+    """Blank figure showing a centred text message"""
+
+    def __init__(self, figsize=(10, 6), fontsize=16):
+        self.figure = new_figure(figsize)
+        ax = self.figure.add_subplot()
+        ax.axis('off')
+        self.text = ax.text(0.5, 0.5, '', horizontalalignment='center', fontsize=fontsize)
+
+    def render(self, message):
+        self.text.set_text(message)
+        return figure_to_png(self.figure)
+
+
+def render_line(x, y, title, xlabel='X axis', ylabel='Y axis', figsize=(10, 6)):
+    """PNG of y against x on a reused single-line figure"""
+    plot = figure_template(('line', figsize), lambda: LinePlot(figsize))
+    return plot.render(x, y, title, xlabel, ylabel)
+
+
+def render_message(message, figsize=(10, 6), fontsize=16):
+    """PNG of a text-only figure"""
+    plot = figure_template(('message', figsize, fontsize), lambda: MessagePlot(figsize, fontsize))
+    return plot.render(message)
+
+
+class SeriesAndPhasePlot:
+    """Time series above a phase portrait (the differential_equation.m layout)
+
+    `layout` gives titles, axis labels, and per-panel line styles and
+    legends; see ode_solvers.ODESystem.figure.
+    """
+
+    def __init__(self, layout, figsize=(10, 8)):
+        self.figure = new_figure(figsize)
+        self.series_ax, self.phase_ax = self.figure.subplots(2, 1)
+        self.series = self._panel(self.series_ax, layout.get('series_styles', ['-']),
+                                  layout.get('series_legend'), layout['series_title'],
+                                  'Time', layout['series_ylabel'])
+        self.phase = self._panel(self.phase_ax, layout.get('phase_styles', ['-']),
+                                 layout.get('phase_legend'), layout['phase_title'],
+                                 layout['phase_xlabel'], layout['phase_ylabel'])
+        self.figure.tight_layout()
+
+    @staticmethod
+    def _panel(ax, styles, legend, title, xlabel, ylabel):
+        lines = [ax.plot([], [], style, linewidth=2)[0] for style in styles]
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+        if legend:
+            ax.legend(lines, legend)
+        return lines
+
+    def render(self, series, phase):
+        for ax, lines, curves in ((self.series_ax, self.series, series), (self.phase_ax, self.phase, phase)):
+            for line, (x, y) in zip(lines, curves):
+                line.set_data(*downsample(x, y, axes_max_points(ax)))
+            ax.relim()
+            ax.autoscale_view()
+        return figure_to_png(self.figure)
+
+
+class Trajectory3D:
+    """Single 3D curve, e.g. the Lorenz attractor"""
+
+    def __init__(self, title, figsize=(10, 8), view=(30, -110)):
+        self.figure = new_figure(figsize)
+        self.ax = self.figure.add_subplot(projection='3d')
+        self.line, = self.ax.plot([], [], [], linewidth=1.5)
+        self.ax.set_title(title)
+        self.ax.set_xlabel('x')
+        self.ax.set_ylabel('y')
+        self.ax.set_zlabel('z')
+        self.ax.view_init(*view)
+
+    def render(self, x, y, z):
+        x, y, z = downsample_columns((x, y, z), axes_max_points(self.ax))
+        self.line.set_data_3d(x, y, z)
+        self.ax.auto_scale_xyz(x, y, z, had_data=False)
+        return figure_to_png(self.figure)
+
+
+def render_series_and_phase(key, layout, series, phase):
+    """PNG of a two-panel ODE figure; `key` names the layout for reuse"""
+    plot = figure_template(('series_phase', key), lambda: SeriesAndPhasePlot(layout))
+    return plot.render(series, phase)
+
+
+def render_trajectory_3d(x, y, z, title):
+    """PNG of a 3D trajectory"""
+    plot = figure_template(('trajectory_3d', title), lambda: Trajectory3D(title))
+    return plot.render(x, y, z)
+
+
+def _grid_shape(count):
+    columns = int(np.ceil(np.sqrt(count)))
+    return int(np.ceil(count / columns)), columns
+
+
+def render_overlay(curves, title, xlabel, ylabel, labels=None, figsize=(10, 6)):
+    """PNG of many (x, y) curves on one axes, coloured along a colormap
+
+    The number of lines varies per call, so the figure is built fresh
+    rather than taken from a template. Up to ten curves get a legend.
+    """
+    figure = new_figure(figsize)
+    ax = figure.add_subplot()
+    colors = colormaps['viridis'](np.linspace(0, 1, len(curves)))
+    max_points = axes_max_points(ax)
+    for (x, y), color in zip(curves, colors):
+        ax.plot(*downsample(x, y, max_points), color=color, linewidth=2 if len(curves) <= 10 else 1)
+    if labels and len(curves) <= 10:
+        ax.legend(labels)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
+    return figure_to_png(figure)
+
+
+def render_small_multiples(panels, titles, xlabel, ylabel, max_panels=49):
+    """PNG of a grid of small plots sharing axes, one per list of (x, y) curves"""
+    if len(panels) > max_panels:
+        raise ValueError(f"Too many panels for a grid ({len(panels)} > {max_panels}); use an overlay")
+    rows, columns = _grid_shape(len(panels))
+    figure = new_figure((3 * columns, 2.4 * rows))
+    axes = figure.subplots(rows, columns, sharex=True, sharey=True, squeeze=False).ravel()
+    max_points = axes_max_points(axes[0])
+    for ax, curves, title in zip(axes, panels, titles):
+        for x, y in curves:
+            ax.plot(*downsample(x, y, max_points), linewidth=1)
+        ax.set_title(title, fontsize=8)
+        ax.grid(True)
+    for ax in axes[len(panels):]:
+        ax.axis('off')
+    figure.supxlabel(xlabel)
+    figure.supylabel(ylabel)
+    figure.tight_layout()
+    return figure_to_png(figure)
+
+
+class ImageGrid:
+    """2x2 grayscale images with titles (the image_processing.m layout)
+
+    Images are shown at most `max_side` pixels across: larger ones are
+    strided down first, so drawing cost does not grow with the image.
+    """
+
+    def __init__(self, figsize=(10, 8), max_side=512):
+        self.figure = new_figure(figsize)
+        self.max_side = max_side
+        self.axes = self.figure.subplots(2, 2).ravel()
+        self.images = []
+        for ax in self.axes:
+            self.images.append(ax.imshow(np.zeros((2, 2)), cmap='gray', vmin=0, vmax=1))
+            ax.axis('off')
+
+    def render(self, panels):
+        for ax, image, (title, data) in zip(self.axes, self.images, panels):
+            step = max(1, -(-max(data.shape) // self.max_side))
+            preview = np.asarray(data[::step, ::step], dtype=np.float32)
+            image.set_data(preview)
+            image.set_extent((-0.5, preview.shape[1] - 0.5, preview.shape[0] - 0.5, -0.5))
+            image.set_clim(min(0.0, float(preview.min())), max(1.0, float(preview.max())))
+            ax.set_title(title)
+        self.figure.tight_layout()
+        return figure_to_png(self.figure)
+
+
+def render_image_grid(panels):
+    """PNG of four (title, image) panels"""
+    return figure_template('image_grid', ImageGrid).render(panels)
+
+
+def render_eigenvalues(values, title):
+    """PNG of eigenvalues in the complex plane, with the origin axes marked
+
+    The view covers at least [-1, 1] (the MATLAB code's fixed limits) and
+    grows to include every eigenvalue.
+    """
+    figure = new_figure((10, 6))
+    ax = figure.add_subplot()
+    ax.scatter(np.real(values), np.imag(values), s=100 if len(values) <= 100 else 10)
+    limit = max(1.0, float(np.max(np.abs(values), initial=0)) * 1.1)
+    ax.plot([-limit, limit], [0, 0], 'k-', linewidth=0.5)
+    ax.plot([0, 0], [-limit, limit], 'k-', linewidth=0.5)
+    ax.set_xlim(-limit, limit)
+    ax.set_ylim(-limit, limit)
+    ax.set_aspect('equal', adjustable='box')
+    ax.grid(True)
+    ax.set_title(title)
+    ax.set_xlabel('Real Part')
+    ax.set_ylabel('Imaginary Part')
+    return figure_to_png(figure)
+
+
+def render_stem(values, title, xlabel='Index', ylabel='Singular Value'):
+    """PNG of a stem plot of `values` against 1..len(values)"""
+    figure = new_figure((10, 6))
+    ax = figure.add_subplot()
+    ax.stem(np.arange(1, len(values) + 1), values)
+    ax.grid(True)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    return figure_to_png(figure)
+
+
+def render_matrix(matrix, title, max_side=512):
+    """PNG of a matrix as a 'jet' image with a colorbar, strided down to `max_side`"""
+    figure = new_figure((10, 6))
+    ax = figure.add_subplot()
+    step = max(1, -(-max(matrix.shape) // max_side))
+    image = ax.imshow(matrix[::step, ::step], cmap='jet', interpolation='nearest',
+                      extent=(0.5, matrix.shape[1] + 0.5, matrix.shape[0] + 0.5, 0.5))
+    figure.colorbar(image)
+    ax.set_title(title)
+    return figure_to_png(figure)
+
+
+class AnimationFrame:
+    """Reusable artists for every frame of one animation type"""
+
+    def __init__(self, animation_type):
+        self.animation_type = animation_type
+        self.figure = new_figure((6, 6))
+        ax = self.ax = self.figure.add_subplot()
+        if animation_type == 'orbit':
+            # Orbit path, sun at the focus, planet and its radius vector
+            a, e = 0.5, 0.5
+            t = np.linspace(0, 2*np.pi, 100)
+            ax.plot(a * np.cos(t), a * np.sqrt(1 - e**2) * np.sin(t), 'b--', alpha=0.5)
+            ax.plot(0, 0, 'yo', markersize=15)
+            self.planet, = ax.plot([], [], 'ro', markersize=10)
+            self.radius, = ax.plot([], [], 'k-', alpha=0.3)
+            limits = (-1.5, 1.5), (-1.5, 1.5)
+        elif animation_type == 'pendulum':
+            self.rod, = ax.plot([], [], 'k-', linewidth=2)
+            self.bob, = ax.plot([], [], 'ro', markersize=15)
+            limits = (-1.2, 1.2), (-1.2, 1.2)
+        else:
+            color = {'wave': 'b-', 'lissajous': 'g-', 'spiral': 'm-'}[animation_type]
+            self.curve, = ax.plot([], [], color, linewidth=2)
+            limits = ((0, 10) if animation_type == 'wave' else (-1.2, 1.2)), (-1.2, 1.2)
+        ax.set_xlim(*limits[0])
+        ax.set_ylim(*limits[1])
+        ax.grid(True)
+        if animation_type != 'wave':
+            ax.set_aspect('equal', adjustable='box')
+
+    def render(self, i, num_frames):
+        kind = self.animation_type
+        if kind == 'pendulum':
+            # Simple pendulum simulation
+            angle = np.pi/4 * np.cos(i/num_frames * 2 * np.pi)
+            x, y = np.sin(angle), -np.cos(angle)
+            self.rod.set_data([0, x], [0, y])
+            self.bob.set_data([x], [y])
+            title = f"Pendulum Simulation (t = {i/num_frames:.2f} s)"
+        elif kind == 'wave':
+            # Wave propagation
+            x = np.linspace(0, 10, 1000)
+            t = i / num_frames
+            self.curve.set_data(x, np.sin(x - 6*t) * np.exp(-0.1*x))
+            title = f"Wave Propagation (t = {t:.2f} s)"
+        elif kind == 'lissajous':
+            # Lissajous curve, frequency ratio 3:4, phase varies with frame
+            t = np.linspace(0, 2*np.pi, 1000)
+            delta = i/num_frames * np.pi
+            self.curve.set_data(np.sin(3 * t + delta), np.sin(4 * t))
+            title = f"Lissajous Curve (Phase = {delta:.2f} rad)"
+        elif kind == 'spiral':
+            # Spiral formation, growing with each frame
+            t = np.linspace(0, 15, 1000)
+            max_t = (i+1)/num_frames * 15
+            t_visible = t[t <= max_t]
+            r = 0.1 * t_visible
+            self.curve.set_data(r * np.cos(t_visible), r * np.sin(t_visible))
+            title = f"Spiral Formation (t = {max_t:.2f})"
+        else:
+            # Planetary orbit at this time step
+            a, e = 0.5, 0.5
+            theta = 2 * np.pi * i / num_frames
+            r = a * (1 - e**2) / (1 + e * np.cos(theta))
+            x, y = r * np.cos(theta), r * np.sin(theta)
+            self.planet.set_data([x], [y])
+            self.radius.set_data([0, x], [0, y])
+            title = f"Planetary Orbit (θ = {theta:.2f} rad)"
+        self.ax.set_title(title)
+        return figure_to_png(self.figure)
+
+
+def render_animation_frame(animation_type, i, num_frames):
+    """PNG of frame `i` of a Python-rendered animation"""
+    frame = figure_template(('animation', animation_type), lambda: AnimationFrame(animation_type))
+    return frame.render(i, num_frames)
+
+
+def write_animation_frame(animation_type, i, num_frames, path):
+    """Render frame `i` straight to `path` and return `i`
+
+    The file is written under a temporary name and renamed into place, so a
+    browser polling for it never sees a partial PNG. Module-level so it can
+    run in a worker process.
+    """
+    png = render_animation_frame(animation_type, i, num_frames)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(png)
+    os.replace(tmp_path, path)
+    return i
@@ -0,0 +1,178 @@
+"""
+Content-addressed cache for bridge results.
+
+Results are keyed by a hash of (function name, normalized params, backend)
+and kept pickled in a byte-bounded in-memory LRU. An optional on-disk tier
+lets several gunicorn workers share results; it must be private to this
+user, since unpickling a planted file would run its code.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    from webapp.private_dir import private_dir
+except ImportError:
+    from private_dir import private_dir
+
+
+def normalize_params(params, ignore=()):
+    """Canonical form of a params dict: sorted, no Nones, numbers as floats"""
+    normalized = {}
+    for name, value in (params or {}).items():
+        if value is None or name in ignore:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        normalized[name] = value
+    return normalized
+
+
+def make_key(function_name, params, backend, ignore=()):
+    """Hex digest identifying one call of `function_name` on `backend`"""
+    payload = json.dumps([function_name, backend, normalize_params(params, ignore)],
+                         sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional disk) cache of pickled results"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0,
+                         'evictions': 0, 'disk_evictions': 0, 'oversize': 0}
+        if disk_dir:
+            try:
+                private_dir(disk_dir)
+            except PermissionError as e:
+                print(f"Result cache kept in memory only: {e}")
+                self.disk_dir = None
+
+    def get(self, key):
+        """Return the cached result for `key`, or None on a miss"""
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+        if blob is None:
+            blob = self._read_disk(key)
+            if blob is None:
+                with self._lock:
+                    self.counters['misses'] += 1
+                return None
+            with self._lock:
+                self.counters['disk_hits'] += 1
+            self._remember(key, blob)
+        # Unpickle per hit so callers can never mutate the cached copy
+        return pickle.loads(blob)
+
+    def put(self, key, value):
+        """Store `value` under `key` in memory and, if enabled, on disk"""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.counters['stores'] += 1
+        self._remember(key, blob)
+        self._write_disk(key, blob)
+
+    def _remember(self, key, blob):
+        with self._lock:
+            if len(blob) > self.max_bytes:
+                self.counters['oversize'] += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = blob
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.counters['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.pkl')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, blob):
+        if not self.disk_dir or len(blob) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so other workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write result cache entry {key}: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            trim = self._disk_writes % 32 == 0
+        if trim:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        """Delete the least recently written files beyond `disk_max_bytes`"""
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith('.pkl'):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.counters['disk_evictions'] += 1
+
+    def clear(self):
+        """Drop every in-memory entry (the disk tier is left alone)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters plus current occupancy, for sizing the cache"""
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['disk_hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_dir': self.disk_dir,
+                'hit_ratio': round((lookups - self.counters['misses']) / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,154 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+Within a process, the first caller for a key computes and every caller that
+arrives before it finishes waits on the same future and receives its
+result (or its exception). Nothing is kept once the call finishes: a later
+caller computes afresh, or hits the result cache.
+
+Across processes (several gunicorn workers), a per-key lock file is held
+with flock while computing. Once a worker holds it, it re-checks the shared
+store (the on-disk result cache or the animation store) before computing,
+so a worker that waited for another usually finds its result there.
+Without fcntl (Windows) only in-process coalescing is done.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from webapp.private_dir import private_dir
+except ImportError:
+    from private_dir import private_dir
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one computation
+
+    With a `lock_dir`, `file_lock` also serializes a key across processes;
+    waiting for that lock gives up after `lock_timeout` seconds and the
+    caller computes anyway.
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=120.0, poll_interval=0.05, max_lock_age=3600):
+        if lock_dir and fcntl is None:
+            print("fcntl not available: coalescing identical calls within each process only")
+            lock_dir = None
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.max_lock_age = max_lock_age
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._acquisitions = 0
+        self.counters = {'leaders': 0, 'followers': 0, 'file_waits': 0, 'file_lock_timeouts': 0}
+        if lock_dir:
+            # Nobody else may plant lock files (or symlinks) here
+            try:
+                private_dir(lock_dir)
+            except PermissionError as e:
+                print(f"Coalescing identical calls within each process only: {e}")
+                self.lock_dir = None
+
+    def do(self, key, function):
+        """Run function() once for all concurrent callers of `key`
+
+        Returns (value, shared), `shared` being True for callers that
+        waited on another caller's computation. They all get the same
+        object, so callers that modify it should copy it first.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self.counters['leaders' if leader else 'followers'] += 1
+        if not leader:
+            return future.result(), True
+        try:
+            value = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return value, False
+
+    @contextmanager
+    def file_lock(self, key):
+        """Hold the cross-process lock of `key`; yields whether it is held
+
+        Yields False straight away without a `lock_dir`, and False after
+        `lock_timeout` (unlocked), so callers never fail on the lock. While
+        it is held, callers should re-check the shared store: another
+        process may have finished the same call just before.
+        """
+        if not self.lock_dir:
+            yield False
+            return
+        path = os.path.join(self.lock_dir, key + '.lock')
+        with open(path, 'a') as f:
+            if not self._acquire(f):
+                yield False
+                return
+            try:
+                os.utime(path)
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        self._sweep_locks()
+
+    def _acquire(self, f):
+        """flock `f`, polling until `lock_timeout`; returns whether it is locked"""
+        waited = False
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                waited = True
+                if time.monotonic() >= deadline:
+                    with self._lock:
+                        self.counters['file_lock_timeouts'] += 1
+                    return False
+                time.sleep(self.poll_interval)
+                continue
+            if waited:
+                with self._lock:
+                    self.counters['file_waits'] += 1
+            return True
+
+    def _sweep_locks(self):
+        """Every 256 locks, delete lock files unused for `max_lock_age` seconds
+
+        A file deleted while another process waits on it only costs that
+        one call its coalescing.
+        """
+        with self._lock:
+            self._acquisitions += 1
+            if self._acquisitions % 256:
+                return
+        cutoff = time.time() - self.max_lock_age
+        for name in os.listdir(self.lock_dir):
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if name.endswith('.lock') and os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'in_flight': len(self._calls),
+                    'mode': 'file' if self.lock_dir else 'process'}
@@ -17,6 +17,13 @@ document.addEventListener('DOMContentLoaded', function() {
         setupSymbolicMath();
     }
 });
+
+// Plots are requested by URL (?plot_format=url) so the browser can cache
+// them; older responses may still carry base64 in data.plot
+function plotSource(data) {
+    return data.plot_url || 'data:image/png;base64,' + data.plot;
+}
+
 // Function to handle API errors
 function handleApiError(error) {
     console.error('API Error:', error);
@@ -185,7 +192,7 @@ function generateSimplePlot(useMatlab) {
         params;
     
     // Send request
-    fetch(endpoint, {
+    fetch(endpoint + '?plot_format=url', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -199,9 +206,9 @@ function generateSimplePlot(useMatlab) {
             document.getElementById('simplePlotLoading').style.display = 'none';
             
             // Display plot
-            if (data.plot) {
+            if (data.plot || data.plot_url) {
                 const plotImage = document.getElementById('simplePlotImage');
-                plotImage.src = 'data:image/png;base64,' + data.plot;
+                plotImage.src = plotSource(data);
                 plotImage.style.display = 'block';
             }
             
@@ -241,7 +248,7 @@ function generateAdvancedPlot() {
     let requestData = { function: 'advanced_plot', params: params };
     
     // Send request
-    fetch(endpoint, {
+    fetch(endpoint + '?plot_format=url', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -255,9 +262,9 @@ function generateAdvancedPlot() {
             document.getElementById('advancedPlotLoading').style.display = 'none';
             
             // Display plot
-            if (data.plot) {
+            if (data.plot || data.plot_url) {
                 const plotImage = document.getElementById('advancedPlotImage');
-                plotImage.src = 'data:image/png;base64,' + data.plot;
+                plotImage.src = plotSource(data);
                 plotImage.style.display = 'block';
             }
             
@@ -293,7 +300,7 @@ function generateDifferentialEquation() {
     };
     
     // Make request
-    fetch('/differential_equation', {
+    fetch('/differential_equation?plot_format=url', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -307,9 +314,9 @@ function generateDifferentialEquation() {
             document.getElementById('differentialLoading').style.display = 'none';
             
             // Display plot
-            if (data.plot) {
+            if (data.plot || data.plot_url) {
                 const plotImage = document.getElementById('differentialImage');
-                plotImage.src = 'data:image/png;base64,' + data.plot;
+                plotImage.src = plotSource(data);
                 plotImage.style.display = 'block';
             }
             
@@ -351,7 +358,7 @@ function generateImageProcessing() {
     };
     
     // Make request
-    fetch('/image_processing', {
+    fetch('/image_processing?plot_format=url', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -365,9 +372,9 @@ function generateImageProcessing() {
             document.getElementById('imageLoading').style.display = 'none';
             
             // Display result
-            if (data.plot) {
+            if (data.plot || data.plot_url) {
                 const resultImage = document.getElementById('imageResult');
-                resultImage.src = 'data:image/png;base64,' + data.plot;
+                resultImage.src = plotSource(data);
                 resultImage.style.display = 'block';
             }
             
@@ -390,158 +397,200 @@ function generateImageProcessing() {
     })
     .catch(handleApiError);
 }
-// Setup Animation
-function setupAnimation() {
-    const animationBtn = document.getElementById('animationBtn');
-    if (!animationBtn) return;
-    
-    animationBtn.addEventListener('click', function() {
-        const animType = document.getElementById('animationType').value;
-        const numFrames = document.getElementById('numFrames').value;
-        const speed = document.getElementById('animationSpeed').value;
-        
-        // Show loading indicator
-        const wrapper = document.getElementById('animationWrapper');
-        const loadingEl = document.getElementById('animationLoading');
-        const framesContainer = document.getElementById('animationFrames');
-        
-        if (wrapper) wrapper.style.display = 'none';
-        if (loadingEl) loadingEl.style.display = 'block';
-        if (framesContainer) framesContainer.innerHTML = '';
-        
-        // Make the API request
-        fetch(`/api/animation?animation_type=${animType}&num_frames=${numFrames}&speed=${speed}`)
-            .then(response => response.json())
-            .then(data => {
-                console.log("Animation data received:", data);
-                
-                if (loadingEl) loadingEl.style.display = 'none';
-                
-                if (data.frames && data.frames.length > 0) {
-                    // We have frames, let's display them
-                    const frames = data.frames;
-                    console.log(`Received ${frames.length} frames`);
-                    
-                    // Create frame elements
-                    frames.forEach((frameData, index) => {
-                        const frameEl = document.createElement('img');
-                        frameEl.className = 'animation-frame';
-                        frameEl.src = `data:image/png;base64,${frameData}`;
-                        frameEl.style.display = index === 0 ? 'block' : 'none';
-                        frameEl.dataset.frameIndex = index;
-                        framesContainer.appendChild(frameEl);
-                    });
-                    
-                    // Show animation container
-                    if (wrapper) wrapper.style.display = 'block';
-                    
-                    // Add animation info
-                    const infoEl = document.getElementById('animationInfo');
-                    if (infoEl) {
-                        infoEl.innerHTML = `
-                            <h5>${data.title || 'Animation'}</h5>
-                            <p>${data.description || ''}</p>
-                            <p>Total Frames: ${frames.length}</p>
-                        `;
-                        infoEl.style.display = 'block';
-                    }
-                    
-                    // Set up simple animation controls
-                    const playBtn = document.getElementById('animationPlay');
-                    const pauseBtn = document.getElementById('animationPause');
-                    const progressEl = document.getElementById('animationProgress');
-                    const currentFrameEl = document.getElementById('currentFrame');
-                    
-                    // Initialize progress bar
-                    if (progressEl) {
-                        progressEl.min = 0;
-                        progressEl.max = frames.length - 1;
-                        progressEl.value = 0;
-                    }
-                    
-                    let currentFrameIndex = 0;
-                    let animInterval = null;
-                    
-                    function updateFrameDisplay() {
-                        // Hide all frames
-                        const frameImgs = framesContainer.querySelectorAll('.animation-frame');
-                        frameImgs.forEach(img => img.style.display = 'none');
-                        
-                        // Show current frame
-                        frameImgs[currentFrameIndex].style.display = 'block';
-                        
-                        // Update progress and counter
-                        if (progressEl) progressEl.value = currentFrameIndex;
-                        if (currentFrameEl) {
-                            currentFrameEl.textContent = `Frame: ${currentFrameIndex + 1}/${frames.length}`;
-                        }
-                    }
-                    
-                    function nextFrame() {
-                        currentFrameIndex = (currentFrameIndex + 1) % frames.length;
-                        updateFrameDisplay();
-                    }
-                    
-                    // Play button
-                    if (playBtn) {
-                        playBtn.addEventListener('click', function() {
-                            if (animInterval) clearInterval(animInterval);
-                            const frameDelay = 1000 / Math.max(1, Math.min(10, parseFloat(speed) || 1));
-                            animInterval = setInterval(nextFrame, frameDelay);
-                        });
-                    }
-                    
-                    // Pause button
-                    if (pauseBtn) {
-                        pauseBtn.addEventListener('click', function() {
-                            if (animInterval) {
-                                clearInterval(animInterval);
-                                animInterval = null;
-                            }
-                        });
-                    }
-                    
-                    // Progress slider
-                    if (progressEl) {
-                        progressEl.addEventListener('input', function() {
-                            if (animInterval) {
-                                clearInterval(animInterval);
-                                animInterval = null;
-                            }
-                            currentFrameIndex = parseInt(this.value);
-                            updateFrameDisplay();
-                        });
-                    }
-                    
-                    // Start the animation automatically
-                    setTimeout(() => {
-                        if (playBtn) playBtn.click();
-                    }, 500);
-                } else {
-                    // No frames, show error
-                    const resultElement = document.getElementById('animationResult');
-                    if (resultElement) {
-                        resultElement.innerHTML = `
-                            <div class="alert alert-warning">
-                                <strong>Note:</strong> No animation frames received. 
-                                ${data.message || 'Try a different animation type or check console for errors.'}
-                            </div>
-                        `;
-                    }
-                }
-            })
-            .catch(error => {
-                console.error('Animation error:', error);
-                const resultElement = document.getElementById('animationResult');
-                if (resultElement) {
-                    resultElement.innerHTML = `
-                        <div class="alert alert-danger">
-                            <strong>Error:</strong> ${error.message || 'An error occurred while processing your request.'}
-                        </div>
-                    `;
-                }
-                if (loadingEl) loadingEl.style.display = 'none';
-            });
+// Animation player: frames arrive over server-sent events as they are
+// rendered, and playback starts with the first one; later frames join the
+// loop as they arrive. Once the animation is complete (or at once, when it
+// was already stored and the server sends no frames) playback switches to
+// its sprite sheet: one download drawn onto a canvas. Only one animation
+// streams or plays at a time.
+let animationStream = null;
+let animationTimer = null;
+
+function playAnimation() {
+    const animType = document.getElementById('animationType').value || 'pendulum';
+    const numFrames = document.getElementById('numFrames').value || 10;
+    const wrapper = document.getElementById('animationWrapper');
+    const loadingEl = document.getElementById('animationLoading');
+    const framesEl = document.getElementById('animationFrames');
+    const resultEl = document.getElementById('animationResult');
+    const infoEl = document.getElementById('animationInfo');
+    const controlsEl = document.getElementById('animationControls');
+    const playBtn = document.getElementById('animationPlay');
+    const pauseBtn = document.getElementById('animationPause');
+    const progressEl = document.getElementById('animationProgress');
+    const frameCounter = document.getElementById('currentFrame');
+    let frameDelay = 100; // ms
+
+    // Stop the previous animation, whether still streaming or playing
+    if (animationStream) animationStream.close();
+    clearInterval(animationTimer);
+    animationTimer = null;
+
+    loadingEl.style.display = 'block';
+    wrapper.style.display = 'none';
+    framesEl.innerHTML = '';
+    resultEl.innerHTML = '';
+
+    const frames = [];  // one <img> per frame index, filled in as frames arrive
+    let ready = 0;      // frames 0..ready-1 have all arrived (Python frames come out of order)
+    let total = parseInt(numFrames, 10);
+    let current = 0;
+    let started = false;
+
+    // Shows one frame: the streamed <img>s until the sprite sheet takes over
+    let drawFrame = function(index) {
+        frames.forEach((img, i) => { if (img) img.style.display = i === index ? 'block' : 'none'; });
+    };
+
+    function showFrame(index) {
+        drawFrame(index);
+        if (progressEl) progressEl.value = index;
+        if (frameCounter) frameCounter.textContent = `Frame: ${index + 1}/${total}`;
+    }
+
+    function start() {
+        // Show the player and start playing right away
+        started = true;
+        loadingEl.style.display = 'none';
+        wrapper.style.display = 'block';
+        if (controlsEl) controlsEl.style.display = 'flex';
+        showFrame(0);
+        play();
+    }
+
+    function nextFrame() {
+        current = (current + 1) % ready;
+        showFrame(current);
+    }
+
+    function play() {
+        clearInterval(animationTimer);
+        animationTimer = setInterval(nextFrame, frameDelay);
+    }
+
+    function pause() {
+        clearInterval(animationTimer);
+        animationTimer = null;
+    }
+
+    function showError(message) {
+        loadingEl.style.display = 'none';
+        resultEl.innerHTML = `
+            <div class="alert alert-danger">
+                <strong>Error:</strong> ${escapeHtml(message)}
+            </div>
+        `;
+    }
+
+    // Assigned rather than added, so repeated runs don't stack handlers
+    if (playBtn) playBtn.onclick = play;
+    if (pauseBtn) pauseBtn.onclick = pause;
+    if (progressEl) {
+        progressEl.min = 0;
+        progressEl.max = 0;
+        progressEl.value = 0;
+        progressEl.oninput = function() {
+            pause();
+            current = Math.min(parseInt(this.value, 10), ready - 1);
+            showFrame(current);
+        };
+    }
+
+    // Play the complete animation from its sprite sheet (see /api/animation's output=sprite)
+    function useSprite(data) {
+        const sprite = new Image();
+        sprite.onload = function() {
+            // A newer animation may have started meanwhile
+            if (animationStream !== source) return;
+            const canvas = document.createElement('canvas');
+            canvas.className = 'animation-frame img-fluid';
+            canvas.width = data.frame_width;
+            canvas.height = data.frame_height;
+            canvas.style.display = 'block';
+            canvas.style.objectFit = 'contain';
+            const context = canvas.getContext('2d');
+            drawFrame = function(index) {
+                const sx = (index % data.columns) * data.frame_width;
+                const sy = Math.floor(index / data.columns) * data.frame_height;
+                context.drawImage(sprite, sx, sy, data.frame_width, data.frame_height,
+                                  0, 0, data.frame_width, data.frame_height);
+            };
+            framesEl.innerHTML = '';
+            framesEl.appendChild(canvas);
+            frames.length = 0;
+            ready = total;
+            if (progressEl) progressEl.max = total - 1;
+            if (!started) {
+                start();
+            } else {
+                showFrame(current);
+                if (animationTimer) play();
+            }
+        };
+        sprite.onerror = function() {
+            // The streamed frames keep playing; without them there is nothing to show
+            if (animationStream === source && !started) showError('Failed to load animation');
+        };
+        sprite.src = data.animation_url;
+    }
+
+    const source = animationStream = new EventSource(
+        `/api/animation/stream?animation_type=${encodeURIComponent(animType)}` +
+        `&num_frames=${encodeURIComponent(numFrames)}&output=sprite`);
+
+    source.addEventListener('frame', function(event) {
+        const frame = JSON.parse(event.data);
+        const img = document.createElement('img');
+        img.className = 'animation-frame img-fluid';
+        img.src = frame.data ? `data:image/png;base64,${frame.data}` : frame.url;
+        img.style.display = 'none';
+        frames[frame.index] = img;
+        framesEl.appendChild(img);
+        while (frames[ready]) ready++;
+        if (progressEl) progressEl.max = Math.max(ready - 1, 0);
+        // First frame in: start playing while the rest render
+        if (ready > 0 && !started) start();
+    });
+
+    source.addEventListener('done', function(event) {
+        source.close();
+        const data = JSON.parse(event.data);
+        if (!data.frames || data.frames.length === 0) {
+            showError(data.message || 'No animation frames received.');
+            return;
+        }
+        total = data.frames.length;
+        if (data.frame_duration) frameDelay = data.frame_duration;
+        if (data.output === 'sprite' && data.animation_url) {
+            useSprite(data);
+        } else if (!started) {
+            showError('No animation frames received.');
+            return;
+        }
+        if (infoEl) {
+            infoEl.innerHTML = `
+                <h5>${escapeHtml(data.title || 'Animation')}</h5>
+                <p>${escapeHtml(data.description || '')}</p>
+                <p>Total Frames: ${total}</p>
+            `;
+            infoEl.style.display = 'block';
+        }
+    });
+
+    source.addEventListener('error', function(event) {
+        source.close();
+        // Errors sent by the server carry a message; a dropped connection does not
+        let message = 'Failed to load animation';
+        if (event.data) {
+            try {
+                message = JSON.parse(event.data).message || message;
+            } catch (e) {
+                console.error('Unreadable animation error event:', e);
+            }
+        }
+        console.error('Animation stream error:', message);
+        pause();
+        showError(message);
     });
 }
 // Function to load MATLAB source code
@@ -610,7 +659,7 @@ function setupSymbolicMath() {
         plotContainer.style.display = 'none';
         
         // Send request to backend
-        fetch('/symbolic', {
+        fetch('/symbolic?plot_format=url', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -641,12 +690,12 @@ function setupSymbolicMath() {
                 }
                 
                 // Display plot if available
-                if (data.plot && operation === 'plot') {
+                if ((data.plot || data.plot_url) && operation === 'plot') {
     plotContainer.style.display = 'flex';
     if (typeof data.plot === 'string' && data.plot.startsWith('/static/')) {
         plotImg.src = data.plot;
     } else {
-        plotImg.src = 'data:image/png;base64,' + data.plot;
+        plotImg.src = plotSource(data);
     }
 }
             } else {
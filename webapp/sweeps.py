@@ -0,0 +1,122 @@
+"""
+Batched parameter sweeps for the waveform and ODE fallbacks.
+
+A sweep is a list of parameter sets, given explicitly or as a grid whose
+cartesian product is taken. Sets that share a sample grid are evaluated
+together: waveforms as one broadcast numpy expression, ODEs as one stacked
+state vector (see ode_solvers.integrate).
+"""
+
+import itertools
+
+import numpy as np
+
+try:
+    from webapp.ode_solvers import get_system, integrate, time_grid
+except ImportError:
+    from ode_solvers import get_system, integrate, time_grid
+
+
+def expand_sweep(spec, max_sets=1000):
+    """List of parameter sets from {'params': [...]} or {'grid': {...}, 'base': {...}}"""
+    base = dict(spec.get('base') or {})
+    if spec.get('params') is not None:
+        sets = [{**base, **params} for params in spec['params']]
+    elif spec.get('grid'):
+        names = list(spec['grid'])
+        values = [spec['grid'][name] if isinstance(spec['grid'][name], list) else [spec['grid'][name]]
+                  for name in names]
+        sets = [{**base, **dict(zip(names, combination))} for combination in itertools.product(*values)]
+    else:
+        raise ValueError("A sweep needs 'params' (a list of parameter sets) or 'grid'")
+    if not sets:
+        raise ValueError("The sweep is empty")
+    if len(sets) > max_sets:
+        raise ValueError(f"Sweep has {len(sets)} parameter sets (at most {max_sets} allowed)")
+    return sets
+
+
+def varying_params(sets):
+    """Names of the parameters that differ between sets, for labelling"""
+    names = sorted({name for params in sets for name in params})
+    return [name for name in names if len({repr(params.get(name)) for params in sets}) > 1]
+
+
+def waveform(function_type, x, amplitude=1, frequency=1, phase=0):
+    """advanced_plot's waveforms; all arguments broadcast against each other"""
+    argument = frequency * x + phase
+    if function_type == "sin":
+        return amplitude * np.sin(argument)
+    if function_type == "cos":
+        return amplitude * np.cos(argument)
+    if function_type == "tan":
+        # Clip to prevent excessive values
+        return np.clip(amplitude * np.tan(argument), -10, 10)
+    if function_type == "square":
+        return amplitude * np.sign(np.sin(argument))
+    return np.zeros(np.broadcast(argument, amplitude).shape)
+
+
+def _groups(sets, key):
+    """Indices of the sets, grouped by `key(params)`"""
+    groups = {}
+    for i, params in enumerate(sets):
+        groups.setdefault(key(params), []).append(i)
+    return groups.items()
+
+
+def waveform_sweep(sets):
+    """Evaluate advanced_plot parameter sets: one broadcast pass per x grid
+
+    Returns one {'x', 'y'} entry per set, in order.
+    """
+    results = [None] * len(sets)
+    grid = lambda p: (p['function_type'], float(p['x_min']), float(p['x_max']), int(p['num_points']))
+    for (function_type, x_min, x_max, num_points), indices in _groups(sets, grid):
+        x = np.linspace(x_min, x_max, num_points)
+        column = lambda name: np.array([float(sets[i][name]) for i in indices])[:, None]
+        y = waveform(function_type, x[None, :], column('amplitude'), column('frequency'), column('phase'))
+        for row, i in enumerate(indices):
+            results[i] = {'x': x, 'y': y[row]}
+    return results
+
+
+def ode_sweep(sets):
+    """Solve differential_equation parameter sets: one stacked solve per system
+
+    Besides eq_type, t_max and num_points a set may override the system's
+    parameters (e.g. 'c' for spring damping) and give an 'initial_state';
+    otherwise each of the system's default initial states is solved. All
+    members are integrated to the largest t_max and sampled on their own
+    grid from the dense output. Returns one {'t', 'states', 'parameters'}
+    entry per set, with an (n, len(t)) array per initial state.
+    """
+    results = [None] * len(sets)
+    for name, indices in _groups(sets, lambda p: get_system(p['eq_type']).name):
+        system = get_system(name)
+        known = set(system.defaults) | {'eq_type', 't_max', 'num_points', 'initial_state'}
+        members, owners, rows = [], [], {}
+        for i in indices:
+            unknown = set(sets[i]) - known
+            if unknown:
+                raise ValueError(f"Unknown {name} parameters: {', '.join(sorted(unknown))}")
+            initial = sets[i].get('initial_state')
+            for y0 in ([initial] if initial is not None else system.initial_states):
+                rows.setdefault(i, []).append(len(members))
+                members.append(y0)
+                owners.append(i)
+        values = [{**system.defaults, **{k: float(v) for k, v in sets[i].items() if k in system.defaults}}
+                  for i in owners]
+        params = {k: [value[k] for value in values] for k in system.defaults}
+        grids = {i: (float(sets[i]['t_max']), int(sets[i]['num_points'])) for i in indices}
+        sample = integrate(system, members, params, max(time_grid(*grid)[-1] for grid in grids.values()))
+        # Interpolate once per distinct time grid, not once per set
+        sampled = {grid: (time_grid(*grid), None) for grid in set(grids.values())}
+        for i in indices:
+            t, states = sampled[grids[i]]
+            if states is None:
+                states = sample(t)
+                sampled[grids[i]] = (t, states)
+            results[i] = {'t': t, 'states': list(states[rows[i]]),
+                          'parameters': system.describe(values[rows[i][0]])}
+    return results
@@ -0,0 +1,223 @@
+"""
+SymPy backend of the symbolic_math fallback, with compiled-expression caching.
+
+Expressions are parsed once per normalized string (whitespace collapsed,
+MATLAB's ^ read as a power). Each distinct expression keeps its operation
+results and its lambdified numpy function in an LRU, so the expressions
+that recur from /symbolic skip SymPy entirely. simplify, integrate and
+solve can take unbounded time, so they run in a killable worker process
+(see worker_pool) within TIME_BUDGET seconds, unless this process is
+itself such a worker: the bridge runs the whole symbolic_math fallback in
+one to enforce its deadline, and that deadline then bounds them. Running out of time is
+remembered for TIMEOUT_TTL seconds only, since a busy machine may have
+been to blame, and then the operation is tried again.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from webapp.worker_pool import WorkerPool, WorkersBusy, WorkerTimeout
+except ImportError:
+    from worker_pool import WorkerPool, WorkersBusy, WorkerTimeout
+
+OPERATIONS = ('simplify', 'differentiate', 'integrate', 'solve', 'plot')
+
+# Operations that can run for unbounded time, and their budget in seconds
+BUDGETED_OPERATIONS = ('simplify', 'integrate', 'solve')
+TIME_BUDGET = float(os.environ.get('SYMBOLIC_TIME_BUDGET', 5))
+
+# Seconds a timed-out operation is answered with a timeout without retrying
+TIMEOUT_TTL = float(os.environ.get('SYMBOLIC_TIMEOUT_TTL', 60))
+
+CACHE_SIZE = int(os.environ.get('SYMBOLIC_CACHE_SIZE', 256))
+
+_sympy = None
+_import_lock = threading.Lock()
+
+
+def load_sympy():
+    """Import SymPy and its parser once; returns (sympy, parse)
+
+    `parse(text)` parses with SymPy's standard transformations plus ^ as
+    exponentiation.
+    """
+    global _sympy
+    if _sympy is None:
+        with _import_lock:
+            if _sympy is None:
+                import sympy
+                from sympy.parsing.sympy_parser import convert_xor, parse_expr, standard_transformations
+                transformations = standard_transformations + (convert_xor,)
+                _sympy = sympy, lambda text: parse_expr(text, transformations=transformations)
+    return _sympy
+
+
+def _warm_up_worker():
+    load_sympy()
+
+
+class _LRU:
+    """Thread-safe, entry-bounded LRU mapping"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CompiledExpression:
+    """A parsed expression with its cached results and numpy function"""
+
+    def __init__(self, expr):
+        self.expr = expr
+        # operation -> (result, latex)
+        self.results = {}
+        # operation -> monotonic time until which it is not retried
+        self.timed_out = {}
+        self._function = None
+
+    def function(self):
+        """The expression as a numpy function of x, lambdified on first use"""
+        if self._function is None:
+            sp, _ = load_sympy()
+            self._function = sp.lambdify(sp.Symbol('x'), self.expr, 'numpy')
+        return self._function
+
+
+# Normalized text -> entry, and parsed expression -> entry, so spellings
+# that parse to the same expression share their results
+_by_text = _LRU(CACHE_SIZE)
+_by_expr = _LRU(CACHE_SIZE)
+
+_workers = WorkerPool(int(os.environ.get('SYMBOLIC_WORKERS', 1)), initializer=_warm_up_worker)
+_warmed_up = threading.Event()
+
+
+def warm_up(start_workers=True):
+    """Import SymPy, load lambdify's numpy printer and start the workers
+
+    Idempotent; meant to run once in the background at start-up so the
+    first request doesn't pay for the imports.
+    """
+    if _warmed_up.is_set():
+        return
+    _warmed_up.set()
+    compile_expression('x').function()
+    if start_workers:
+        _workers.start()
+
+
+def _in_worker():
+    """True inside a worker process, which cannot start processes of its own"""
+    return multiprocessing.current_process().daemon
+
+
+def normalize(expression):
+    """Cache key of an expression's text: whitespace runs collapsed"""
+    return ' '.join(str(expression).split())
+
+
+def compile_expression(expression):
+    """The cached CompiledExpression for `expression`, parsing it on a miss
+
+    Raises whatever the parser raises for invalid input.
+    """
+    text = normalize(expression)
+    entry = _by_text.get(text)
+    if entry is None:
+        _, parse = load_sympy()
+        expr = parse(text)
+        entry = _by_expr.get(expr)
+        if entry is None:
+            entry = CompiledExpression(expr)
+            _by_expr.put(expr, entry)
+        _by_text.put(text, entry)
+    return entry
+
+
+def _apply(expr, operation):
+    """(result, latex) of one operation on a parsed expression"""
+    sp, _ = load_sympy()
+    x = sp.Symbol('x')
+    if operation == 'simplify':
+        res = sp.simplify(expr)
+    elif operation == 'differentiate':
+        res = sp.diff(expr, x)
+    elif operation == 'integrate':
+        res = sp.integrate(expr, x)
+    elif operation == 'solve':
+        res = sp.solve(expr, x)
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+    return str(res), sp.latex(res)
+
+
+def _apply_text(text, operation):
+    """_apply on expression text; runs in a worker process"""
+    _, parse = load_sympy()
+    return _apply(parse(text), operation)
+
+
+def evaluate(expression, operation):
+    """(result, latex) of `operation` on `expression`, cached per expression
+
+    Raises TimeoutError when a budgeted operation runs out of time.
+    Inside a worker process it runs unbudgeted, within the caller's deadline.
+    """
+    entry = compile_expression(expression)
+    result = entry.results.get(operation)
+    if result is not None:
+        return result
+    message = f"{operation} did not finish within {TIME_BUDGET:g} s"
+    if entry.timed_out.get(operation, 0) > time.monotonic():
+        raise TimeoutError(message)
+    if operation in BUDGETED_OPERATIONS and not _in_worker():
+        try:
+            result = _workers.run(_apply_text, (normalize(expression), operation), TIME_BUDGET)
+        except WorkersBusy as e:
+            # Not the expression's fault, so not remembered
+            raise TimeoutError(f"{operation} could not start: {e}")
+        except WorkerTimeout:
+            entry.timed_out[operation] = time.monotonic() + TIMEOUT_TTL
+            raise TimeoutError(message)
+    else:
+        result = _apply(entry.expr, operation)
+    entry.results[operation] = result
+    entry.timed_out.pop(operation, None)
+    return result
+
+
+def stats():
+    """Cache and worker counters"""
+    return {
+        'expressions': len(_by_expr),
+        'hits': _by_text.hits,
+        'misses': _by_text.misses,
+        'workers': dict(_workers.stats),
+    }
@@ -0,0 +1,177 @@
+"""
+Killable worker processes for Python work that may run too long.
+
+A thread cannot be stopped from outside, so calls with a time limit run in
+a small pool of long-lived worker processes instead. A worker that
+overruns is killed and replaced, and the others carry on undisturbed.
+"""
+
+import multiprocessing
+import queue
+import threading
+
+
+class WorkerTimeout(Exception):
+    """Raised when a call does not finish within its time limit"""
+
+
+class WorkersBusy(WorkerTimeout):
+    """Raised when no worker became free within the call's time limit"""
+
+
+def _serve(conn, initializer):
+    """Worker process main loop: run (function, args) requests until the pipe closes"""
+    if initializer is not None:
+        initializer()
+    conn.send(('ready', None))
+    while True:
+        try:
+            function, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(('ok', function(*args)))
+        except Exception as e:
+            try:
+                conn.send(('error', e))
+            except Exception:
+                # The exception itself did not pickle; its type and text always do
+                conn.send(('error', RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _CallFailed(Exception):
+    """Wraps an exception raised by the function inside a worker"""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+class _Worker:
+    """One worker process and the parent's end of its pipe"""
+
+    def __init__(self, initializer):
+        context = multiprocessing.get_context('spawn')
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, initializer), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def call(self, function, args, timeout, startup_timeout):
+        if not self.ready:
+            # Starting up (imports) does not count against the call's time limit
+            if not self.conn.poll(startup_timeout):
+                raise RuntimeError("Worker process did not start in time")
+            self.conn.recv()
+            self.ready = True
+        self.conn.send((function, args))
+        if not self.conn.poll(timeout):
+            raise WorkerTimeout(f"Call did not finish within {timeout:g} s")
+        status, value = self.conn.recv()
+        if status == 'error':
+            raise _CallFailed(value)
+        return value
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Up to `size` worker processes, each serving one call at a time
+
+    Workers are spawned on first use (or by `start()`), run `initializer`
+    once, e.g. to import heavy modules, and then serve calls until they
+    overrun a time limit or die. `function` must be importable by name
+    (a module-level function) and its arguments and result picklable.
+    If worker processes cannot be started at all, calls run in-process
+    without a time limit.
+    """
+
+    def __init__(self, size=1, initializer=None, startup_timeout=120.0):
+        self.size = max(1, int(size))
+        self.initializer = initializer
+        self.startup_timeout = startup_timeout
+        # Free slots: a worker, or None where one has yet to be started
+        self._idle = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(None)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'timeouts': 0, 'restarts': 0, 'in_process': 0}
+
+    def start(self):
+        """Spawn every worker now, so the first calls don't wait for start-up"""
+        slots = []
+        while True:
+            try:
+                slots.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in slots:
+            self._idle.put(worker if worker is not None else self._spawn())
+
+    def _spawn(self):
+        try:
+            return _Worker(self.initializer)
+        except Exception as e:
+            print(f"Could not start worker process: {e}")
+            return None
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def run(self, function, args=(), timeout=None):
+        """`function(*args)` in a worker, raising WorkerTimeout after `timeout` seconds
+
+        Waiting for a free worker counts against the timeout (WorkersBusy).
+        """
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self._count('timeouts')
+            raise WorkersBusy(f"No worker became free within {timeout:g} s")
+        if worker is None:
+            worker = self._spawn()
+        self._count('calls')
+        if worker is None:
+            self._idle.put(None)
+            self._count('in_process')
+            return function(*args)
+        try:
+            result = worker.call(function, args, timeout, self.startup_timeout)
+        except WorkerTimeout:
+            self._count('timeouts')
+            self._replace(worker)
+            raise
+        except (EOFError, OSError) as e:
+            # The worker died (or never started): retire it and run this call here
+            print(f"Worker process failed ({e!r}); running in-process without a time limit")
+            self._replace(worker)
+            self._count('in_process')
+            return function(*args)
+        except _CallFailed as e:
+            self._idle.put(worker)
+            raise e.error
+        except RuntimeError:
+            self._idle.put(worker)
+            raise
+        self._idle.put(worker)
+        return result
+
+    def _replace(self, worker):
+        worker.kill()
+        self._count('restarts')
+        self._idle.put(self._spawn())
+
+    def close(self):
+        """Stop the idle workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.kill()